@@ -17,6 +17,9 @@ class AgentSettings(BaseSettings):
     
     # MCP 서버 설정
     MCP_SERVER_URL: str = os.getenv('MCP_SERVER_URL', 'http://localhost:8000')
+    MCP_STREAM_ENABLED: bool = True  # MCP 서버와 WebSocket 스트림 하나를 유지하며 전송 (실패 시 HTTP)
+    MCP_STREAM_CREDIT: int = 10  # 스트림으로 한 번에 받을 수 있는 메시지 수 (flow control)
+    MCP_CLAIM_CHECK: bool = True  # MCP 메시지에 본문 대신 message_id 와 라우팅 필드만 싣기 (본문은 email_logs 에서 조회)
     
     # Supabase 설정
     SUPABASE_URL: str = os.getenv('SUPABASE_URL', '')
@@ -31,6 +34,12 @@ class AgentSettings(BaseSettings):
     # 에이전트 설정
     POLL_INTERVAL: int = 60  # 이메일 확인 간격 (초)
     
+    # Outbox (DB / MCP 쓰기 지연 반영) 설정
+    OUTBOX_PATH: str = os.getenv("OUTBOX_PATH", os.path.join(os.path.dirname(__file__), "data", "outbox.sqlite3"))
+    OUTBOX_BATCH_SIZE: int = 50  # 한 번에 반영할 항목 수
+    OUTBOX_RETRY_BASE_DELAY: float = 1.0  # 재시도 초기 대기 시간 (초)
+    OUTBOX_RETRY_MAX_DELAY: float = 300.0  # 재시도 최대 대기 시간 (초)
+    
     # 상태 타입
     STATUS_TYPES: ClassVar[List[str]] = [
         'unread',
@@ -3,9 +3,6 @@ import asyncio
 import logging
 import sys
 from datetime import datetime, timedelta
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from config import settings, AgentSettings
 import openai
 
@@ -16,8 +13,16 @@ from src.processors.email_processor import EmailProcessor
 from src.processors.attachment_processor import AttachmentProcessor
 from src.services.mcp_service import MCPService
 from src.services.supabase_service import SupabaseService
+from src.services.outbox import Outbox, OutboxFlusher
 from src.gmail.message_filter import VendorEmailManager, is_vendor_email
 
+# 프로젝트 루트의 common 패키지 사용
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.gmail_auth import get_gmail_auth
+
 # Load settings
 settings = AgentSettings()
 
@@ -41,25 +46,10 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def authenticate_gmail():
-    """Gmail API 인증"""
-    creds = None
+    """Gmail API 인증 (token / service 는 common.gmail_auth 가 프로세스에서 캐시하고 만료 전에 갱신)"""
     credentials_path = os.path.join(os.path.dirname(__file__), 'credentials', 'credentials.json')
     token_path = os.path.join(os.path.dirname(__file__), 'credentials', 'token.json')
-    
-    if os.path.exists(token_path):
-        creds = Credentials.from_authorized_user_file(token_path, settings.GMAIL_SCOPES)
-    else:
-        if not os.path.exists(credentials_path):
-            raise FileNotFoundError(f"credentials.json file not found at {credentials_path}")
-            
-        flow = InstalledAppFlow.from_client_secrets_file(
-            credentials_path, 
-            settings.GMAIL_SCOPES
-        )
-        creds = flow.run_local_server(port=8002)
-        with open(token_path, 'w') as token:
-            token.write(creds.to_json())
-    return build('gmail', 'v1', credentials=creds)
+    return get_gmail_auth(token_path, credentials_path, settings.GMAIL_SCOPES, port=8002).service()
 
 async def process_email(service, msg, email_processor: EmailProcessor, mcp_service: MCPService, vendor_manager: VendorEmailManager):
     """이메일 처리"""
@@ -91,7 +81,9 @@ async def process_email(service, msg, email_processor: EmailProcessor, mcp_servi
             "attachments": content["attachments"]
         }
         await email_processor.save_email_log(parsed_message)
-        await mcp_service.send_message(parsed_message)
+        # MCP 알림도 outbox 를 거쳐 전송 (이메일 row 가 DB에 반영된 뒤 전송됨)
+        # claim-check 모드에서는 본문 없이 message_id 와 라우팅 필드만 기록
+        email_processor.outbox.append_mcp_message(mcp_service.message_reference(parsed_message))
     except Exception as e:
         logger.error(f"Error processing email {msg['id']}: {str(e)}")
         raise
@@ -282,8 +274,12 @@ async def main():
         # 서비스 초기화
         text_processor = TextProcessor()
         mcp_service = MCPService()
+        if settings.MCP_STREAM_ENABLED:
+            await mcp_service.open_stream()
         supabase_service = SupabaseService()
-        email_processor = EmailProcessor(service, text_processor, supabase_client=supabase_service)
+        outbox = Outbox(settings.OUTBOX_PATH)
+        outbox_flusher = OutboxFlusher(outbox, supabase_service, mcp_service)
+        email_processor = EmailProcessor(service, text_processor, supabase_client=supabase_service, outbox=outbox)
         
         # 실시간 이메일 감시 시작
         watcher = GmailWatcher(service, vendor_manager)
@@ -291,6 +287,8 @@ async def main():
         
         # 기존 서비스 초기화 및 워커 실행
         await asyncio.gather(
+            # outbox 에 쌓인 DB 쓰기 / MCP 알림 반영
+            outbox_flusher.run(),
             collect_historical_emails(service, email_processor, mcp_service, vendor_manager, months_back=1),
             watch_new_vendor_emails(service, email_processor, mcp_service, vendor_manager),
             # 실시간 이메일 감시
@@ -302,6 +300,8 @@ async def main():
     finally:
         if 'email_processor' in locals():
             email_processor.cleanup()
+        if 'mcp_service' in locals():
+            await mcp_service.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
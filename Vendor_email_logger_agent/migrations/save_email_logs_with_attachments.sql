@@ -0,0 +1,54 @@
+-- email_logs row 와 email_attachments row 들을 한 트랜잭션으로 저장하는 함수
+-- OutboxFlusher 가 배치마다 한 번 호출 (첨부파일 수와 관계없이 요청 1회)
+--
+-- entries: [{"email_log": {...}, "attachments": [{"filename": ..., "mime_type": ...}, ...]}, ...]
+-- 이미 저장된 message_id 는 건너뛰고 기존 id 를 반환하므로 재시도해도 중복 저장되지 않습니다.
+
+CREATE INDEX IF NOT EXISTS idx_email_logs_message_id ON email_logs(message_id);
+
+CREATE OR REPLACE FUNCTION save_email_logs_with_attachments(entries jsonb)
+RETURNS TABLE (saved_message_id text, email_log_id bigint)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    entry jsonb;
+    log_row email_logs;
+    new_id bigint;
+BEGIN
+    FOR entry IN SELECT value FROM jsonb_array_elements(entries)
+    LOOP
+        log_row := jsonb_populate_record(NULL::email_logs, entry->'email_log');
+        new_id := NULL;
+
+        SELECT e.id INTO new_id
+        FROM email_logs e
+        WHERE e.message_id = log_row.message_id
+        LIMIT 1;
+
+        IF new_id IS NULL THEN
+            INSERT INTO email_logs (
+                thread_id, po_number, direction, sender_email, recipient_email, subject,
+                sent_at, created_at, updated_at, received_at, draft_body, status, email_type,
+                has_attachment, filename, attachment_types, summary, sender_role,
+                parsed_delivery_date, trigger_reason, body, message_id
+            ) VALUES (
+                log_row.thread_id, log_row.po_number, log_row.direction, log_row.sender_email,
+                log_row.recipient_email, log_row.subject, log_row.sent_at, log_row.created_at,
+                log_row.updated_at, log_row.received_at, log_row.draft_body, log_row.status,
+                log_row.email_type, log_row.has_attachment, log_row.filename, log_row.attachment_types,
+                log_row.summary, log_row.sender_role, log_row.parsed_delivery_date,
+                log_row.trigger_reason, log_row.body, log_row.message_id
+            )
+            RETURNING id INTO new_id;
+
+            INSERT INTO email_attachments (email_log_id, filename, mime_type)
+            SELECT new_id, a.filename, a.mime_type
+            FROM jsonb_populate_recordset(NULL::email_attachments, COALESCE(entry->'attachments', '[]'::jsonb)) a;
+        END IF;
+
+        saved_message_id := log_row.message_id;
+        email_log_id := new_id;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
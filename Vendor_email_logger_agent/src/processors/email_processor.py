@@ -8,6 +8,7 @@ import docx
 import pandas as pd
 from ..utils.text_processor import TextProcessor
 from ..gmail.message_filter import get_email_type
+from ..services.outbox import Outbox, KIND_EMAIL_LOG
 from typing import Dict, List
 from supabase import create_client
 import re
@@ -15,10 +16,12 @@ import re
 logger = logging.getLogger(__name__)
 
 class EmailProcessor:
-    def __init__(self, service, text_processor: TextProcessor, supabase_client):
+    def __init__(self, service, text_processor: TextProcessor, supabase_client, outbox: Outbox):
+        """outbox: DB 쓰기를 기록할 outbox (같은 outbox 로 OutboxFlusher 를 실행해야 Supabase / MCP 서버에 반영됨)"""
         self.service = service
         self.text_processor = text_processor
         self.supabase = supabase_client
+        self.outbox = outbox
         self.temp_dir = tempfile.mkdtemp(prefix='email_attachments_')
         self.thread_po_cache = {}  # 스레드 ID를 키로 하는 PO 번호 캐시
 
@@ -203,8 +206,15 @@ class EmailProcessor:
         try:
             now = datetime.utcnow()
             
-            # 저장 전 중복 체크
-            existing = self.supabase.client.from_("email_logs").select("id").eq("message_id", message_data["message_id"]).execute().data
+            # 저장 전 중복 체크 (DB 장애 시에는 건너뛰고 flusher 의 중복 체크에 맡김)
+            if self.outbox.has_pending(KIND_EMAIL_LOG, message_data["message_id"]):
+                logger.info(f"Message_id {message_data['message_id']} already queued in outbox, skipping save.")
+                return None
+            try:
+                existing = self.supabase.client.from_("email_logs").select("id").eq("message_id", message_data["message_id"]).execute().data
+            except Exception as e:
+                logger.warning(f"Duplicate check failed, deferring to outbox flusher: {e}")
+                existing = None
             if existing:
                 logger.info(f"Duplicate message_id {message_data['message_id']} detected, skipping save.")
                 return None
@@ -291,23 +301,19 @@ class EmailProcessor:
                 "message_id": message_data.get("message_id")  # ✅ message_id도 항상 저장
             }
             
-            # Supabase에 저장 (중복 체크/업데이트 기준은 thread_id)
-            response = await self.supabase.save_email_log(email_log_data, summary)
-            if not response:
-                logger.error("Failed to save email log to Supabase")
-                return False
-                
-            # 첨부파일 저장
-            if processed_attachments:
-                for attachment in processed_attachments:
-                    attachment_data = {
-                        "email_log_id": response.data[0]['id'],
-                        "filename": attachment['filename'],
-                        "mime_type": attachment['mime_type'],
-                    }
-                    await self.supabase.save_attachment(response.data[0]['id'], attachment_data)
+            # 첨부파일 row (email_log_id 는 flusher 가 이메일 row 저장 후 채움)
+            attachment_rows = [
+                {
+                    "filename": attachment['filename'],
+                    "mime_type": attachment['mime_type'],
+                }
+                for attachment in processed_attachments
+            ]
             
-            return response
+            # outbox 에 기록 → OutboxFlusher 가 배치로 Supabase 에 저장 (DB 장애 시 재시도)
+            self.outbox.append_email_log(email_log_data, attachment_rows)
+            logger.info(f"Queued email log for message_id={email_log_data['message_id']} in outbox")
+            return True
             
         except Exception as e:
             logger.error(f"Error saving email log: {e}")
@@ -332,18 +338,8 @@ class EmailProcessor:
         Returns:
             List[Dict]: 스레드의 이메일 목록 (시간순 정렬)
         """
-        try:
-            # Supabase에서 스레드 이메일 조회
-            response = await self.supabase.table("email_logs").select("*").eq("thread_id", thread_id).order("sent_at").execute()
-            
-            if not response.data:
-                return []
-                
-            return response.data
-            
-        except Exception as e:
-            logger.error(f"Error getting thread history: {e}")
-            return []
+        # SupabaseService 에서 필요한 컬럼만 조회
+        return await self.supabase.get_thread_history(thread_id)
 
     def is_new_thread(self, subject: str, thread_id: str) -> bool:
         """
@@ -1,32 +1,42 @@
 # mcp/mcp_client.py
-import requests
-from typing import Dict
+import os
+import sys
+from typing import Dict, List
 
-MCP_URL = "http://localhost:8000"
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
 
-def send_to_mcp(message: Dict):
+from common.mcp_client import get_mcp_client
+
+async def send_to_mcp(message: Dict):
     """
     Send a message to the MCP server
     """
     try:
-        response = requests.post(f"{MCP_URL}/send", json=message)
-        print(f"📨 Sent to MCP: {response.status_code}")
-        if response.status_code != 200:
-            print(f"❌ Error sending to MCP: {response.text}")
+        result = await get_mcp_client().send(message)
+        print(f"📨 Sent to MCP: {result.get('status')}")
     except Exception as e:
         print(f"❌ MCP transmission error: {e}")
 
-def receive_from_mcp(agent_id: str) -> Dict:
+async def receive_from_mcp(agent_id: str, wait: float = 0, max_messages: int = 10) -> Dict:
     """
-    Receive messages from the MCP server
+    Receive up to max_messages messages from the MCP server
+    (wait > 0: long poll until a message arrives or wait seconds pass)
     """
     try:
-        response = requests.get(f"{MCP_URL}/receive/{agent_id}")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"❌ Error receiving from MCP: {response.text}")
-            return {"messages": []}
+        return {"messages": await get_mcp_client().receive(agent_id, max_messages=max_messages, wait=wait)}
     except Exception as e:
         print(f"❌ MCP reception error: {e}")
         return {"messages": []}
+
+async def ack_to_mcp(agent_id: str, receipts: List[str]) -> int:
+    """
+    Acknowledge processed messages so the MCP server deletes them
+    (unacknowledged messages are redelivered after the visibility timeout)
+    """
+    try:
+        return await get_mcp_client().ack(agent_id, receipts)
+    except Exception as e:
+        print(f"❌ MCP ack error: {e}")
+    return 0
@@ -1,75 +1,273 @@
 import os
-import json
+import sys
+import asyncio
 import logging
 import aiohttp
-from datetime import datetime
-from typing import Dict, Any
+import orjson
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from config import settings
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.mcp_client import MCPError, get_mcp_client
 
 logger = logging.getLogger(__name__)
 
+SENDER_ID = "vendor_email_logger"
+# 수신 이메일 알림 topic (external_communication/mcp_runner.py 의 hub 들이 consumer group 으로 구독)
+VENDOR_EMAIL_TOPIC = "vendor_email"
+STREAM_SEND_TIMEOUT = 10  # 스트림으로 보낸 메시지의 응답 대기 시간 (초)
+QUEUE_FULL_MAX_ATTEMPTS = 3  # 429 (수신 큐 가득 참) 응답 시 최대 시도 횟수
+
+# MCP 메시지 우선순위: 과거 이메일 재수집(backfill) 알림은 실시간 수신 알림보다 뒤에 처리
+PRIORITY_LIVE = 10
+PRIORITY_BACKFILL = 1
+BACKFILL_AGE = timedelta(days=1)
+
+# claim-check 모드에서 MCP 메시지에 싣는 필드 (본문 / 첨부파일은 consumer 가 message_id 로 email_logs 에서 조회)
+CLAIM_CHECK_FIELDS = ("message_id", "thread_id", "subject", "from", "to", "direction", "sent_at")
+
+
+def dumps(obj: Any) -> str:
+    """orjson 으로 직렬화 (aiohttp json_serialize / send_json 용 str 반환)"""
+    return orjson.dumps(obj, default=str).decode()
+
+
 class MCPService:
-    def __init__(self):
-        self.base_url = os.getenv('MCP_SERVER_URL', 'http://localhost:8000')
-        self.session = None
+    """
+    HTTP 요청과 WebSocket 스트림 모두 common.mcp_client 의 공유 클라이언트 (keep-alive 연결 풀 / timeout /
+    연결 오류·429·5xx 지터 재시도) 를 사용
+    """
 
-    async def ensure_session(self):
-        """세션이 없으면 생성"""
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
+    def __init__(self):
+        self.client = get_mcp_client()
+        # WebSocket 스트림 상태
+        self.ws = None
+        self.stream_agent_id = None
+        self._reader = None
+        self._request_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self._outstanding = set()  # 전달받았지만 아직 ack 하지 않은 offset
+        self._max_acked = 0
+        self.last_offset = 0  # 여기까지는 모두 처리 완료 (재연결 시 이어받을 위치)
 
     async def close(self):
-        """세션 종료"""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        """스트림과 공유 연결 풀 종료"""
+        await self.close_stream()
+        await self.client.close()
+
+    def message_reference(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        claim-check 모드면 MCP 로 보낼 라우팅 필드만 남김
+        email_logs row 가 저장된 뒤에 전송되므로 (outbox 순서 보장) consumer 는 항상 본문을 조회할 수 있음
+        """
+        if not settings.MCP_CLAIM_CHECK:
+            return message_data
+        return {field: message_data.get(field) for field in CLAIM_CHECK_FIELDS}
+
+    def build_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        """파싱된 이메일을 MCP 메시지 형식으로 변환"""
+        claim_check = settings.MCP_CLAIM_CHECK
+        return {
+            "sender": SENDER_ID,
+            "content": "" if claim_check else message_data.get("body_text", ""),
+            "type": "vendor_email",
+            # 재수집 / 재시도로 같은 이메일을 다시 보내도 MCP 서버가 중복으로 걸러냄
+            "idempotency_key": message_data.get("message_id"),
+            "priority": self.priority_for(message_data),
+            "payload": {
+                "email_data": self.message_reference(message_data),
+                "claim_check": claim_check,
+                "vendor_id": "",  # TODO: Implement vendor mapping
+                "status": "unread"
+            }
+        }
+
+    def priority_for(self, message_data: Dict[str, Any]) -> int:
+        """하루 이상 지난 이메일(과거 메일 재수집)은 낮은 우선순위로 전송"""
+        try:
+            sent_at = parsedate_to_datetime(message_data.get("sent_at") or "")
+        except (TypeError, ValueError):
+            return PRIORITY_LIVE
+        if sent_at.tzinfo is None:
+            sent_at = sent_at.replace(tzinfo=timezone.utc)
+        if datetime.now(timezone.utc) - sent_at > BACKFILL_AGE:
+            return PRIORITY_BACKFILL
+        return PRIORITY_LIVE
 
     async def send_message(self, message_data: Dict[str, Any]) -> bool:
         """MCP 서버로 메시지 전송"""
-        try:
-            await self.ensure_session()
-            
-            # 메시지 데이터 준비
-            payload = {
-                "sender": "vendor_email_logger",
-                "receiver": "external_comm_agent",
-                "content": message_data.get("body_text", ""),
-                "type": "vendor_email",
-                "payload": {
-                    "email_data": message_data,
-                    "vendor_id": "",  # TODO: Implement vendor mapping
-                    "status": "unread"
-                }
-            }
+        return await self.send_messages([message_data])
 
-            # MCP 서버로 전송
-            async with self.session.post(
-                f"{self.base_url}/send",  # /api/messages 대신 /send 사용
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            ) as response:
-                if response.status == 200:
-                    logger.info(f"Message sent to MCP server: {message_data.get('subject')}")
+    async def send_messages(self, messages_data: List[Dict[str, Any]]) -> bool:
+        """
+        MCP 서버의 VENDOR_EMAIL_TOPIC 으로 메시지 여러 건을 한 번에 발행 (전부 저장되거나 전부 거절됨)
+        수신 큐가 가득 차 429 를 받으면 Retry-After 만큼 기다린 뒤 재시도
+        구독 중인 group 이 없으면 실패로 보고 False (outbox 가 남겨 두었다가 다시 보냄)
+        """
+        if not messages_data:
+            return True
+        payloads = [self.build_message(message_data) for message_data in messages_data]
+        try:
+            for attempt in range(1, QUEUE_FULL_MAX_ATTEMPTS + 1):
+                sent, retry_after = await self._send_once(payloads)
+                if sent:
+                    logger.info(f"{len(payloads)} message(s) sent to MCP server")
                     return True
-                else:
-                    logger.error(f"Failed to send message to MCP server: {response.status}")
+                if retry_after is None or attempt == QUEUE_FULL_MAX_ATTEMPTS:
                     return False
-
+                logger.warning(f"MCP queue full, retrying in {retry_after}s ({attempt}/{QUEUE_FULL_MAX_ATTEMPTS})")
+                await asyncio.sleep(retry_after)
         except Exception as e:
             logger.error(f"Error sending message to MCP server: {e}")
+        return False
+
+    async def _send_once(self, payloads: List[Dict[str, Any]]) -> Tuple[bool, Optional[float]]:
+        """
+        전송 1회 시도
+        Returns: (성공 여부, 큐가 가득 찬 경우 Retry-After 초)
+        """
+        # 스트림이 끊겼으면 재연결 후 같은 연결로 전송
+        if self.stream_agent_id and (self.ws is None or self.ws.closed):
+            await self.open_stream(self.stream_agent_id)
+        if self.ws is not None and not self.ws.closed:
+            result = await self._send_over_stream(payloads)
+            if result is not None:
+                if result.get("type") == "sent":
+                    return self._published(result.get("groups")), None
+                if result.get("status") == 429:
+                    return False, float(result.get("retry_after", 1))
+                logger.error(f"MCP server rejected message: {result.get('detail')}")
+                return False, None
+
+        # 스트림이 없으면 HTTP 로 발행 (429 / 5xx / 연결 오류는 공유 클라이언트가 Retry-After / 지터 백오프로 재시도)
+        try:
+            response = await self.client.publish(VENDOR_EMAIL_TOPIC, payloads)
+        except MCPError as e:
+            logger.error(f"Failed to send message to MCP server: {e}")
+            return False, None
+        return self._published(response.get("groups")), None
+
+    @staticmethod
+    def _published(groups: Optional[Dict[str, Any]]) -> bool:
+        """구독 중인 group 이 하나도 없으면 아무도 받지 못하므로 실패로 처리"""
+        if not groups:
+            logger.warning(f"No consumer group subscribed to {VENDOR_EMAIL_TOPIC}, keeping messages for retry")
             return False
+        return True
 
     async def get_message_status(self, message_id: str) -> Dict[str, Any]:
         """메시지 상태 조회"""
         try:
-            await self.ensure_session()
-            
-            async with self.session.get(f"{self.base_url}/status/{message_id}") as response:  # /api/messages 대신 /status 사용
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    logger.error(f"Failed to get message status: {response.status}")
-                    return None
-
+            return await self.client.request("GET", f"/status/{message_id}")  # /api/messages 대신 /status 사용
         except Exception as e:
             logger.error(f"Error getting message status: {e}")
-            return None 
\ No newline at end of file
+            return None
+
+    # === WebSocket 스트림 ===
+
+    async def open_stream(self, agent_id: str = SENDER_ID) -> bool:
+        """
+        MCP 서버 /stream/{agent_id} 에 연결 (이후 send_message 는 이 연결로 전송)
+        재연결 시에는 마지막으로 처리한 offset 부터 이어받음
+        """
+        session = await self.client.ensure_session()
+        self.stream_agent_id = agent_id
+        ws_url = self.client.base_url.replace("http", "ws", 1)
+        try:
+            # 세션의 요청 timeout 은 연결(handshake) 까지만 적용되고, 연결 후에는 heartbeat 로 끊김을 감지
+            self.ws = await session.ws_connect(
+                f"{ws_url}/stream/{agent_id}",
+                params={"after": self.last_offset},
+                heartbeat=30
+            )
+        except Exception as e:
+            logger.warning(f"Failed to open MCP stream, falling back to HTTP: {e}")
+            self.ws = None
+            return False
+        self._outstanding.clear()
+        self._reader = asyncio.create_task(self._read_stream())
+        logger.info(f"MCP stream opened for {agent_id} (after offset {self.last_offset})")
+        return True
+
+    async def close_stream(self):
+        self.stream_agent_id = None
+        if self._reader:
+            self._reader.cancel()
+            self._reader = None
+        if self.ws is not None:
+            await self.ws.close()
+            self.ws = None
+
+    async def _read_stream(self):
+        """서버 frame 처리: 전송 응답은 대기 중인 send 로, 메시지는 incoming 큐로"""
+        try:
+            async for frame in self.ws:
+                if frame.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = orjson.loads(frame.data)
+                if data.get("type") in ("sent", "error"):
+                    future = self._pending.pop(data.get("request_id"), None)
+                    if future and not future.done():
+                        future.set_result(data)
+                elif data.get("type") == "message":
+                    self._outstanding.add(data["offset"])
+                    self._update_last_offset()
+                    await self.incoming.put(data["message"])
+        except Exception as e:
+            logger.error(f"MCP stream error: {e}")
+        finally:
+            logger.warning("MCP stream closed")
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_result(None)
+            self._pending.clear()
+
+    async def _send_over_stream(self, payloads: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """스트림으로 전송하고 서버 응답 frame 반환 (연결 문제로 결과를 알 수 없으면 None → HTTP 로 재전송)"""
+        self._request_id += 1
+        request_id = self._request_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self.ws.send_json({"type": "publish", "request_id": request_id, "topic": VENDOR_EMAIL_TOPIC,
+                                     "messages": payloads}, dumps=dumps)
+            return await asyncio.wait_for(future, timeout=STREAM_SEND_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"MCP stream send failed: {e}")
+            return None
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def stream_messages(self, credit: int = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        스트림으로 받은 메시지를 하나씩 반환
+        처리 후 ack_stream(receipts) 를 호출해야 credit 이 다시 채워짐
+        """
+        await self.ws.send_json({"type": "credit", "credit": credit or settings.MCP_STREAM_CREDIT}, dumps=dumps)
+        while True:
+            yield await self.incoming.get()
+
+    async def ack_stream(self, messages: List[Dict[str, Any]]):
+        """처리한 메시지 ack + 같은 수만큼 credit 추가"""
+        await self.ws.send_json({"type": "ack", "receipts": [m["receipt"] for m in messages]})
+        await self.ws.send_json({"type": "credit", "credit": len(messages)})
+        for message in messages:
+            self._outstanding.discard(message["id"])
+            self._max_acked = max(self._max_acked, message["id"])
+        self._update_last_offset()
+
+    def _update_last_offset(self):
+        """
+        우선순위 순서로 전달되므로 offset 이 순서대로 오지 않음:
+        ack 하지 않은 메시지가 있으면 그보다 작은 offset 까지만 처리 완료로 봄
+        """
+        if self._outstanding:
+            self.last_offset = min(self._outstanding) - 1
+        else:
+            self.last_offset = self._max_acked
@@ -0,0 +1,208 @@
+import os
+import time
+import random
+import sqlite3
+import asyncio
+import logging
+import threading
+import orjson
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# outbox 항목 종류
+KIND_EMAIL_LOG = "email_log"      # email_logs row + 첨부파일 메타데이터
+KIND_MCP_MESSAGE = "mcp_message"  # MCP 서버 알림
+
+# 같은 배치로 계속 실패한 항목은 이 횟수부터 단건으로 재시도 (한 건의 오류가 배치 전체를 막지 않도록)
+SPLIT_AFTER_ATTEMPTS = 3
+
+
+def _settings():
+    """기본값이 필요할 때만 config 를 import (config 는 import 시 Supabase 클라이언트를 만듦)"""
+    from config import settings
+    return settings
+
+
+class Outbox:
+    """
+    DB 쓰기용 로컬 write-behind outbox (SQLite WAL 저널)
+
+    처리가 끝난 이메일 레코드와 MCP 알림을 먼저 로컬 파일에 기록해 두고,
+    OutboxFlusher 가 배치 단위로 Supabase / MCP 서버에 반영합니다.
+    DB나 MCP 서버 장애 중에도 LLM 처리 결과가 유실되지 않습니다.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or _settings().OUTBOX_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                dedup_key TEXT,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (kind, next_attempt_at, id);
+            CREATE INDEX IF NOT EXISTS idx_outbox_dedup ON outbox (dedup_key, kind);
+        """)
+        self.wakeup = asyncio.Event()
+
+    def append(self, kind: str, payload: Dict[str, Any], dedup_key: Optional[str] = None) -> int:
+        """항목을 저널에 기록 (커밋 후 반환되므로 프로세스가 죽어도 유지됨)"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (kind, dedup_key, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, dedup_key, orjson.dumps(payload, default=str).decode(), now, now)
+            )
+        self.wakeup.set()
+        return cursor.lastrowid
+
+    def append_email_log(self, email_log: Dict[str, Any], attachments: List[Dict[str, Any]]) -> int:
+        """email_logs row 와 첨부파일 row 들을 한 항목으로 기록"""
+        return self.append(
+            KIND_EMAIL_LOG,
+            {"email_log": email_log, "attachments": attachments},
+            dedup_key=email_log.get("message_id")
+        )
+
+    def append_mcp_message(self, message_data: Dict[str, Any]) -> int:
+        """MCP 알림 기록 (같은 message_id 의 email_log 항목이 반영된 뒤에 전송됨)"""
+        return self.append(KIND_MCP_MESSAGE, message_data, dedup_key=message_data.get("message_id"))
+
+    def has_pending(self, kind: str, dedup_key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM outbox WHERE dedup_key = ? AND kind = ? LIMIT 1", (dedup_key, kind)
+            ).fetchone()
+        return row is not None
+
+    def due(self, kind: str, limit: int) -> List[Dict[str, Any]]:
+        """재시도 시간이 지난 항목을 오래된 순서로 조회"""
+        query = "SELECT id, dedup_key, payload, attempts FROM outbox WHERE kind = ? AND next_attempt_at <= ?"
+        if kind == KIND_MCP_MESSAGE:
+            # 이메일 row 가 아직 DB에 반영되지 않은 알림은 보내지 않음
+            query += """ AND NOT EXISTS (
+                SELECT 1 FROM outbox e WHERE e.kind = 'email_log' AND e.dedup_key = outbox.dedup_key
+            )"""
+        query += " ORDER BY id LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, (kind, time.time(), limit)).fetchall()
+        return [
+            {"id": row[0], "dedup_key": row[1], "payload": orjson.loads(row[2]), "attempts": row[3]}
+            for row in rows
+        ]
+
+    def next_due_at(self) -> Optional[float]:
+        """아직 재시도 시간이 되지 않은 항목 중 가장 빠른 재시도 시각"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE next_attempt_at > ?", (time.time(),)
+            ).fetchone()
+        return row[0]
+
+    def ack(self, ids: List[int]):
+        """반영이 끝난 항목 삭제"""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def retry_later(self, entries: List[Dict[str, Any]], error: str, base_delay: float, max_delay: float):
+        """실패한 항목을 지수 백오프(+지터) 후 재시도하도록 표시"""
+        now = time.time()
+        updates = []
+        for entry in entries:
+            attempts = entry["attempts"] + 1
+            delay = min(max_delay, base_delay * (2 ** (attempts - 1)))
+            delay = delay * (0.5 + random.random() / 2)
+            updates.append((attempts, now + delay, error[:500], entry["id"]))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?", updates
+            )
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxFlusher:
+    """outbox 항목을 배치로 Supabase / MCP 서버에 반영하는 백그라운드 작업"""
+
+    def __init__(self, outbox: Outbox, supabase_service, mcp_service,
+                 batch_size: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, idle_interval: float = 5.0):
+        self.outbox = outbox
+        self.supabase = supabase_service
+        self.mcp_service = mcp_service
+        self.batch_size = batch_size or _settings().OUTBOX_BATCH_SIZE
+        self.base_delay = base_delay or _settings().OUTBOX_RETRY_BASE_DELAY
+        self.max_delay = max_delay or _settings().OUTBOX_RETRY_MAX_DELAY
+        self.idle_interval = idle_interval
+
+    async def flush_email_logs(self, entries: List[Dict[str, Any]]):
+        """email_logs row 와 첨부파일 row 들을 배치 전체에 대해 RPC 한 번으로 저장"""
+        await self.supabase.save_email_logs_with_attachments([entry["payload"] for entry in entries])
+
+    async def flush_mcp_messages(self, entries: List[Dict[str, Any]]):
+        """MCP 알림을 한 번의 /send_batch 로 전송 (서버는 배치 전체를 저장하거나 전체를 거절)"""
+        if not await self.mcp_service.send_messages([entry["payload"] for entry in entries]):
+            raise RuntimeError(f"MCP batch send failed ({len(entries)} messages)")
+
+    async def _flush_batch(self, kind: str, entries: List[Dict[str, Any]]) -> int:
+        handler = self.flush_email_logs if kind == KIND_EMAIL_LOG else self.flush_mcp_messages
+        try:
+            await handler(entries)
+        except Exception as e:
+            logger.error(f"Outbox flush failed ({kind}, {len(entries)} entries): {e}")
+            self.outbox.retry_later(entries, str(e), self.base_delay, self.max_delay)
+            return 0
+        self.outbox.ack([entry["id"] for entry in entries])
+        return len(entries)
+
+    async def flush_once(self) -> int:
+        """반영 가능한 항목을 한 번 처리하고 처리한 항목 수를 반환"""
+        flushed = 0
+        for kind in (KIND_EMAIL_LOG, KIND_MCP_MESSAGE):
+            entries = self.outbox.due(kind, self.batch_size)
+            fresh = [e for e in entries if e["attempts"] < SPLIT_AFTER_ATTEMPTS]
+            repeated = [e for e in entries if e["attempts"] >= SPLIT_AFTER_ATTEMPTS]
+            if fresh:
+                flushed += await self._flush_batch(kind, fresh)
+            for entry in repeated:
+                flushed += await self._flush_batch(kind, [entry])
+        return flushed
+
+    async def run(self):
+        """새 항목이 들어오거나 재시도 시간이 되면 반영"""
+        logger.info(f"Outbox flusher started ({self.outbox.pending_count()} pending entries)")
+        while True:
+            self.outbox.wakeup.clear()
+            try:
+                if await self.flush_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Outbox flusher error: {e}")
+
+            timeout = self.idle_interval
+            next_due = self.outbox.next_due_at()
+            if next_due is not None:
+                timeout = min(timeout, max(0.0, next_due - time.time()))
+            try:
+                await asyncio.wait_for(self.outbox.wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -1,9 +1,18 @@
+import os
+import sys
 import logging
 from datetime import datetime
 from supabase import create_client, Client
 from config import settings
 from storage3.utils import StorageException
 
+# 프로젝트 루트의 common 패키지 사용
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.models import EmailLogDelivery
+
 logger = logging.getLogger(__name__)
 
 class SupabaseService:
@@ -68,6 +77,27 @@ class SupabaseService:
             logger.error(f"Email data: {email_data}")
             raise
 
+    async def save_email_logs_with_attachments(self, entries):
+        """
+        이메일 로그와 첨부파일 row 들을 RPC 한 번으로 저장 (한 트랜잭션, 중복 방지: message_id)
+        (migrations/save_email_logs_with_attachments.sql)
+        
+        Args:
+            entries: [{"email_log": {...}, "attachments": [{"filename": ..., "mime_type": ...}]}]
+        
+        Returns:
+            Dict[str, int]: message_id -> email_logs.id (이미 저장되어 있던 row 포함)
+        """
+        try:
+            attachment_count = sum(len(entry["attachments"]) for entry in entries)
+            logger.info(f"Saving {len(entries)} email logs with {attachment_count} attachments")
+            response = self.client.rpc("save_email_logs_with_attachments", {"entries": entries}).execute()
+            return {row["saved_message_id"]: row["email_log_id"] for row in response.data}
+        except Exception as e:
+            logger.error(f"Supabase batch insert error: {str(e)}")
+            logger.error(f"Error type: {type(e).__name__}")
+            raise
+
     async def save_attachment(self, email_log_id, attachment_data):
         """첨부파일 데이터 저장"""
         try:
@@ -89,9 +119,10 @@ class SupabaseService:
         """스레드의 이메일 히스토리 조회"""
         try:
             logger.info(f"Fetching thread history for thread_id: {thread_id}")
-            response = self.client.from_("email_logs").select("*").eq("thread_id", thread_id).order("sent_at").execute()
+            response = self.client.from_("email_logs").select(EmailLogDelivery.projection()) \
+                .eq("thread_id", thread_id).order("sent_at").execute()
             logger.info(f"Found {len(response.data)} emails in thread")
-            return response.data
+            return EmailLogDelivery.from_rows(response.data)
         except Exception as e:
             logger.error(f"Error getting thread history: {str(e)}")
             logger.error(f"Error type: {type(e).__name__}")
@@ -0,0 +1,68 @@
+# benchmarks/bench_mcp_queue.py
+"""
+MCP 서버 메시지 큐 저장소(MessageStore) 처리량 벤치마크
+
+- enqueue         : /send 와 같은 단건 enqueue
+- lease+ack       : /receive 로 batch 건씩 lease 한 뒤 /ack 로 삭제
+임시 디렉터리의 SQLite 파일을 사용하므로 실제 큐 파일은 건드리지 않습니다.
+
+사용법:
+    python benchmarks/bench_mcp_queue.py --messages 10000 50000 --batch 1 10 100
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from mcp_server.queue_store import MessageStore
+
+RECEIVER = "external_comm_hub"
+PAYLOAD = {"email_data": {"message_id": "m", "subject": "RE: PO-2025-1", "body_text": "x" * 1000}}
+
+
+def bench_enqueue(store, count):
+    started = time.perf_counter()
+    for i in range(count):
+        store.enqueue({"sender": "bench", "receiver": RECEIVER, "type": "vendor_email", "payload": PAYLOAD})
+    return time.perf_counter() - started
+
+
+def bench_lease_ack(store, count, batch):
+    started = time.perf_counter()
+    received = 0
+    while received < count:
+        messages = store.lease(RECEIVER, batch, 60)
+        if not messages:
+            break
+        store.ack(RECEIVER, [m["receipt"] for m in messages])
+        received += len(messages)
+    return time.perf_counter() - started, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP message queue throughput benchmark")
+    parser.add_argument("--messages", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 10, 100], help="/receive max_messages")
+    args = parser.parse_args()
+
+    print(f"{'messages':>9} {'operation':>16} {'elapsed (s)':>12} {'msg/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.messages:
+            for batch in args.batch:
+                store = MessageStore(os.path.join(tmp, f"queue_{count}_{batch}.sqlite3"))
+                elapsed = bench_enqueue(store, count)
+                print(f"{count:>9} {'enqueue':>16} {elapsed:>12.3f} {count / elapsed:>10.0f}")
+                elapsed, received = bench_lease_ack(store, count, batch)
+                name = f"lease+ack x{batch}"
+                print(f"{count:>9} {name:>16} {elapsed:>12.3f} {received / elapsed:>10.0f}")
+                store.close()
+
+
+if __name__ == "__main__":
+    main()
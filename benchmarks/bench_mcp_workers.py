@@ -0,0 +1,135 @@
+# benchmarks/bench_mcp_workers.py
+"""
+MCP 서버 worker 수에 따른 처리량 벤치마크
+
+worker 수별로 mcp_server 를 띄우고, 여러 클라이언트 프로세스가 여러 receiver 로
+/send 한 뒤 /receive + /ack 로 모두 소비하는 데 걸린 시간을 측정합니다.
+큐 파일은 임시 디렉터리를 사용합니다.
+
+사용법:
+    python benchmarks/bench_mcp_workers.py --workers 1 2 4 --messages 20000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import aiohttp
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8799
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+
+def start_server(workers, queue_dir, partitions):
+    env = dict(
+        os.environ,
+        MCP_QUEUE_PATH=os.path.join(queue_dir, "queue.sqlite3"),
+        MCP_QUEUE_PARTITIONS=str(partitions),
+        WORKERS=str(workers),
+        MAX_QUEUE_DEPTH=str(10 ** 9),
+        MAX_QUEUE_BYTES=str(10 ** 12),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "mcp_server.main:app", "--port", str(PORT),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BASE_DIR, env=env,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"{BASE_URL}/receive/warmup", timeout=1)
+            return process
+        except Exception:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("MCP server did not start")
+
+
+async def produce(receivers, count, concurrency):
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        queue = asyncio.Queue()
+        for i in range(count):
+            queue.put_nowait(i)
+
+        async def worker():
+            while not queue.empty():
+                i = queue.get_nowait()
+                async with session.post(f"{BASE_URL}/send", json={
+                    "sender": "bench", "receiver": receivers[i % len(receivers)],
+                    "content": "", "type": "vendor_email", "payload": {"n": i, "body": "x" * 500},
+                }) as response:
+                    await response.read()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def consume(receivers, batch):
+    async with aiohttp.ClientSession() as session:
+        async def drain(receiver):
+            received = 0
+            while True:
+                async with session.get(f"{BASE_URL}/receive/{receiver}", params={"max_messages": batch}) as response:
+                    messages = (await response.json())["messages"]
+                if not messages:
+                    return received
+                async with session.post(f"{BASE_URL}/ack/{receiver}",
+                                        json={"receipts": [m["receipt"] for m in messages]}) as response:
+                    await response.read()
+                received += len(messages)
+
+        return sum(await asyncio.gather(*(drain(r) for r in receivers)))
+
+
+def run_producer(args):
+    receivers, count, concurrency = args
+    asyncio.run(produce(receivers, count, concurrency))
+
+
+def run_consumer(args):
+    receivers, batch = args
+    return asyncio.run(consume(receivers, batch))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP server worker scaling benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--receivers", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=4, help="부하를 만드는 클라이언트 프로세스 수")
+    parser.add_argument("--concurrency", type=int, default=32, help="클라이언트 프로세스당 동시 요청 수")
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=10, help="/receive max_messages")
+    args = parser.parse_args()
+
+    receivers = [f"bench_agent_{i}" for i in range(args.receivers)]
+    # 클라이언트 프로세스마다 receiver 를 나눠 맡음
+    shares = [receivers[i::args.clients] for i in range(args.clients)]
+    per_client = args.messages // args.clients
+
+    print(f"{'workers':>8} {'send msg/s':>12} {'receive+ack msg/s':>18}")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as queue_dir:
+            server = start_server(workers, queue_dir, args.partitions)
+            try:
+                with multiprocessing.Pool(args.clients) as pool:
+                    started = time.perf_counter()
+                    pool.map(run_producer, [(share, per_client, args.concurrency) for share in shares])
+                    send_rate = per_client * args.clients / (time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    received = sum(pool.map(run_consumer, [(share, args.batch) for share in shares]))
+                    receive_rate = received / (time.perf_counter() - started)
+                print(f"{workers:>8} {send_rate:>12.0f} {receive_rate:>18.0f}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# benchmarks/bench_threads_awaiting_reply.py
+"""
+email_threads_awaiting_reply 뷰와 기존 조회 방식 비교 벤치마크
+
+- legacy_n_plus_1 : thread_id 전체 조회 후 thread마다 3개 쿼리 (handle_general_vendor_email_before)
+- legacy_full_scan: email_logs 전체를 본문 포함으로 읽어 Python에서 thread별 최신 메일 추출
+- view            : email_threads_awaiting_reply 뷰 한 번 조회
+
+별도 스키마(bench_threads)에 합성 데이터를 만들어 측정하므로 운영 테이블은 건드리지 않습니다.
+
+사용법:
+    DATABASE_URL=postgresql://... python benchmarks/bench_threads_awaiting_reply.py --rows 10000 100000 1000000
+"""
+
+import argparse
+import os
+import time
+
+import psycopg2
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATION_PATH = os.path.join(BASE_DIR, "external_communication", "migrations", "email_threads_awaiting_reply.sql")
+
+SCHEMA = "bench_threads"
+MESSAGES_PER_THREAD = 5
+BODY_SIZE = 2000
+
+CREATE_TABLE = f"""
+CREATE TABLE {SCHEMA}.email_logs (
+    id bigint generated by default as identity primary key,
+    thread_id text,
+    message_id text,
+    po_number varchar(50),
+    subject text,
+    body text,
+    draft_body text,
+    sender_email text,
+    recipient_email text,
+    direction text,
+    sender_role text,
+    status text,
+    received_at timestamptz,
+    sent_at timestamptz,
+    created_at timestamptz not null,
+    embedding text
+)
+"""
+
+# thread마다 MESSAGES_PER_THREAD 개의 메일을 admin/vendor 번갈아 생성하고,
+# 약 1/3의 thread는 마지막 메일을 미처리 벤더 수신 메일로 남겨 둔다.
+POPULATE = f"""
+INSERT INTO {SCHEMA}.email_logs (
+    thread_id, message_id, po_number, subject, body, sender_email, recipient_email,
+    direction, sender_role, status, received_at, created_at, embedding
+)
+SELECT
+    't' || (g / {MESSAGES_PER_THREAD}),
+    'm' || g,
+    CASE WHEN g %% {MESSAGES_PER_THREAD} = 0 THEN 'PO-2025-' || (g / {MESSAGES_PER_THREAD}) END,
+    'RE: PO-2025-' || (g / {MESSAGES_PER_THREAD}),
+    repeat('x', {BODY_SIZE}),
+    'vendor@example.com',
+    'buyer@example.com',
+    CASE WHEN is_vendor THEN 'inbound' ELSE 'outgoing' END,
+    CASE WHEN is_vendor THEN 'vendor' ELSE 'admin' END,
+    CASE WHEN is_vendor THEN 'received' ELSE 'sent' END,
+    now() - make_interval(secs => %(rows)s - g),
+    now() - make_interval(secs => %(rows)s - g),
+    repeat('0.0123,', 1536)
+FROM (
+    SELECT g,
+           CASE
+               WHEN g %% {MESSAGES_PER_THREAD} = {MESSAGES_PER_THREAD} - 1
+                   THEN (g / {MESSAGES_PER_THREAD}) %% 3 = 0
+               ELSE g %% 2 = 1
+           END AS is_vendor
+    FROM generate_series(0, %(rows)s - 1) AS g
+) s
+"""
+
+
+def setup(cur, rows):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    cur.execute(CREATE_TABLE)
+    cur.execute(POPULATE, {"rows": rows})
+    with open(MIGRATION_PATH, encoding="utf-8") as f:
+        cur.execute(f.read())
+    cur.execute("ANALYZE email_logs")
+
+
+def run_view(cur, sample_threads):
+    cur.execute("SELECT * FROM email_threads_awaiting_reply ORDER BY created_at")
+    return len(cur.fetchall())
+
+
+def run_full_scan(cur, sample_threads):
+    cur.execute("SELECT * FROM email_logs ORDER BY created_at DESC")
+    latest_by_thread = {}
+    for row in cur.fetchall():
+        latest_by_thread.setdefault(row[1], row)
+    return sum(1 for row in latest_by_thread.values() if row[10] == "vendor")
+
+
+def run_n_plus_1(cur, sample_threads):
+    cur.execute("SELECT thread_id FROM email_logs WHERE thread_id IS NOT NULL AND thread_id <> ''")
+    threads = sorted({row[0] for row in cur.fetchall()})
+    if sample_threads:
+        threads = threads[:sample_threads]
+    found = 0
+    for thread_id in threads:
+        cur.execute(
+            "SELECT sender_role FROM email_logs WHERE thread_id = %s ORDER BY created_at DESC LIMIT 1",
+            (thread_id,),
+        )
+        if cur.fetchone()[0] == "admin":
+            continue
+        cur.execute(
+            "SELECT * FROM email_logs WHERE thread_id = %s AND sender_role = 'vendor' "
+            "AND direction IN ('inbound', 'incoming') AND draft_body IS NULL "
+            "ORDER BY created_at DESC LIMIT 1",
+            (thread_id,),
+        )
+        if not cur.fetchone():
+            continue
+        cur.execute(
+            "SELECT po_number FROM email_logs WHERE thread_id = %s AND po_number IS NOT NULL "
+            "ORDER BY created_at ASC LIMIT 1",
+            (thread_id,),
+        )
+        cur.fetchone()
+        found += 1
+    return found
+
+
+STRATEGIES = [
+    ("view", run_view),
+    ("legacy_full_scan", run_full_scan),
+    ("legacy_n_plus_1", run_n_plus_1),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="email_threads_awaiting_reply benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3, help="전략별 반복 횟수 (최소값 사용)")
+    parser.add_argument("--sample-threads", type=int, default=2_000,
+                        help="N+1 방식은 앞쪽 N개 thread만 측정 후 전체 thread 수로 환산 (0 = 전체)")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    try:
+        print(f"{'rows':>10} {'strategy':>18} {'threads':>8} {'best (s)':>10}")
+        for rows in args.rows:
+            setup(cur, rows)
+            total_threads = rows // MESSAGES_PER_THREAD
+            for name, fn in STRATEGIES:
+                sample = args.sample_threads if name == "legacy_n_plus_1" else 0
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    found = fn(cur, sample)
+                    timings.append(time.perf_counter() - started)
+                best = min(timings)
+                if sample and sample < total_threads:
+                    # 측정한 thread 수 기준으로 전체 thread 수만큼 환산
+                    best = best * total_threads / sample
+                    name = f"{name}*"
+                print(f"{rows:>10} {name:>18} {found:>8} {best:>10.3f}")
+        print("* N+1 방식은 --sample-threads 만큼 측정한 값을 전체 thread 수로 환산한 추정치")
+    finally:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
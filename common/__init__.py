@@ -0,0 +1,14 @@
+"""
+Common Package
+
+여러 에이전트(external_communication, Vendor_email_logger_agent, vector_store, streamlit_ui)가
+함께 사용하는 공통 유틸리티 패키지
+"""
+
+from .pagination import iter_keyset, aiter_keyset, fetch_page
+from .claim_check import EmailBodyResolver
+from .watermark import ScanWatermark
+from .gmail_auth import GmailAuth, get_gmail_auth
+
+__all__ = ['iter_keyset', 'aiter_keyset', 'fetch_page', 'EmailBodyResolver', 'ScanWatermark',
+           'GmailAuth', 'get_gmail_auth']
@@ -0,0 +1,252 @@
+# common/change_feed.py
+"""
+purchase_orders / email_logs row 변경 이벤트 소스
+
+폴링 루프가 변경이 없어도 10~30초마다 테이블을 조회하던 것을, row 가 바뀌었을 때만 깨어나 조회하도록 바꿉니다.
+- PostgresChangeFeed: external_communication/migrations/row_change_notify.sql 의 트리거가 보내는 pg_notify 를 LISTEN (운영)
+  Supabase 프로젝트의 direct connection 문자열(SUPABASE_DB_URL)로 연결합니다.
+- LocalChangeFeed: 같은 프로세스 안에서 publish() 로 이벤트를 넣는 대체 구현 (테스트 / DB 연결 정보가 없을 때)
+
+이벤트는 "다시 조회할 때가 됐다"는 신호로만 쓰고 데이터는 기존 쿼리로 읽으므로,
+연결이 끊긴 사이에 놓친 알림은 재연결 시 RESYNC 이벤트와 resync 간격의 주기 조회로 복구됩니다.
+
+사용 예:
+    feed = create_change_feed()
+    subscription = feed.subscribe("email_logs", predicate=lambda c: c.row.get("status") == "draft")
+    while True:
+        ... 기존 조회 / 처리 ...
+        await subscription.wait(feed.idle_timeout(10))
+"""
+
+import os
+import re
+import select
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = "row_changes"
+# 실시간 알림을 받는 동안에도 놓친 변경이 없도록 이 간격(초)마다 한 번은 조회
+DEFAULT_RESYNC_INTERVAL = 300.0
+# 이벤트가 몰려 올 때 한 번의 조회로 묶기 위해 첫 이벤트 뒤 기다리는 시간 (초)
+DEBOUNCE_SECONDS = 0.2
+RECONNECT_MAX_DELAY = 60.0
+
+RESYNC = "RESYNC"  # 재연결 등으로 놓친 이벤트가 있을 수 있음 → 전체 다시 조회
+
+# email_logs 수신 메일의 direction 값 (로거는 inbound, 이전 코드 / 수동 입력 row 는 incoming)
+INBOUND_DIRECTIONS = ("inbound", "incoming")
+
+
+class RowChange:
+    """row 변경 이벤트 (row 에는 트리거가 보낸 식별 / 상태 컬럼만 있음)"""
+    __slots__ = ("table", "op", "row")
+
+    def __init__(self, table: str, op: str, row: Optional[Dict[str, Any]] = None):
+        self.table = table
+        self.op = op
+        self.row = row or {}
+
+    @classmethod
+    def from_payload(cls, payload: str) -> "RowChange":
+        data = orjson.loads(payload)
+        return cls(data.get("table", ""), data.get("op", ""), data.get("row"))
+
+    def __repr__(self) -> str:
+        return f"RowChange({self.table!r}, {self.op!r}, {self.row!r})"
+
+
+# === 폴링 루프들이 사용하는 predicate ===
+
+def is_po_ready_to_send(change: RowChange) -> bool:
+    """발행 확정됐지만 아직 벤더에게 보내지 않은 PO"""
+    row = change.row
+    return change.op != "DELETE" and row.get("update_status") == "issued" \
+        and bool(row.get("human_confirmed")) and row.get("submitted_at") is None
+
+
+def is_new_po(change: RowChange) -> bool:
+    return change.op == "INSERT" and change.row.get("submitted_at") is None
+
+
+def is_inbound_email(change: RowChange) -> bool:
+    """새로 저장된 벤더 수신 메일"""
+    return change.op == "INSERT" and change.row.get("direction") in INBOUND_DIRECTIONS
+
+
+def is_draft(change: RowChange) -> bool:
+    return change.op != "DELETE" and change.row.get("status") == "draft"
+
+
+class Subscription:
+    """한 테이블의 변경 이벤트를 받는 큐 (predicate 가 있으면 조건에 맞는 이벤트만, RESYNC 는 항상 받음)"""
+
+    def __init__(self, table: str, predicate: Optional[Callable[[RowChange], bool]] = None):
+        self.table = table
+        self.predicate = predicate
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def matches(self, change: RowChange) -> bool:
+        if change.op == RESYNC:
+            return True
+        if change.table != self.table:
+            return False
+        try:
+            return self.predicate is None or bool(self.predicate(change))
+        except Exception:
+            return True
+
+    def deliver(self, change: RowChange):
+        """다른 스레드에서도 호출 가능"""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, change)
+
+    async def wait(self, timeout: Optional[float]) -> List[RowChange]:
+        """
+        이벤트가 올 때까지 최대 timeout 초 대기하고, 이어서 몰려 온 이벤트까지 한 번에 반환
+        timeout 까지 이벤트가 없으면 빈 목록 (호출 측은 그래도 한 번 조회 → 주기적 resync)
+        """
+        try:
+            first = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return []
+        await asyncio.sleep(DEBOUNCE_SECONDS)
+        changes = [first]
+        while not self.queue.empty():
+            changes.append(self.queue.get_nowait())
+        return changes
+
+
+class ChangeFeed:
+    """이벤트 소스 공통 부분: 구독 관리와 이벤트 전달"""
+
+    # 실제 DB 변경 알림을 받는지 (아니면 호출 측이 기존 폴링 간격으로 조회)
+    live = False
+
+    def __init__(self, resync_interval: float = DEFAULT_RESYNC_INTERVAL):
+        self.resync_interval = resync_interval
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, table: str, predicate: Optional[Callable[[RowChange], bool]] = None) -> Subscription:
+        subscription = Subscription(table, predicate)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def idle_timeout(self, polling_interval: float) -> float:
+        """이벤트가 없을 때 다음 조회까지 기다릴 시간"""
+        return self.resync_interval if self.live else polling_interval
+
+    def emit(self, change: RowChange):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.matches(change):
+                subscription.deliver(change)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class LocalChangeFeed(ChangeFeed):
+    """프로세스 내부 이벤트 소스 (테스트에서 DB 대신 publish 로 변경을 알림)"""
+
+    def __init__(self, resync_interval: float = DEFAULT_RESYNC_INTERVAL, live: bool = False):
+        super().__init__(resync_interval)
+        self.live = live
+
+    def publish(self, table: str, op: str, row: Optional[Dict[str, Any]] = None):
+        self.emit(RowChange(table, op, row))
+
+
+class PostgresChangeFeed(ChangeFeed):
+    """
+    Postgres LISTEN/NOTIFY 이벤트 소스
+    별도 스레드에서 psycopg2 연결로 LISTEN 하고, 연결이 끊기면 지수 백오프로 재연결 후 RESYNC 이벤트를 보냄
+    """
+
+    live = True
+
+    def __init__(self, dsn: str, channel: str = DEFAULT_CHANNEL,
+                 resync_interval: float = DEFAULT_RESYNC_INTERVAL):
+        super().__init__(resync_interval)
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", channel):
+            raise ValueError(f"invalid channel name: {channel}")
+        self.dsn = dsn
+        self.channel = channel
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _listen(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        delay = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                logger.info(f"Listening for row changes on channel {self.channel}")
+                delay = 1.0
+                # 연결 전 / 끊긴 동안의 변경은 알 수 없으므로 한 번 전체 조회하게 함
+                self.emit(RowChange("*", RESYNC))
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self.emit(RowChange.from_payload(notify.payload))
+                        except orjson.JSONDecodeError:
+                            logger.warning(f"Ignoring malformed change notification: {notify.payload[:200]}")
+            except Exception as e:
+                logger.warning(f"Change feed connection error, reconnecting in {delay:.0f}s: {e}")
+                self._stop.wait(delay)
+                delay = min(RECONNECT_MAX_DELAY, delay * 2)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+def create_change_feed(dsn: Optional[str] = None, resync_interval: Optional[float] = None) -> ChangeFeed:
+    """
+    SUPABASE_DB_URL(또는 dsn)이 있으면 PostgresChangeFeed, 없으면 LocalChangeFeed
+    (LocalChangeFeed 는 live=False 라 호출 측이 기존 폴링 간격으로 조회)
+    """
+    dsn = dsn or os.getenv("SUPABASE_DB_URL")
+    interval = resync_interval or float(os.getenv("CHANGE_FEED_RESYNC_INTERVAL", DEFAULT_RESYNC_INTERVAL))
+    if dsn:
+        feed = PostgresChangeFeed(dsn, resync_interval=interval)
+        feed.start()
+        return feed
+    logger.info("SUPABASE_DB_URL not set, change feed falls back to polling intervals")
+    return LocalChangeFeed(interval)
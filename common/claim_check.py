@@ -0,0 +1,99 @@
+# common/claim_check.py
+"""
+claim-check MCP 메시지의 이메일 본문 조회
+
+Vendor_email_logger_agent 는 MCP 메시지에 이메일 본문 / 첨부파일 대신 message_id 와 라우팅 필드만 싣고
+(payload["claim_check"] = True), 본문은 email_logs 에 한 번만 저장합니다.
+consumer 는 EmailBodyResolver 로 message_id 에 해당하는 email_logs row 를 조회해 email_data 를 채웁니다.
+email_logs row 는 저장 후 본문이 바뀌지 않으므로 message_id 기준 LRU 캐시를 프로세스 안에서 공유합니다.
+
+사용 예:
+    resolver = EmailBodyResolver(supabase)
+    for message in messages:
+        email_data = resolver.resolve(message["payload"])
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .models import EmailLogWithBody
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class EmailBodyResolver:
+    """message_id 로 email_logs 본문을 조회해 claim-check payload 를 원래 email_data 형태로 복원"""
+
+    def __init__(self, client, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.client = client
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, EmailLogWithBody]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, message_id: str) -> Optional[EmailLogWithBody]:
+        with self._lock:
+            row = self._cache.get(message_id)
+            if row is not None:
+                self._cache.move_to_end(message_id)
+            return row
+
+    def _remember(self, rows: List[EmailLogWithBody]):
+        with self._lock:
+            for row in rows:
+                self._cache[row.message_id] = row
+                self._cache.move_to_end(row.message_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def fetch(self, message_ids: List[str]) -> Dict[str, EmailLogWithBody]:
+        """캐시에 없는 message_id 만 한 번의 쿼리로 조회"""
+        found = {}
+        missing = []
+        for message_id in dict.fromkeys(message_ids):
+            row = self._cached(message_id)
+            if row is not None:
+                found[message_id] = row
+            else:
+                missing.append(message_id)
+        if missing:
+            response = self.client.table("email_logs") \
+                .select(EmailLogWithBody.projection()) \
+                .in_("message_id", missing) \
+                .execute()
+            rows = EmailLogWithBody.from_rows(response.data)
+            self._remember(rows)
+            found.update((row.message_id, row) for row in rows)
+        return found
+
+    @staticmethod
+    def _merge(email_data: Dict[str, Any], row: Optional[EmailLogWithBody]) -> Dict[str, Any]:
+        if row is None:
+            return email_data
+        return {
+            **email_data,
+            "body_text": row.body or "",
+            "po_number": row.po_number,
+            "sender_email": row.sender_email,
+            "status": row.status,
+            "email_log_id": row.id,
+        }
+
+    def resolve(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """payload 의 email_data 반환 (claim-check 메시지면 본문을 채워서)"""
+        return self.resolve_many([payload])[0]
+
+    def resolve_many(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """여러 메시지의 email_data 를 한 번의 조회로 복원 (배치 수신용)"""
+        message_ids = [
+            p["email_data"]["message_id"] for p in payloads
+            if p.get("claim_check") and p.get("email_data", {}).get("message_id")
+        ]
+        rows = self.fetch(message_ids) if message_ids else {}
+        results = []
+        for payload in payloads:
+            email_data = payload.get("email_data", {})
+            if payload.get("claim_check"):
+                email_data = self._merge(email_data, rows.get(email_data.get("message_id")))
+            results.append(email_data)
+        return results
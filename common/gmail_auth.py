@@ -0,0 +1,179 @@
+# common/gmail_auth.py
+"""
+Gmail credential / service 공유 provider
+
+external_communication(email_draft_confirm, send_po_email_and_update_thread)과 Vendor_email_logger_agent 의
+authenticate_gmail 이 호출될 때마다 token 파일을 읽고, 필요하면 토큰을 갱신하고, discovery 문서로 service 를 새로 만들던 것을
+token 파일별로 프로세스에서 하나씩 공유하는 GmailAuth 로 대신합니다.
+- credential 은 한 번만 읽고, 만료 REFRESH_MARGIN 초 전에 백그라운드 타이머가 미리 갱신해 token 파일에 저장합니다
+  (요청 중에 만료되어 여러 스레드가 동시에 갱신하지 않도록).
+- discovery 문서는 google-api-python-client 에 포함된 정적 문서를 한 번만 읽어 두고 service 생성에 재사용합니다.
+- googleapiclient 의 service 는 스레드 간에 공유하면 안 되므로 스레드마다 한 번 만들어 캐시합니다
+  (같은 스레드의 두 번째 호출부터는 캐시 조회만 함).
+
+google 라이브러리는 Gmail 을 쓰는 에이전트에만 설치되어 있으므로 처음 인증 / 생성할 때 import 합니다.
+
+사용 예:
+    auth = get_gmail_auth(TOKEN_PATH, CREDENTIALS_PATH, SCOPES)
+    service = auth.service()
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+API_NAME = "gmail"
+API_VERSION = "v1"
+REFRESH_MARGIN = 300  # 만료 몇 초 전에 미리 갱신할지
+REFRESH_RETRY_SECONDS = 60
+
+_documents: Dict[Tuple[str, str], Optional[dict]] = {}
+_documents_lock = threading.Lock()
+
+
+def discovery_document(api: str = API_NAME, version: str = API_VERSION) -> Optional[dict]:
+    """라이브러리에 포함된 정적 discovery 문서 (한 번만 읽어서 캐시, 없으면 None)"""
+    key = (api, version)
+    with _documents_lock:
+        if key not in _documents:
+            from googleapiclient.discovery_cache import get_static_doc
+            content = get_static_doc(api, version)
+            _documents[key] = json.loads(content) if content else None
+        return _documents[key]
+
+
+class GmailAuth:
+    """token 파일 하나의 credential 과 스레드별 Gmail service 를 관리"""
+
+    def __init__(self, token_path: str, credentials_path: str, scopes: Sequence[str], port: int = 0,
+                 refresh_margin: float = REFRESH_MARGIN):
+        self.token_path = token_path
+        self.credentials_path = credentials_path
+        self.scopes = list(scopes)
+        self.port = port
+        self.refresh_margin = refresh_margin
+        self._creds = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._timer: Optional[threading.Timer] = None
+
+    # === credential ===
+
+    def _load_credentials(self):
+        """token 파일을 읽고, 없거나 갱신할 수 없으면 브라우저 인증"""
+        from google.oauth2.credentials import Credentials
+
+        creds = None
+        if os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(self.token_path, self.scopes)
+        if creds and (creds.valid or creds.refresh_token):
+            return creds
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        if not os.path.exists(self.credentials_path):
+            raise FileNotFoundError(f"credentials.json file not found at {self.credentials_path}")
+        flow = InstalledAppFlow.from_client_secrets_file(self.credentials_path, self.scopes)
+        creds = flow.run_local_server(port=self.port)
+        self._save(creds)
+        return creds
+
+    def _refresh_credentials(self, creds):
+        from google.auth.transport.requests import Request
+
+        creds.refresh(Request())
+        self._save(creds)
+        logger.info(f"Refreshed Gmail token (expires at {creds.expiry})")
+
+    def _save(self, creds):
+        tmp_path = f"{self.token_path}.tmp"
+        with open(tmp_path, "w") as token:
+            token.write(creds.to_json())
+        os.replace(tmp_path, self.token_path)
+
+    def _expiring(self, creds) -> bool:
+        expiry = getattr(creds, "expiry", None)
+        if expiry is None:
+            return not creds.valid
+        return (expiry - datetime.utcnow()).total_seconds() < self.refresh_margin
+
+    def credentials(self):
+        """공유 credential (만료가 가까우면 갱신 후 반환)"""
+        creds = self._creds
+        if creds is not None and not self._expiring(creds):
+            return creds
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load_credentials()
+            if self._expiring(self._creds):
+                self._refresh_credentials(self._creds)
+            self._schedule_refresh(self._creds)
+            return self._creds
+
+    def _schedule_refresh(self, creds, delay: Optional[float] = None):
+        """만료 refresh_margin 초 전에 갱신하는 타이머 (lock 안에서 호출)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if delay is None:
+            expiry = getattr(creds, "expiry", None)
+            if expiry is None:
+                return
+            delay = max(0.0, (expiry - datetime.utcnow()).total_seconds() - self.refresh_margin)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            if self._creds is None:
+                return
+            try:
+                if self._expiring(self._creds):
+                    self._refresh_credentials(self._creds)
+                self._schedule_refresh(self._creds)
+            except Exception as e:
+                logger.warning(f"Gmail token refresh failed, retrying in {REFRESH_RETRY_SECONDS}s: {e}")
+                self._schedule_refresh(self._creds, REFRESH_RETRY_SECONDS)
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    # === service ===
+
+    def _build_service(self, creds):
+        document = discovery_document()
+        if document is not None:
+            from googleapiclient.discovery import build_from_document
+            return build_from_document(document, credentials=creds)
+        from googleapiclient.discovery import build
+        return build(API_NAME, API_VERSION, credentials=creds, cache_discovery=False)
+
+    def service(self) -> Any:
+        """현재 스레드의 Gmail service (credential 은 모든 service 가 공유하므로 갱신도 함께 반영됨)"""
+        creds = self.credentials()
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self._build_service(creds)
+        return service
+
+
+_providers: Dict[Tuple[str, Tuple[str, ...]], GmailAuth] = {}
+_providers_lock = threading.Lock()
+
+
+def get_gmail_auth(token_path: str, credentials_path: str, scopes: Sequence[str], port: int = 0) -> GmailAuth:
+    """token 파일 / scope 별로 프로세스에서 공유하는 GmailAuth"""
+    key = (os.path.abspath(token_path), tuple(scopes))
+    with _providers_lock:
+        auth = _providers.get(key)
+        if auth is None:
+            auth = _providers[key] = GmailAuth(token_path, credentials_path, scopes, port)
+        return auth
@@ -0,0 +1,197 @@
+# common/mcp_client.py
+"""
+MCP 서버용 비동기 HTTP 클라이언트
+
+external_communication(mcp_runner)과 Vendor_email_logger_agent 가 함께 사용합니다.
+requests 로 매 호출마다 새 TCP 연결을 열고 asyncio 루프 전체를 막던 방식 대신,
+aiohttp 세션 하나의 keep-alive 연결 풀을 재사용하고 요청마다 timeout 을 둡니다.
+연결 오류 / timeout / 429 / 5xx 는 지터를 준 지수 백오프로 재시도합니다
+(/send 는 idempotency key 로 서버에서 중복이 걸러지므로 재시도해도 안전합니다).
+
+사용 예:
+    client = get_mcp_client()
+    messages = await client.receive("external_comm_hub", max_messages=10, wait=20)
+    await client.ack("external_comm_hub", [m["receipt"] for m in messages])
+"""
+
+import os
+import random
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import orjson
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "http://localhost:8000"
+DEFAULT_TIMEOUT = 10.0  # long polling 대기 시간을 제외한 요청 timeout (초)
+DEFAULT_POOL_SIZE = 20  # 동시에 열어 둘 최대 연결 수
+KEEPALIVE_TIMEOUT = 60  # 유휴 연결을 풀에 남겨 둘 시간 (초)
+DEFAULT_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 10.0
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class MCPError(Exception):
+    """재시도 후에도 MCP 서버 요청이 실패함"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def _dumps(obj: Any) -> str:
+    return orjson.dumps(obj, default=str).decode()
+
+
+class MCPClient:
+    """keep-alive 연결 풀을 공유하는 MCP 서버 클라이언트"""
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT,
+                 pool_size: int = DEFAULT_POOL_SIZE, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.base_url = (base_url or os.getenv("MCP_SERVER_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_attempts = max_attempts
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def ensure_session(self) -> aiohttp.ClientSession:
+        """세션이 없으면 생성 (실행 중인 이벤트 루프 안에서 만들어야 함)"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                json_serialize=_dumps,
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.ensure_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @staticmethod
+    def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+        """Retry-After 가 있으면 그 값, 없으면 full jitter 지수 백오프"""
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+    async def request(self, method: str, path: str, wait: float = 0, **kwargs) -> Dict[str, Any]:
+        """
+        요청 1건 (실패 시 재시도) 후 JSON 응답 반환
+        wait: 서버가 응답을 보류할 수 있는 시간 (long polling), timeout 에 더해짐
+        """
+        session = await self.ensure_session()
+        timeout = aiohttp.ClientTimeout(total=wait + self.timeout)
+        last_error = None
+        for attempt in range(self.max_attempts):
+            retry_after = None
+            try:
+                async with session.request(method, f"{self.base_url}{path}", timeout=timeout, **kwargs) as response:
+                    if response.status < 400:
+                        return await response.json(loads=orjson.loads)
+                    detail = await response.text()
+                    if response.status not in RETRY_STATUSES:
+                        raise MCPError(f"{method} {path} failed: {response.status} {detail}", response.status)
+                    retry_after = response.headers.get("Retry-After")
+                    last_error = MCPError(f"{method} {path} failed: {response.status} {detail}", response.status)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                last_error = MCPError(f"{method} {path} failed: {type(e).__name__} {e}")
+            if attempt + 1 < self.max_attempts:
+                delay = self._retry_delay(attempt, retry_after)
+                logger.warning(f"{last_error} - retrying in {delay:.1f}s ({attempt + 1}/{self.max_attempts})")
+                await asyncio.sleep(delay)
+        raise last_error
+
+    async def send(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """메시지 1건 전송 (message: sender / receiver / type / payload ...)"""
+        return await self.request("POST", "/send", json=message)
+
+    async def send_batch(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """메시지 여러 건 전송 (서버가 전체를 저장하거나 전체를 거절)"""
+        return await self.request("POST", "/send_batch", json={"messages": messages})
+
+    async def receive(self, agent_id: str, max_messages: int = 10, wait: float = 0,
+                      visibility_timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        메시지를 최대 max_messages 건 수신 (처리 후 ack 하지 않으면 visibility timeout 후 재전달됨)
+        wait > 0 이면 메시지가 도착하거나 wait 초가 지날 때까지 서버가 응답을 보류 (long polling)
+        """
+        params = {"max_messages": max_messages, "wait": wait}
+        if visibility_timeout is not None:
+            params["visibility_timeout"] = visibility_timeout
+        response = await self.request("GET", f"/receive/{agent_id}", wait=wait, params=params)
+        return response.get("messages", [])
+
+    async def ack(self, agent_id: str, receipts: List[str]) -> int:
+        """처리한 메시지 ack (같은 receipt 를 다시 보내도 안전)"""
+        if not receipts:
+            return 0
+        response = await self.request("POST", f"/ack/{agent_id}", json={"receipts": receipts})
+        return response.get("acked", 0)
+
+    async def extend(self, agent_id: str, receipts: List[str], visibility_timeout: float) -> int:
+        """처리 중인 메시지의 lease 를 지금부터 visibility_timeout 초로 연장"""
+        if not receipts:
+            return 0
+        response = await self.request("POST", f"/extend/{agent_id}",
+                                      json={"receipts": receipts, "visibility_timeout": visibility_timeout})
+        return response.get("extended", 0)
+
+    # === topic / consumer group ===
+
+    async def subscribe(self, topic: str, group: str) -> Dict[str, Any]:
+        """consumer group 을 topic 에 등록 (이미 등록되어 있으면 현재 상태 반환)"""
+        return await self.request("PUT", f"/topics/{topic}/groups/{group}")
+
+    async def publish(self, topic: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """topic 으로 발행 (구독 중인 group 마다 한 번씩 전달, message 에 receiver 없음)"""
+        return await self.request("POST", f"/topics/{topic}/publish", json={"messages": messages})
+
+    async def receive_group(self, topic: str, group: str, member: str, max_messages: int = 10,
+                            wait: float = 0, visibility_timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """group member 로 수신 (같은 group 의 live member 들과 메시지를 나눠 받음)"""
+        params = {"member": member, "max_messages": max_messages, "wait": wait}
+        if visibility_timeout is not None:
+            params["visibility_timeout"] = visibility_timeout
+        response = await self.request("GET", f"/topics/{topic}/groups/{group}/receive", wait=wait, params=params)
+        return response.get("messages", [])
+
+    async def ack_group(self, topic: str, group: str, receipts: List[str]) -> int:
+        if not receipts:
+            return 0
+        response = await self.request("POST", f"/topics/{topic}/groups/{group}/ack", json={"receipts": receipts})
+        return response.get("acked", 0)
+
+    async def extend_group(self, topic: str, group: str, receipts: List[str], visibility_timeout: float) -> int:
+        if not receipts:
+            return 0
+        response = await self.request("POST", f"/topics/{topic}/groups/{group}/extend",
+                                      json={"receipts": receipts, "visibility_timeout": visibility_timeout})
+        return response.get("extended", 0)
+
+
+_default_client: Optional[MCPClient] = None
+
+
+def get_mcp_client() -> MCPClient:
+    """프로세스에서 공유하는 기본 클라이언트 (MCP_SERVER_URL 환경변수 사용)"""
+    global _default_client
+    if _default_client is None:
+        _default_client = MCPClient()
+    return _default_client
@@ -0,0 +1,141 @@
+# common/models.py
+"""
+email_logs / purchase_orders / po_items 용 __slots__ 기반 row 모델
+
+폴링 루프에서 select("*") 로 body 나 1536차원 embedding 텍스트까지 매번 가져오지 않도록,
+용도별 projection(읽을 컬럼 목록)을 클래스로 정의합니다.
+각 모델은 dict 대신 __slots__ 객체로 row 를 담아 메모리 사용량을 줄이고,
+기존 코드가 row["subject"], row.get("po_number") 처럼 그대로 쓸 수 있도록 dict 스타일 접근을 지원합니다.
+
+사용 예:
+    response = supabase.table("email_logs").select(EmailLogHeader.projection()).execute()
+    emails = EmailLogHeader.from_rows(response.data)
+"""
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+class RowModel:
+    """projection 컬럼을 __slots__ 로 갖는 row 모델 베이스 클래스"""
+    __slots__ = ()
+    COLUMNS: Tuple[str, ...] = ()
+
+    @classmethod
+    def projection(cls) -> str:
+        """Supabase select() 에 넘길 컬럼 문자열"""
+        return ", ".join(cls.COLUMNS)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]):
+        obj = cls.__new__(cls)
+        for column in cls.COLUMNS:
+            setattr(obj, column, row.get(column))
+        return obj
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> List["RowModel"]:
+        return [cls.from_row(row) for row in rows or []]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        dict.get 과 같음 (projection 컬럼이면 값, NULL 이면 None / 없는 컬럼이면 default)
+        projection 에 없는 컬럼을 읽는 건 select 에서 컬럼을 빠뜨린 버그이므로 debug 실행(assert)에서는 바로 실패
+        """
+        assert key in self.COLUMNS, f"{type(self).__name__} projection has no column {key!r}"
+        return getattr(self, key) if key in self.COLUMNS else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.COLUMNS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.COLUMNS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {column: getattr(self, column) for column in self.COLUMNS}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+# === email_logs ===
+
+class EmailLogHeader(RowModel):
+    """본문 없이 식별자 / 역할 / 상태 / 시간 정보만 담는 email_logs row"""
+    __slots__ = (
+        "id", "thread_id", "message_id", "po_number", "subject",
+        "sender_email", "recipient_email", "direction", "sender_role", "status",
+        "sent_at", "received_at", "created_at",
+    )
+    COLUMNS = __slots__
+
+
+class EmailLogWithBody(EmailLogHeader):
+    """헤더 + 수신 본문 (LLM 분석용)"""
+    __slots__ = ("body",)
+    COLUMNS = EmailLogHeader.COLUMNS + __slots__
+
+
+class EmailLogDraft(EmailLogHeader):
+    """헤더 + 발송 대기 중인 드래프트 본문"""
+    __slots__ = ("draft_body", "email_type")
+    COLUMNS = EmailLogHeader.COLUMNS + __slots__
+
+
+class EmailLogDelivery(EmailLogHeader):
+    """헤더 + 파싱된 배송 날짜 (thread 히스토리 조회용)"""
+    __slots__ = ("parsed_delivery_date",)
+    COLUMNS = EmailLogHeader.COLUMNS + __slots__
+
+
+class ThreadAwaitingReply(EmailLogWithBody):
+    """email_threads_awaiting_reply 뷰 row (thread 에 매핑된 PO 번호 포함)"""
+    __slots__ = ("mapped_po_number",)
+    COLUMNS = EmailLogWithBody.COLUMNS + __slots__
+
+
+# === purchase_orders ===
+
+class PurchaseOrderHeader(RowModel):
+    """PO 상태 확인용 purchase_orders row"""
+    __slots__ = (
+        "id", "po_number", "vendor_name", "vendor_email", "update_status",
+        "human_confirmed", "submitted_at", "eta", "created_at",
+    )
+    COLUMNS = __slots__
+
+
+class PurchaseOrderForEmail(PurchaseOrderHeader):
+    """PO 이메일 드래프트 작성에 필요한 purchase_orders row"""
+    __slots__ = ("issue_date", "currency")
+    COLUMNS = PurchaseOrderHeader.COLUMNS + __slots__
+
+
+# === po_items ===
+
+class PoItem(RowModel):
+    """po_items row"""
+    __slots__ = (
+        "id", "po_number", "item_no", "description", "quantity", "unit_price",
+        "subtotal", "tax", "shipping_fee", "other_fee", "total", "category",
+    )
+    COLUMNS = __slots__
+
+
+# === follow-up ===
+
+class FollowUpCandidate(RowModel):
+    """
+    plan_follow_ups RPC row (external_communication/migrations/plan_follow_ups.sql)
+    kind: eta_missing / eta_reconfirmation / stale
+    """
+    __slots__ = (
+        "kind", "po_number", "eta", "submitted_at", "request_form_id", "vendor_name", "vendor_email",
+        "thread_id", "last_vendor_reply_at", "last_eta_reply_at", "last_reminder_sent_at", "pending_draft_types",
+    )
+    COLUMNS = __slots__
+
+    def has_pending_draft(self, email_type: str) -> bool:
+        """같은 email_type 의 드래프트가 아직 발송 대기 중인지"""
+        return email_type in (self.pending_draft_types or ())
@@ -0,0 +1,111 @@
+# common/pagination.py
+"""
+Supabase(PostgREST) 테이블 전체 스캔용 keyset 페이지네이션
+
+select("*").execute() 한 번으로 전체 테이블을 읽으면 PostgREST max-rows 설정(기본 1000행)에서
+결과가 조용히 잘리거나, 전체 결과가 한꺼번에 메모리에 올라옵니다.
+여기서는 (created_at, id) 순서의 keyset 커서로 한 페이지씩 읽어 메모리 사용량을 일정하게 유지하고,
+빈 페이지가 나올 때까지 읽기 때문에 서버 max-rows 값과 관계없이 모든 행을 돌려줍니다.
+
+주의: order_column(기본 created_at)이 NULL 인 행은 커서로 이어 읽을 수 없으므로 항상 제외되어
+반환되지 않습니다. 전체 스캔 대상 테이블은 해당 컬럼을 NOT NULL(기본값 now())로 유지해야 합니다.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 500
+
+Row = Dict[str, Any]
+Cursor = Tuple[Any, Any]
+
+
+def _select_columns(columns: str, order_column: str, key_column: str) -> str:
+    """커서에 필요한 컬럼이 projection에 없으면 추가"""
+    selected = [c.strip() for c in columns.split(",")]
+    if "*" in selected:
+        return columns
+    for required in (order_column, key_column):
+        if required not in selected:
+            columns = f"{columns}, {required}"
+    return columns
+
+
+def _quote(value: Any) -> str:
+    """PostgREST or= 필터 안에서 쓸 값 (타임스탬프의 ':' '+' 등을 위해 큰따옴표 처리)"""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _page_query(client, table: str, columns: str, where: Optional[Callable], cursor: Optional[Cursor],
+                page_size: int, descending: bool, order_column: str, key_column: str):
+    query = client.table(table).select(_select_columns(columns, order_column, key_column))
+    # NULL 정렬 값은 커서 비교가 불가능하므로 처음부터 제외 (페이지 경계에 따라 누락 여부가 달라지지 않도록)
+    query = query.not_.is_(order_column, "null")
+    if where:
+        query = where(query)
+    if cursor is not None:
+        op = "lt" if descending else "gt"
+        last_order, last_key = cursor
+        query = query.or_(
+            f"{order_column}.{op}.{_quote(last_order)},"
+            f"and({order_column}.eq.{_quote(last_order)},{key_column}.{op}.{_quote(last_key)})"
+        )
+    return query \
+        .order(order_column, desc=descending) \
+        .order(key_column, desc=descending) \
+        .limit(page_size)
+
+
+def fetch_page(client, table: str, columns: str = "*", *, where: Optional[Callable] = None,
+               after: Optional[Cursor] = None, page_size: int = DEFAULT_PAGE_SIZE, descending: bool = False,
+               order_column: str = "created_at", key_column: str = "id") -> List[Row]:
+    """
+    after 커서 다음의 한 페이지만 읽음 (증분 스캔용, after 가 None 이면 처음부터)
+    다음 페이지 커서는 마지막 행의 (order_column, key_column)
+    """
+    query = _page_query(client, table, columns, where, after, page_size, descending, order_column, key_column)
+    return query.execute().data or []
+
+
+def iter_keyset(client, table: str, columns: str = "*", *, where: Optional[Callable] = None,
+                page_size: int = DEFAULT_PAGE_SIZE, descending: bool = False,
+                order_column: str = "created_at", key_column: str = "id") -> Iterator[Row]:
+    """
+    테이블 행을 (order_column, key_column) 순서로 한 페이지씩 읽어 yield 합니다.
+
+    Args:
+        client: Supabase 클라이언트
+        table: 테이블(또는 뷰) 이름
+        columns: select projection (커서 컬럼은 자동 포함)
+        where: 쿼리 빌더에 필터를 추가하는 함수 (예: lambda q: q.eq("status", "draft"))
+        page_size: 페이지 크기 (PostgREST max-rows 보다 커도 결과는 잘리지 않음)
+        descending: 최신순 여부
+        order_column / key_column: keyset 커서 컬럼 (order_column 이 NULL 인 행은 반환되지 않음)
+    """
+    cursor = None
+    while True:
+        query = _page_query(client, table, columns, where, cursor, page_size, descending, order_column, key_column)
+        rows = query.execute().data or []
+        if not rows:
+            return
+        yield from rows
+        cursor = (rows[-1][order_column], rows[-1][key_column])
+
+
+async def aiter_keyset(client, table: str, columns: str = "*", *, where: Optional[Callable] = None,
+                       page_size: int = DEFAULT_PAGE_SIZE, descending: bool = False,
+                       order_column: str = "created_at", key_column: str = "id") -> AsyncIterator[Row]:
+    """
+    iter_keyset 의 async generator 버전.
+    각 페이지 요청은 별도 스레드에서 실행되어 이벤트 루프를 막지 않습니다.
+    """
+    cursor = None
+    while True:
+        query = _page_query(client, table, columns, where, cursor, page_size, descending, order_column, key_column)
+        response = await asyncio.to_thread(query.execute)
+        rows = response.data or []
+        if not rows:
+            return
+        for row in rows:
+            yield row
+        cursor = (rows[-1][order_column], rows[-1][key_column])
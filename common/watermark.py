@@ -0,0 +1,78 @@
+# common/watermark.py
+"""
+증분 스캔용 durable watermark
+
+주기적으로 전체 테이블 / 뷰를 다시 훑는 대신, 마지막으로 확인한 행의 (created_at, id) 커서를
+scan_watermarks 테이블(external_communication/migrations/scan_watermarks.sql)에 이름별로 저장하고
+다음 스캔에서는 그 이후의 행만 읽습니다 (common.pagination.fetch_page 의 after 커서로 사용).
+
+처리에 실패한 행이 있으면 그 앞까지만 watermark 를 옮겨, 실패한 행부터 다음 스캔에서 다시 읽게 합니다.
+
+사용 예:
+    watermark = ScanWatermark(supabase, "vendor_reply")
+    rows = fetch_page(supabase, "email_logs", "id, created_at, thread_id", after=watermark.load())
+    ... 처리 ...
+    watermark.advance(rows, done=lambda row: row["thread_id"] not in failed)
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TABLE = "scan_watermarks"
+
+Cursor = Tuple[Any, Any]
+
+
+def contiguous_cursor(rows: Iterable[Dict[str, Any]], done: Callable[[Dict[str, Any]], bool],
+                      order_column: str = "created_at", key_column: str = "id") -> Optional[Cursor]:
+    """
+    (order_column, key_column) 순서로 정렬된 rows 에서 처음부터 done 이 연속으로 참인 마지막 행의 커서
+    첫 행부터 처리되지 않았으면 None
+    """
+    cursor = None
+    for row in rows:
+        if not done(row):
+            break
+        cursor = (row[order_column], row[key_column])
+    return cursor
+
+
+class ScanWatermark:
+    """이름별 (created_at, id) 커서를 scan_watermarks 에 저장 / 조회"""
+
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+
+    def load(self) -> Optional[Cursor]:
+        """저장된 커서 (처음 실행이면 None)"""
+        response = self.client.table(TABLE) \
+            .select("last_created_at, last_id") \
+            .eq("name", self.name) \
+            .limit(1) \
+            .execute()
+        if not response.data:
+            return None
+        row = response.data[0]
+        return row["last_created_at"], row["last_id"]
+
+    def save(self, cursor: Cursor):
+        last_created_at, last_id = cursor
+        self.client.table(TABLE).upsert({
+            "name": self.name,
+            "last_created_at": last_created_at,
+            "last_id": last_id,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }, on_conflict="name").execute()
+        logger.debug(f"Watermark {self.name} advanced to {cursor}")
+
+    def advance(self, rows: Iterable[Dict[str, Any]], done: Callable[[Dict[str, Any]], bool],
+                order_column: str = "created_at", key_column: str = "id") -> Optional[Cursor]:
+        """rows 중 처리가 끝난 연속 구간 끝까지 watermark 를 옮기고 새 커서 반환 (옮길 게 없으면 None)"""
+        cursor = contiguous_cursor(rows, done, order_column, key_column)
+        if cursor is not None:
+            self.save(cursor)
+        return cursor
@@ -1,12 +1,17 @@
 import os
 import sys
-from datetime import datetime
+import asyncio
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
+ROOT_DIR = os.path.dirname(BASE_DIR)
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
 
 from config import settings, supabase
-from email_draft_confirm import authenticate_gmail, send_email
+from email_draft_confirm import authenticate_gmail
+from gmail_sender import GmailSender, fill_po_thread_ids
+from common.models import EmailLogDraft
 
 AUTO_SEND_ENABLED = False  # safe mode
 
@@ -14,14 +19,14 @@ async def handle_draft_send_message(payload: dict):
     print("[📨 DRAFT AGENT] Checking for auto-approved drafts...")
 
     try:
-        response = supabase.table("email_logs").select("*") \
+        response = supabase.table("email_logs").select(EmailLogDraft.projection()) \
             .eq("status", "draft") \
             .eq("auto_approve", True) \
             .eq("email_type", "follow_up_eta_present") \
             .is_("sent_at", "null") \
             .execute()
 
-        drafts = response.data
+        drafts = EmailLogDraft.from_rows(response.data)
         if not drafts:
             print("[ℹ️ DRAFT AGENT] No eligible drafts to send.")
             return
@@ -30,28 +35,11 @@ async def handle_draft_send_message(payload: dict):
             print(f"[🛑 DRAFT AGENT] AUTO_SEND_ENABLED = False → Skipping {len(drafts)} draft(s)")
             return
 
-        service = authenticate_gmail()
+        fill_po_thread_ids(supabase, drafts)
+        sender = GmailSender(supabase, authenticate_gmail, workers=settings.GMAIL_SEND_WORKERS)
+        results = await asyncio.to_thread(sender.send_drafts, drafts)
 
-        for draft in drafts:
-            to_email = draft["recipient_email"]
-            subject = draft["subject"]
-            body = draft["draft_body"]
-
-            thread_id = send_email(service, to_email, subject, body)
-            now = datetime.utcnow().isoformat()
-
-            supabase.table("email_logs").update({
-                "thread_id": thread_id,
-                "status": "sent",
-                "sent_at": now
-            }).eq("id", draft["id"]).execute()
-
-            if draft.get("po_number"):
-                supabase.table("purchase_orders").update({
-                    "submitted_at": now
-                }).eq("po_number", draft["po_number"]).execute()
-
-            print(f"[✅ DRAFT AGENT] Sent draft {draft['id']} to {to_email}")
+        print(f"[✅ DRAFT AGENT] Sent {sum(r.ok for r in results)}/{len(results)} draft(s)")
 
     except Exception as e:
         print(f"[❌ DRAFT AGENT ERROR] {e}")
\ No newline at end of file
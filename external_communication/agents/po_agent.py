@@ -1,27 +1,30 @@
 import os
 import sys
+import socket
+import asyncio
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 
-from po_issued_vendor_email import fetch_po_context, create_and_save_draft
+from config import settings
+from po_issued_vendor_email import draft_pending_pos
+
+# po_draft_claims 의 claimed_by 에 기록되는 worker 이름
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
 
 async def handle_po_message(payload: dict):
+    """
+    MCP 메시지 수신: type = 'new_po' (또는 poll_new_pos)
+    payload: {"po_number": ...} 또는 {} — 특정 PO 만 처리하지 않고, 드래프트 작업을 claim 할 수 있는 PO 를 모두 처리
+    claim / lease 로 PO 당 한 worker 만 드래프트를 만들므로 같은 PO 로 여러 번 호출되어도 드래프트는 한 번만 저장됨
+    draft_pending_pos (Supabase / OpenAI 동기 호출) 는 이벤트 루프를 막지 않도록 별도 스레드에서 실행
+    """
     try:
-        po_id = payload.get("po_id")
-        if not po_id:
-            print("[⚠️ PO AGENT] No po_id provided in payload.")
-            return
-
-        print(f"[📦 PO AGENT] Fetching context for PO ID: {po_id}")
-        context = fetch_po_context(po_id)
-
-        print(f"[✏️ PO AGENT] Generating and saving email draft...")
-        draft = create_and_save_draft(context)
-
-        print(f"[✅ PO AGENT] Draft created for PO: {context['po']['po_number']}")
-        print(f"Subject: {draft['subject']}")
-        print(f"Body:\n{draft['body']}")
+        trigger = payload.get("po_number") or payload.get("po_id") or "poll"
+        print(f"[📦 PO AGENT] Drafting claimed POs (trigger: {trigger})")
+        drafted = await asyncio.to_thread(draft_pending_pos, WORKER_ID, settings.PO_DRAFT_WORKERS)
+        if drafted:
+            print(f"[✅ PO AGENT] {drafted} PO drafts created")
 
     except Exception as e:
-        print(f"[❌ PO AGENT ERROR] {e}")
\ No newline at end of file
+        print(f"[❌ PO AGENT ERROR] {e}")
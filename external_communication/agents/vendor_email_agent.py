@@ -0,0 +1,32 @@
+import os
+import sys
+import asyncio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+ROOT_DIR = os.path.dirname(BASE_DIR)
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from config import supabase
+from handle_general_vendor_email import handle_vendor_emails_async, handle_general_vendor_email_async
+from common.claim_check import EmailBodyResolver
+
+# claim-check 메시지의 본문 조회 (message_id 기준 캐시를 메시지 간 공유)
+_resolver = EmailBodyResolver(supabase)
+
+async def handle_vendor_email_message(payload: dict):
+    """
+    MCP 메시지 수신: type = 'vendor_email' (Vendor_email_logger_agent 가 email_logs 저장 뒤 전송)
+    payload: {"email_data": {"message_id", "thread_id", "subject", "from", "to", "direction", "sent_at"}, "claim_check": True}
+    message_id 로 email_logs 본문을 조회해 해당 thread 의 답장 드래프트만 작성
+    """
+    email_data = await asyncio.to_thread(_resolver.resolve, payload)
+    if not email_data.get("email_log_id"):
+        # claim-check 가 아닌 메시지 (본문만 있고 email_logs id 가 없음) → 기존 증분 스캔으로 처리
+        print(f"[📬 VENDOR EMAIL AGENT] No email_logs row for {email_data.get('message_id')}, running reply scan...")
+        await handle_general_vendor_email_async()
+        return
+
+    drafts = await handle_vendor_emails_async([email_data])
+    print(f"[📬 VENDOR EMAIL AGENT] {email_data.get('message_id')} → {len(drafts)} draft(s)")
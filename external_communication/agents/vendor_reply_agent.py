@@ -6,7 +6,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 sys.path.append(os.path.join(BASE_DIR, "utils"))
 
-from handle_general_vendor_email import handle_general_vendor_email
+from handle_general_vendor_email import handle_general_vendor_email_async
 from utils.attachment_parser import extract_text_from_attachments
 
 async def handle_vendor_reply_message(payload: dict):
@@ -16,6 +16,6 @@ async def handle_vendor_reply_message(payload: dict):
     """
     print("[📬 VENDOR REPLY AGENT] Running general reply handler...")
     try:
-        handle_general_vendor_email()
+        await handle_general_vendor_email_async()
     except Exception as e:
         print(f"[❌ VENDOR REPLY AGENT ERROR] {e}")
\ No newline at end of file
@@ -1,8 +1,10 @@
 # aggregate_context_blocks.py
 
 import os
+import asyncio
 from openai import OpenAI
 from dotenv import load_dotenv
+from openai_clients import get_async_openai
 from supabase import create_client
 
 load_dotenv()
@@ -18,7 +20,9 @@ def find_best_matching_table(info_keyword):
         model="text-embedding-ada-002",
         input=info_keyword
     ).data[0].embedding
+    return match_table(embedding)
 
+def match_table(embedding):
     result = supabase.rpc("match_vector_schema", {
         "query_embedding": embedding,
         "match_count": 1
@@ -31,7 +35,9 @@ def find_most_relevant_record(table_name, query_text):
         model="text-embedding-ada-002",
         input=query_text
     ).data[0].embedding
+    return match_record(table_name, embedding)
 
+def match_record(table_name, embedding):
     result = supabase.rpc("match_vector_records", {
         "query_embedding": embedding,
         "match_count": 1,
@@ -59,4 +65,30 @@ def aggregate_context_blocks(info_needed, query_text):
             if record:
                 contexts.append((table, record["content"], record["id"]))
 
-    return contexts 
\ No newline at end of file
+    return contexts
+
+async def aggregate_context_blocks_async(info_needed, query_text):
+    """
+    aggregate_context_blocks 의 비동기 버전 (결과 순서 / 내용은 같음)
+    키워드와 query_text 임베딩을 한 번의 요청으로 만들고, 테이블 / 레코드 검색 RPC 는 동시에 실행합니다.
+    query_text 임베딩은 테이블마다 다시 만들지 않고 공유합니다.
+    """
+    if not info_needed:
+        return []
+    response = await get_async_openai(OPENAI_API_KEY).embeddings.create(
+        model="text-embedding-ada-002",
+        input=[*info_needed, query_text]
+    )
+    embeddings = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    query_embedding = embeddings.pop()
+
+    # Supabase 클라이언트는 동기라 스레드에서 실행
+    tables = await asyncio.gather(*(asyncio.to_thread(match_table, e) for e in embeddings))
+    unique_tables = [t for t in dict.fromkeys(tables) if t]
+    records = await asyncio.gather(*(asyncio.to_thread(match_record, t, query_embedding) for t in unique_tables))
+
+    return [
+        (table, record["content"], record["id"])
+        for table, record in zip(unique_tables, records)
+        if record
+    ]
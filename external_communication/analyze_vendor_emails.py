@@ -2,7 +2,7 @@ import os
 import json
 from dotenv import load_dotenv
 from supabase import create_client
-from llm_extract_info_needs import llm_extract_info_needs
+from llm_extract_info_needs import llm_extract_info_needs, llm_extract_info_needs_async
 
 # Load environment variables
 load_dotenv()
@@ -35,6 +35,14 @@ def analyze_email_content(subject: str, body: str, po_number: str = None) -> dic
     result_json_str = llm_extract_info_needs(subject, cleaned_body)
     return json.loads(result_json_str)
 
+async def analyze_email_content_async(subject: str, body: str, po_number: str = None) -> dict:
+    """analyze_email_content 의 비동기 버전"""
+    cleaned_body = strip_quoted_text(body)
+    if not cleaned_body or len(cleaned_body) < 10:
+        print("⚠️ Body seems empty or too short after cleanup.")
+    result_json_str = await llm_extract_info_needs_async(subject, cleaned_body)
+    return json.loads(result_json_str)
+
 def analyze_unprocessed_vendor_emails():
     print("🔍 Fetching unprocessed vendor emails...")
 
@@ -1,7 +1,7 @@
 # external_communication/config.py
 
 from pydantic_settings import BaseSettings
-from typing import List, ClassVar
+from typing import Dict, List, ClassVar
 import os
 from dotenv import load_dotenv
 from supabase import create_client
@@ -24,6 +24,33 @@ class AgentSettings(BaseSettings):
 
     # MCP
     MCP_SERVER_URL: str = os.getenv("MCP_SERVER_URL", "http://localhost:8000")
+    # mcp_dispatch_loop: message type 별 동시 처리 수 / 핸들러 타임아웃 (초)
+    # vendor_reply / follow_up_check 핸들러는 전체 스캔이라 같은 type 을 동시에 실행하면 드래프트가 중복될 수 있어 1
+    # new_po 핸들러는 claim 가능한 PO 를 PO_DRAFT_WORKERS 개씩 동시에 처리하므로 1
+    DISPATCH_CONCURRENCY: Dict[str, int] = {
+        "new_po": 1,
+        "send_draft_email": 2,
+        "vendor_reply": 1,
+        "vendor_email": 4,  # 메일 한 건의 thread 만 처리 (같은 thread 는 ThreadFanout 이 한 번에 하나만)
+        "follow_up_check": 1,
+    }
+    DISPATCH_TIMEOUTS: Dict[str, float] = {
+        "new_po": 600,
+        "send_draft_email": 60,
+        "vendor_reply": 600,  # thread 들을 VENDOR_REPLY_CONCURRENCY 개씩 동시에 처리하는 전체 스캔
+        "vendor_email": 300,
+        "follow_up_check": 600,
+    }
+    DISPATCH_MAX_PENDING: int = 50  # 받아 두고 아직 처리하지 않은 메시지 최대 수
+    # 받아 둔 메시지의 lease (이 시간 안에 ack 하지 않으면 MCP 서버가 재전달)
+    # 큐에서 기다리거나 처리 중인 메시지는 DISPATCH_EXTEND_INTERVAL 마다 lease 를 다시 이 시간으로 연장
+    DISPATCH_VISIBILITY_TIMEOUT: float = 900
+    DISPATCH_EXTEND_INTERVAL: float = 300
+    DISPATCH_METRICS_INTERVAL: float = 300  # 처리 통계 출력 간격 (초)
+    # PO 발행 이메일 드래프트를 동시에 작성하는 worker 수 (po_draft_claims 로 PO 당 한 worker 만 처리)
+    PO_DRAFT_WORKERS: int = 4
+    # 드래프트를 동시에 발송하는 worker 수 (Gmail quota 는 gmail_sender.QuotaLimiter 가 worker 들이 나눠 쓰도록 제한)
+    GMAIL_SEND_WORKERS: int = 4
 
     # 기타 설정
     POLL_INTERVAL: int = 60  # 초
@@ -0,0 +1,217 @@
+# external_communication/dispatcher.py
+"""
+MCP 메시지 type 별 worker pool 디스패처
+
+mcp_dispatch_loop 가 메시지를 하나씩 await 하면 LLM 을 쓰는 느린 핸들러 하나가 다른 type 의 메시지까지 막습니다.
+TypedDispatcher 는 type 마다 큐와 worker 를 따로 두어 서로 다른 type 의 메시지를 동시에 처리하고,
+type 별 동시 실행 수 / 타임아웃 / 처리 통계를 관리합니다.
+
+기존 핸들러는 async 함수지만 내부에서 Supabase / OpenAI / Gmail 을 동기로 호출하므로,
+offload=True (기본값) 인 핸들러는 별도 스레드의 이벤트 루프에서 실행해 메인 루프를 막지 않게 합니다.
+
+처리에 성공한 메시지(또는 핸들러가 없는 type)의 receipt 만 on_ack 로 넘기고,
+실패한 메시지는 ack 하지 않아 MCP 서버의 visibility timeout 후 다시 전달됩니다.
+스레드에서 실행 중인 핸들러는 중단할 수 없으므로 타임아웃은 기록 / 로그만 남기고 (실패로 세지 않음),
+offload=False 인 핸들러는 타임아웃 시 취소되어 다시 전달됩니다.
+
+on_extend 를 주면 받아 둔 메시지(큐에서 대기 중이거나 처리 중인 메시지, 타임아웃을 넘겨 계속 실행 중인 offload 핸들러 포함)의
+lease 를 extend_interval 마다 연장합니다. max_pending 개를 한 번에 받아 type 별 큐에서 오래 기다리더라도
+처리 중에 visibility timeout 이 지나 MCP 서버가 같은 메시지를 다시 전달하지 않습니다.
+"""
+
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+Handler = Callable[[dict], Awaitable[Any]]
+
+
+class HandlerStats:
+    """
+    type 별 처리 통계
+    timed_out 은 타임아웃을 넘긴 실행 수 (offload 핸들러는 끝까지 실행되므로 succeeded / failed 에도 함께 집계됨)
+    """
+    __slots__ = ("received", "succeeded", "failed", "timed_out", "in_flight", "runs", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def record(self, seconds: float):
+        self.runs += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "in_flight": self.in_flight,
+            "avg_seconds": round(self.total_seconds / self.runs, 3) if self.runs else 0.0,
+            "max_seconds": round(self.max_seconds, 3),
+        }
+
+
+class _Route:
+    __slots__ = ("handler", "concurrency", "timeout", "offload", "queue", "stats")
+
+    def __init__(self, handler: Handler, concurrency: int, timeout: Optional[float], offload: bool):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.offload = offload
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.stats = HandlerStats()
+
+
+def _run_in_thread(handler: Handler, payload: dict):
+    """핸들러 coroutine 을 현재 스레드의 새 이벤트 루프에서 실행 (asyncio.to_thread 용)"""
+    return asyncio.run(handler(payload))
+
+
+class TypedDispatcher:
+    """
+    사용 예:
+        dispatcher = TypedDispatcher(on_ack=ack_receipts)
+        dispatcher.register("vendor_reply", handle_vendor_reply_message, concurrency=1, timeout=300)
+        await dispatcher.start()
+        await dispatcher.submit(messages)
+    """
+
+    def __init__(self, on_ack: Callable[[List[str]], Awaitable[Any]], max_pending: int = 100,
+                 ack_interval: float = 1.0, on_extend: Optional[Callable[[List[str]], Awaitable[Any]]] = None,
+                 extend_interval: float = 60.0):
+        self.on_ack = on_ack
+        self.on_extend = on_extend
+        self.max_pending = max_pending
+        self.ack_interval = ack_interval
+        self.extend_interval = extend_interval
+        self._held: Dict[str, None] = {}  # 받아 두고 아직 처리가 끝나지 않은 메시지의 receipt (lease 연장 대상)
+        self.routes: Dict[str, _Route] = {}
+        self.unknown_count = 0
+        self._capacity = asyncio.Semaphore(max_pending)
+        self._pending = 0  # 큐에 있거나 처리 중인 메시지 수
+        self._pending_acks: List[str] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, msg_type: str, handler: Handler, concurrency: int = 1,
+                 timeout: Optional[float] = None, offload: bool = True):
+        """msg_type 메시지를 최대 concurrency 개까지 동시에 처리하는 worker 등록"""
+        self.routes[msg_type] = _Route(handler, max(1, concurrency), timeout, offload)
+
+    async def start(self):
+        for msg_type, route in self.routes.items():
+            for _ in range(route.concurrency):
+                self._tasks.append(asyncio.create_task(self._worker(msg_type, route)))
+        self._tasks.append(asyncio.create_task(self._ack_loop()))
+        if self.on_extend is not None:
+            self._tasks.append(asyncio.create_task(self._extend_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self.flush_acks()
+
+    def free_slots(self) -> int:
+        """지금 더 받아도 되는 메시지 수 (receive 의 max_messages 로 사용)"""
+        return self.max_pending - self._pending
+
+    async def submit(self, messages: List[dict]):
+        """수신한 메시지를 type 별 큐에 넣음 (처리 중인 메시지가 max_pending 이면 자리가 날 때까지 대기)"""
+        # 자리가 나기를 기다리는 메시지도 이미 lease 된 상태이므로 연장 대상
+        self._held.update((msg["receipt"], None) for msg in messages if msg["type"] in self.routes)
+        for msg in messages:
+            route = self.routes.get(msg["type"])
+            if route is None:
+                print(f"[⚠️ Unknown Type] {msg['type']}")
+                self.unknown_count += 1
+                self._pending_acks.append(msg["receipt"])
+                continue
+            await self._capacity.acquire()
+            self._pending += 1
+            route.stats.received += 1
+            route.queue.put_nowait(msg)
+
+    async def _worker(self, msg_type: str, route: _Route):
+        while True:
+            msg = await route.queue.get()
+            route.stats.in_flight += 1
+            started = time.perf_counter()
+            try:
+                if route.offload:
+                    await self._run_offloaded(msg_type, route, msg["payload"])
+                else:
+                    try:
+                        await asyncio.wait_for(route.handler(msg["payload"]), timeout=route.timeout)
+                    except asyncio.TimeoutError:
+                        # 취소된 메시지는 ack 하지 않음
+                        route.stats.timed_out += 1
+                        print(f"[⏱️ MCP Handler Timeout] {msg_type}: cancelled after {route.timeout}s")
+                        continue
+                route.stats.succeeded += 1
+                self._pending_acks.append(msg["receipt"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # ack 하지 않은 메시지는 visibility timeout 후 다시 전달됨
+                route.stats.failed += 1
+                print(f"[❌ MCP Handler Error] {msg_type}: {e}")
+            finally:
+                self._held.pop(msg["receipt"], None)
+                route.stats.record(time.perf_counter() - started)
+                route.stats.in_flight -= 1
+                self._pending -= 1
+                self._capacity.release()
+
+    async def _run_offloaded(self, msg_type: str, route: _Route, payload: dict):
+        """
+        스레드에서 실행 중인 핸들러는 중단할 수 없으므로, 타임아웃이 지나면 기록만 하고 끝날 때까지 기다림
+        (동시 실행 수가 concurrency 를 넘지 않고, 늦게라도 성공한 메시지는 ack 되어 중복 처리되지 않음)
+        """
+        task = asyncio.ensure_future(asyncio.to_thread(_run_in_thread, route.handler, payload))
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=route.timeout)
+        except asyncio.TimeoutError:
+            route.stats.timed_out += 1
+            print(f"[⏱️ MCP Handler Timeout] {msg_type}: still running after {route.timeout}s")
+            await task
+
+    async def flush_acks(self):
+        if not self._pending_acks:
+            return
+        receipts, self._pending_acks = self._pending_acks, []
+        try:
+            await self.on_ack(receipts)
+        except Exception as e:
+            # ack 실패 시 다음 주기에 다시 시도 (그 전에 재전달되면 새 receipt 로 다시 처리됨)
+            print(f"[❌ MCP Ack Error] {e}")
+            self._pending_acks.extend(receipts)
+
+    async def _ack_loop(self):
+        """처리 완료된 메시지를 ack_interval 마다 한 번에 ack"""
+        while True:
+            await asyncio.sleep(self.ack_interval)
+            await self.flush_acks()
+
+    async def _extend_loop(self):
+        """받아 둔 메시지의 lease 를 extend_interval 마다 연장 (실패하면 다음 주기에 다시 시도)"""
+        while True:
+            await asyncio.sleep(self.extend_interval)
+            receipts = list(self._held)
+            if not receipts:
+                continue
+            try:
+                await self.on_extend(receipts)
+            except Exception as e:
+                print(f"[❌ MCP Extend Error] {e}")
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """type 별 통계 (큐 대기 수 포함)"""
+        return {
+            msg_type: {**route.stats.to_dict(), "queued": route.queue.qsize()}
+            for msg_type, route in self.routes.items()
+        }
@@ -2,13 +2,6 @@
 
 import os
 import sys
-import base64
-from datetime import datetime
-from email.mime.text import MIMEText
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 from dotenv import load_dotenv
 
 # 프로젝트 루트(=po_agent_os) 경로
@@ -16,7 +9,12 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv(dotenv_path=os.path.join(BASE_DIR, '.env'))
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Vendor_email_logger_agent'))
-from config import supabase
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+from config import settings, supabase
+from common.models import EmailLogDraft
+from common.gmail_auth import get_gmail_auth
+from gmail_sender import GmailSender, fill_po_thread_ids
 
 # Gmail API scopes
 SCOPES = ['https://www.googleapis.com/auth/gmail.send', 'https://www.googleapis.com/auth/gmail.modify']
@@ -26,48 +24,20 @@ CREDENTIALS_PATH = os.path.join(BASE_DIR, 'credentials.json')
 TOKEN_PATH = os.path.join(BASE_DIR, 'token.json')
 
 def authenticate_gmail():
-    """Authenticate and return a Gmail API service."""
-    creds = None
-    if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                CREDENTIALS_PATH, SCOPES
-            )
-            creds = flow.run_local_server(port=0)
-        with open(TOKEN_PATH, 'w') as token:
-            token.write(creds.to_json())
-    service = build('gmail', 'v1', credentials=creds)
-    return service
-
-def create_message(to_email, subject, body_text):
-    """Create a MIME email message."""
-    message = MIMEText(body_text, "plain")
-    message["to"] = to_email
-    message["subject"] = subject
-    raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    return {"raw": raw_message}
-
-def send_email(service, to_email, subject, body):
-    """Send an email using the Gmail API."""
-    message = create_message(to_email, subject, body)
-    sent_message = service.users().messages().send(userId="me", body=message).execute()
-    return sent_message.get("threadId")
+    """Return a Gmail API service (credentials and services are cached process-wide by common.gmail_auth)."""
+    return get_gmail_auth(TOKEN_PATH, CREDENTIALS_PATH, SCOPES).service()
 
 def confirm_and_send_drafts():
-    """Display drafts for human confirmation and send emails upon approval."""
-    service = authenticate_gmail()
-
-    response = supabase.table("email_logs").select("*").eq("status", "draft").is_("sent_at", "null").execute()
-    drafts = response.data
+    """Display drafts for human confirmation, then send the approved ones together."""
+    response = supabase.table("email_logs").select(EmailLogDraft.projection()) \
+        .eq("status", "draft").is_("sent_at", "null").execute()
+    drafts = EmailLogDraft.from_rows(response.data)
 
     if not drafts:
         print("No drafts available for confirmation.")
-        return
+        return []
 
+    approved = []
     for draft in drafts:
         print("\n--- Draft Preview ---")
         print(f"ID: {draft['id']}")
@@ -79,39 +49,21 @@ def confirm_and_send_drafts():
         decision = input("Send this email? (y/n): ").strip().lower()
 
         if decision == 'y':
-            try:
-                # Step 1: Send the email
-                thread_id = send_email(
-                    service,
-                    to_email=draft["recipient_email"],
-                    subject=draft["subject"],
-                    body=draft["draft_body"]
-                )
-
-                # Step 2: Update email_logs
-                now = datetime.utcnow().isoformat()
-                supabase.table("email_logs").update({
-                    "thread_id": thread_id,
-                    "status": "sent",
-                    "sent_at": now
-                }).eq("id", draft["id"]).execute()
-
-                # Step 3: Update purchase_orders if applicable
-                if draft.get("po_number"):
-                    supabase.table("purchase_orders").update({
-                        "submitted_at": now
-                    }).eq("po_number", draft["po_number"]).execute()
-
-                print(f"✅ Successfully sent and updated draft ID: {draft['id']} (thread ID: {thread_id})")
-
-            except Exception as e:
-                print(f"❌ Failed to send email for draft ID {draft['id']}: {e}")
-
+            approved.append(draft)
         elif decision == 'n':
             print(f"Skipping draft ID: {draft['id']}.")
-
         else:
             print("Invalid input. Skipping draft.")
 
+    if not approved:
+        return []
+
+    # Send approved drafts concurrently (replies stay in their Gmail thread) and record them in one update
+    fill_po_thread_ids(supabase, approved)
+    sender = GmailSender(supabase, authenticate_gmail, workers=settings.GMAIL_SEND_WORKERS)
+    results = sender.send_drafts(approved)
+    print(f"📤 Sent {sum(r.ok for r in results)}/{len(results)} approved drafts")
+    return results
+
 if __name__ == "__main__":
     confirm_and_send_drafts() 
\ No newline at end of file
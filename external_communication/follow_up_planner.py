@@ -0,0 +1,60 @@
+# follow_up_planner.py
+"""
+후속 조치(follow-up) 대상 PO 계산
+
+벤더 메일 전체를 읽고 PO 마다 purchase_orders / email_logs 를 다시 조회하던 선택 함수들을
+plan_follow_ups RPC(migrations/plan_follow_ups.sql) 한 번의 호출로 대체합니다.
+세 종류의 대상(eta_missing / eta_reconfirmation / stale)을 함께 계산하고,
+각 대상에는 벤더 이름 / 이메일, 최근 thread, 마지막 리마인더 시각, 발송 대기 중인 드래프트 종류가 포함되어
+드래프트를 만들 때 PO 별 추가 조회가 필요 없습니다.
+
+사용 예:
+    plan = plan_follow_ups(supabase)
+    for candidate in plan.eta_missing:
+        if not candidate.has_pending_draft("follow_up_eta_missing"):
+            ...
+"""
+
+import os
+import sys
+from typing import List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from common.models import FollowUpCandidate
+
+STALE_DAYS = 3  # 발송 후 이 일수가 지나면 stale
+ETA_REPLY_DAYS = 2  # 벤더의 마지막 ETA 언급 후 이 일수가 지나면 재확인
+
+
+class FollowUpPlan:
+    """kind 별 후속 조치 대상 목록"""
+    __slots__ = ("eta_missing", "eta_reconfirmation", "stale")
+
+    def __init__(self):
+        self.eta_missing: List[FollowUpCandidate] = []
+        self.eta_reconfirmation: List[FollowUpCandidate] = []
+        self.stale: List[FollowUpCandidate] = []
+
+    def add(self, candidate: FollowUpCandidate):
+        getattr(self, candidate.kind).append(candidate)
+
+    def __repr__(self) -> str:
+        return (f"FollowUpPlan(eta_missing={len(self.eta_missing)}, "
+                f"eta_reconfirmation={len(self.eta_reconfirmation)}, stale={len(self.stale)})")
+
+
+def plan_follow_ups(client, stale_days: int = STALE_DAYS, eta_reply_days: int = ETA_REPLY_DAYS,
+                    po_numbers: Optional[List[str]] = None) -> FollowUpPlan:
+    """세 종류의 후속 조치 대상을 한 번의 RPC 호출로 계산 (po_numbers 를 주면 그 PO 들만)"""
+    params = {"stale_days": stale_days, "eta_reply_days": eta_reply_days}
+    if po_numbers is not None:
+        params["po_numbers"] = list(po_numbers)
+    response = client.rpc("plan_follow_ups", params).execute()
+    plan = FollowUpPlan()
+    for candidate in FollowUpCandidate.from_rows(response.data):
+        if candidate.kind in FollowUpPlan.__slots__:
+            plan.add(candidate)
+    return plan
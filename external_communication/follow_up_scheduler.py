@@ -0,0 +1,89 @@
+# follow_up_scheduler.py
+"""
+PO 별 다음 후속 조치 시각(due_at) 기반 스케줄러
+
+매시간 깨어나 전체 PO 를 다시 훑던 check_follow_ups / poll_followups 대신,
+follow_up_schedule 테이블(migrations/follow_up_schedule.sql)을 우선순위 큐로 사용합니다.
+ETA / 벤더 답장 / 드래프트 / 리마인더가 바뀌면 DB 트리거가 해당 PO 의 due_at 을 다시 계산하고,
+스케줄러는 가장 이른 due_at 까지 잠들었다가 due 된 PO 만 가져가 처리합니다.
+due_at 이 바뀌면 트리거가 change feed 로 알려 주므로 더 이른 항목이 생겨도 바로 깨어나고,
+할 일이 없을 때의 비용은 resync 간격마다 next_follow_up_in() 조회 한 번입니다.
+
+사용 예:
+    scheduler = FollowUpScheduler(supabase, feed, process_due_follow_ups)
+    await scheduler.run()
+"""
+
+import os
+import sys
+import asyncio
+from typing import Callable, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from common.change_feed import ChangeFeed
+
+BATCH_SIZE = 100  # 한 번에 가져갈 due PO 수
+RETRY_SECONDS = 3600  # 가져갔지만 처리 결과로 다시 계산되지 않은 PO 를 다시 시도할 때까지의 시간
+POLL_INTERVAL = 300  # change feed 가 live 가 아닐 때 스케줄을 다시 확인하는 최대 간격 (초)
+ERROR_RETRY_SECONDS = 60
+
+
+class FollowUpScheduler:
+    """follow_up_schedule 의 due 항목을 due_at 순서로 처리"""
+
+    def __init__(self, client, feed: ChangeFeed, process: Callable[[List[str]], int],
+                 batch_size: int = BATCH_SIZE, retry_seconds: int = RETRY_SECONDS,
+                 poll_interval: float = POLL_INTERVAL):
+        self.client = client
+        self.feed = feed
+        self.process = process
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.poll_interval = poll_interval
+
+    def seconds_until_due(self) -> Optional[float]:
+        """가장 이른 due_at 까지 남은 시간 (스케줄이 비어 있으면 None)"""
+        return self.client.rpc("next_follow_up_in", {}).execute().data
+
+    def take_due(self) -> List[str]:
+        """due 된 PO 를 최대 batch_size 건 가져감 (가져간 항목은 retry_seconds 뒤로 미뤄짐)"""
+        rows = self.client.rpc("take_due_follow_ups", {
+            "batch_size": self.batch_size,
+            "retry_seconds": self.retry_seconds,
+        }).execute().data or []
+        return [row["take_due_follow_ups"] if isinstance(row, dict) else row for row in rows]
+
+    async def run_due(self) -> int:
+        """due 된 PO 가 없을 때까지 처리하고 처리한 PO 수 반환"""
+        processed = 0
+        while True:
+            po_numbers = await asyncio.to_thread(self.take_due)
+            if not po_numbers:
+                return processed
+            print(f"[⏰ FOLLOW-UP] {len(po_numbers)} POs due: {po_numbers}")
+            await asyncio.to_thread(self.process, po_numbers)
+            processed += len(po_numbers)
+
+    def next_timeout(self, seconds_until_due: Optional[float]) -> float:
+        idle = self.feed.idle_timeout(self.poll_interval)
+        if seconds_until_due is None:
+            return idle
+        return min(max(seconds_until_due, 0.0), idle)
+
+    async def run(self):
+        subscription = self.feed.subscribe("follow_up_schedule")
+        try:
+            while True:
+                try:
+                    await self.run_due()
+                    timeout = self.next_timeout(await asyncio.to_thread(self.seconds_until_due))
+                except Exception as e:
+                    print(f"[❌ FOLLOW-UP SCHEDULER ERROR] {e}")
+                    timeout = ERROR_RETRY_SECONDS
+                # 가장 이른 due_at 까지, 또는 스케줄이 바뀌었다는 알림이 올 때까지 대기
+                await subscription.wait(timeout)
+        finally:
+            self.feed.unsubscribe(subscription)
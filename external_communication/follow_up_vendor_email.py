@@ -1,12 +1,19 @@
 # follow_up_vendor_email.py
 
 import os
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime, timedelta, timezone
 from supabase import create_client
 from dotenv import load_dotenv
 from utils.vector_search import find_latest_vendor_reply, find_last_eta_reply
 from openai import OpenAI
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from follow_up_planner import plan_follow_ups
+
 # Load env
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -21,16 +28,9 @@ openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
 def get_stale_pos(days_threshold=3):
     """Get POs that were sent more than X days ago"""
-    cutoff_date = (datetime.utcnow() - timedelta(days=days_threshold)).isoformat()
-
-    po_result = supabase.table("purchase_orders") \
-        .select("*, request_form_id(id, vendor_id(*))") \
-        .not_.is_("submitted_at", "null") \
-        .lt("submitted_at", cutoff_date) \
-        .execute()
-    
-    print(f"🔍 Found {len(po_result.data)} POs sent before {cutoff_date}")
-    return po_result.data
+    stale = plan_follow_ups(supabase, stale_days=days_threshold).stale
+    print(f"🔍 Found {len(stale)} POs sent more than {days_threshold} days ago")
+    return stale
 
 def get_vendor_name(vendor_id):
     """Utility to fetch vendor name by ID"""
@@ -51,68 +51,13 @@ def get_vendor_name(vendor_id):
 
 def get_pos_with_vendor_reply_but_no_eta():
     """Extract POs that have vendor replies but no ETA"""
-    response = supabase.table("email_logs") \
-        .select("id, po_number, created_at") \
-        .eq("sender_role", "vendor") \
-        .order("created_at", desc=True) \
-        .execute()
-
-    pos = []
-    seen = set()
-    for row in response.data:
-        po_number = row["po_number"]
-        if po_number in seen:
-            continue
-        if not po_number or po_number == "None":
-            log_id = row.get("id", "unknown")
-            print(f"⚠️ Skipping email_log ID {log_id} because po_number is invalid (None or 'None').")
-            continue
-        seen.add(po_number)
-        try:
-            po = supabase.table("purchase_orders") \
-                .select("*") \
-                .eq("po_number", po_number) \
-                .is_("eta", "null") \
-                .single() \
-                .execute()
-        except Exception as e:
-            log_id = row.get("id", "unknown")
-            print(f"❌ Error querying purchase_orders for email_log ID {log_id} with po_number {po_number}: {e}")
-            continue
-        if po.data:
-            pos.append(po.data)
+    pos = plan_follow_ups(supabase).eta_missing
     print(f"📌 [ETA Request] POs with vendor reply but no ETA: {len(pos)} found")
     return pos
 
 def get_eta_reconfirmation_pos(days_since_eta_reply=2):
     """Find POs with ETA but no recent vendor response about ETA"""
-    pos = []
-    now = datetime.utcnow()
-
-    # Find POs with existing ETA
-    po_result = supabase.table("purchase_orders") \
-        .select("*, request_form_id(id, vendor_id(*))") \
-        .not_.is_("eta", "null") \
-        .execute()
-
-    for po in po_result.data:
-        rf_id = po["request_form_id"]["id"]
-
-        # Find vendor responses with ETA mentions for this request_form_id
-        logs = supabase.table("email_logs") \
-            .select("created_at, summary") \
-            .eq("request_form_id", rf_id) \
-            .eq("sender_role", "vendor") \
-            .order("created_at", desc=True) \
-            .execute()
-
-        for log in logs.data:
-            summary = (log.get("summary") or "").lower()
-            if "eta" in summary:
-                last_eta_date = datetime.fromisoformat(log["created_at"].replace("Z", ""))
-                if (now - last_eta_date).days >= days_since_eta_reply:
-                    pos.append(po)
-                break  # Only check the most recent ETA mention
+    pos = plan_follow_ups(supabase, eta_reply_days=days_since_eta_reply).eta_reconfirmation
     print(f"📌 [ETA Reconfirmation] POs with ETA but no recent response: {len(pos)} found")
     return pos
 
@@ -159,39 +104,45 @@ def has_pending_draft(po_number: str, email_type: str) -> bool:
         .execute()
     return bool(result.data)
 
-def generate_eta_request_draft(po: dict, vendor_name: str, vendor_email: str) -> bool:
-    """Generate ETA request draft when vendor replied but no ETA provided"""
+def build_eta_request_draft(po, vendor_name: str, vendor_email: str) -> dict:
+    """ETA request draft row (vendor replied but no ETA provided)"""
     po_number = po["po_number"]
-    # Check for existing draft
-    if has_pending_draft(po_number, "follow_up_eta_missing"):
-        print(f"⏭️ Skipping draft: Already pending for PO {po_number}, type: follow_up_eta_missing")
-        return False
-    issue_date = po.get("submitted_at", datetime.utcnow().isoformat())
+    issue_date = po.get("submitted_at") or datetime.utcnow().isoformat()
     try:
         formatted_date = datetime.fromisoformat(issue_date.replace('Z', '')).strftime('%B %d, %Y')
     except:
         formatted_date = issue_date
     subject = f"Follow-up on PO {po_number} — Awaiting ETA"
     body = f"""Dear {vendor_name},\n\nThank you for your recent communication regarding Purchase Order {po_number} (sent on {formatted_date}).\n\nWe would greatly appreciate if you could provide us with the estimated delivery date (ETA) for this order.\n\nThank you for your cooperation.\n\nBest regards,\n{SENDER_NAME}\nProcurement Team"""
+    return {
+        "po_number": po_number,
+        "subject": subject,
+        "draft_body": body,
+        "recipient_email": vendor_email,
+        "status": "draft",
+        "trigger_reason": "eta_missing",
+        "email_type": "follow_up_eta_missing",
+        "sender_role": "system",
+        "direction": "outgoing"
+    }
+
+def generate_eta_request_draft(po: dict, vendor_name: str, vendor_email: str) -> bool:
+    """Generate ETA request draft when vendor replied but no ETA provided"""
+    po_number = po["po_number"]
+    # Check for existing draft
+    if has_pending_draft(po_number, "follow_up_eta_missing"):
+        print(f"⏭️ Skipping draft: Already pending for PO {po_number}, type: follow_up_eta_missing")
+        return False
     try:
-        supabase.table("email_logs").insert({
-            "po_number": po_number,
-            "subject": subject,
-            "draft_body": body,
-            "recipient_email": vendor_email,
-            "status": "draft",
-            "trigger_reason": "eta_missing",
-            "email_type": "follow_up_eta_missing",
-            "sender_role": "system",
-            "direction": "outgoing"
-        }).execute()
+        supabase.table("email_logs").insert(build_eta_request_draft(po, vendor_name, vendor_email)).execute()
         print(f"📩 ETA request draft created for PO: {po_number}")
         return True
     except Exception as e:
         print(f"❌ Error creating ETA request draft for PO {po_number}: {e}")
         return False
 
-def generate_eta_reconfirmation_draft(po, vendor_name, vendor_email, thread_id=None):
+def build_eta_reconfirmation_draft(po, vendor_name, vendor_email, thread_id=None) -> dict:
+    """ETA reconfirmation draft row (thread_id 가 있으면 같은 thread 로 발송됨)"""
     po_number = po["po_number"]
     eta = po["eta"]
     
@@ -210,7 +161,7 @@ Best regards,
 Procurement Team"""
 
     # draft 저장 시 thread_id도 함께 저장
-    supabase.table("email_logs").insert({
+    return {
         "po_number": po["po_number"],
         "recipient_email": vendor_email,
         "subject": subject,
@@ -218,35 +169,113 @@ Procurement Team"""
         "status": "draft",
         "email_type": "follow_up_eta_present",
         "thread_id": thread_id
-    }).execute()
+    }
+
+def generate_eta_reconfirmation_draft(po, vendor_name, vendor_email, thread_id=None):
+    supabase.table("email_logs").insert(
+        build_eta_reconfirmation_draft(po, vendor_name, vendor_email, thread_id=thread_id)
+    ).execute()
+
+    print(f"[✅ DRAFT] Created ETA reconfirmation draft for PO {po['po_number']}")
+
+REMINDER_INTERVAL_DAYS = 2  # 같은 PO 에 ETA 재확인 리마인더를 다시 만들기까지의 최소 간격
 
-    print(f"[✅ DRAFT] Created ETA reconfirmation draft for PO {po_number}")
+def insert_drafts(rows: list) -> int:
+    """드래프트 여러 건을 한 번의 insert 로 저장"""
+    if rows:
+        supabase.table("email_logs").insert(rows).execute()
+    return len(rows)
+
+def plan_follow_up_drafts(plan):
+    """
+    후속 조치 대상에서 만들 드래프트 row 목록 (Phase A: ETA 요청, Phase B: ETA 재확인)
+    같은 종류의 드래프트가 이미 발송 대기 중이거나 벤더 이메일이 없는 PO 는 제외
+    """
+    rows = []
+    for candidate, email_type in (
+        *((c, "follow_up_eta_missing") for c in plan.eta_missing),
+        *((c, "follow_up_eta_present") for c in plan.eta_reconfirmation),
+    ):
+        po_number = candidate.po_number
+        if not candidate.vendor_email:
+            print(f"⚠️ Skipping PO {po_number}: Vendor email is missing")
+            continue
+        if candidate.has_pending_draft(email_type):
+            print(f"⏭️ Skipping draft: Already pending for PO {po_number}, type: {email_type}")
+            continue
+        vendor_name = candidate.vendor_name or "Valued Vendor"
+        if email_type == "follow_up_eta_missing":
+            rows.append(build_eta_request_draft(candidate, vendor_name, candidate.vendor_email))
+        else:
+            rows.append(build_eta_reconfirmation_draft(candidate, vendor_name, candidate.vendor_email,
+                                                       thread_id=candidate.thread_id))
+    return rows
 
 def send_follow_up_emails():
     print("🚀 Starting follow-up process...")
+    # 세 종류의 대상을 한 번에 계산하고, 드래프트는 한 번의 insert 로 저장
+    plan = plan_follow_ups(supabase)
+    print(f"📋 Follow-up plan: {plan}")
 
-    # --- Generate ETA Request Emails ---
-    print("\n📬 [Phase A] Generating emails for POs with vendor reply but no ETA...")
-    eta_missing_replied_pos = get_pos_with_vendor_reply_but_no_eta()
-    for po in eta_missing_replied_pos:
-        vendor_data = po["request_form_id"]["vendor_id"]
-        vendor_name = vendor_data.get("name") or get_vendor_name(vendor_data["id"])
-        vendor_email = vendor_data.get("email")
-        if vendor_email:
-            generate_eta_request_draft(po, vendor_name, vendor_email)
-        else:
-            print(f"⚠️ Skipping PO {po['po_number']}: Vendor email is missing")
-
-    # --- Generate ETA Reminder Emails ---
-    print("\n📬 [Phase B] Generating emails for POs needing ETA reconfirmation...")
-    eta_confirmed_pos = get_eta_reconfirmation_pos()
-    for po in eta_confirmed_pos:
-        vendor_data = po["request_form_id"]["vendor_id"]
-        vendor_name = vendor_data.get("name") or get_vendor_name(vendor_data["id"])
-        vendor_email = vendor_data.get("email")
-        if vendor_email:
-            generate_eta_reconfirmation_draft(po, vendor_name, vendor_email)
-        else:
-            print(f"⚠️ Skipping PO {po['po_number']}: Vendor email is missing")
+    # --- Generate ETA Request / Reminder Emails ---
+    print("\n📬 Generating emails for POs with vendor reply but no ETA, and POs needing ETA reconfirmation...")
+    created = insert_drafts(plan_follow_up_drafts(plan))
+    print(f"📩 {created} follow-up drafts created")
+
+    print("\n🎉 Follow-up process complete!")
+    return created
+
+def _reminder_due(candidate, now: datetime) -> bool:
+    if not candidate.last_reminder_sent_at:
+        return True
+    last_sent_at = datetime.fromisoformat(str(candidate.last_reminder_sent_at).replace("Z", "+00:00"))
+    if last_sent_at.tzinfo is None:
+        last_sent_at = last_sent_at.replace(tzinfo=timezone.utc)
+    return (now - last_sent_at).days >= REMINDER_INTERVAL_DAYS
+
+def process_all_eta_followups():
+    """
+    ETA 재확인 리마인더 (follow_up_check 전체 스캔)
+    대상 계산 1회 + 드래프트 insert 1회 + po_tracking update 1회로, PO 수와 관계없이 요청 수가 일정
+    """
+    now = datetime.now(timezone.utc)
+    plan = plan_follow_ups(supabase)
+    due = [
+        c for c in plan.eta_reconfirmation
+        if c.vendor_email and _reminder_due(c, now) and not c.has_pending_draft("follow_up_eta_present")
+    ]
+    if not due:
+        print("[ℹ️ FOLLOW-UP AGENT] No POs due for ETA reconfirmation")
+        return 0
+
+    insert_drafts([
+        build_eta_reconfirmation_draft(c, c.vendor_name or "Valued Vendor", c.vendor_email, thread_id=c.thread_id)
+        for c in due
+    ])
+    record_reminders([c.po_number for c in due], now)
+    print(f"[📨 FOLLOW-UP AGENT] Generated ETA reconfirmation drafts for {len(due)} POs")
+    return len(due)
+
+def record_reminders(po_numbers: list, now: datetime):
+    """리마인더를 만든 PO 의 po_tracking.last_reminder_sent_at 을 한 번의 update 로 기록"""
+    if po_numbers:
+        supabase.table("po_tracking") \
+            .update({"last_reminder_sent_at": now.replace(tzinfo=None).isoformat()}) \
+            .in_("po_number", po_numbers) \
+            .execute()
 
-    print("\n🎉 Follow-up process complete!") 
\ No newline at end of file
+def process_due_follow_ups(po_numbers: list) -> int:
+    """
+    follow_up_schedule 에서 due 된 PO 만 처리 (FollowUpScheduler 가 호출)
+    ETA 요청 / 재확인 드래프트를 만들고 리마인더를 기록하면 트리거가 각 PO 의 다음 due_at 을 다시 계산
+    """
+    if not po_numbers:
+        return 0
+    now = datetime.now(timezone.utc)
+    plan = plan_follow_ups(supabase, po_numbers=po_numbers)
+    plan.eta_reconfirmation = [c for c in plan.eta_reconfirmation if _reminder_due(c, now)]
+    rows = plan_follow_up_drafts(plan)
+    created = insert_drafts(rows)
+    record_reminders([r["po_number"] for r in rows if r["email_type"] == "follow_up_eta_present"], now)
+    print(f"[📨 FOLLOW-UP] {created} follow-up drafts created for {len(po_numbers)} due POs")
+    return created
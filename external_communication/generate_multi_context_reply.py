@@ -3,13 +3,14 @@
 import os
 from openai import OpenAI
 from dotenv import load_dotenv
+from openai_clients import get_async_openai
 
 # Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
-def generate_multi_context_reply(po_number, info, context_blocks, thread_id, email_subject, email_body):
+def build_reply_prompt(info, context_blocks, email_subject, email_body):
     # Build context text from blocks
     context_text = ""
     if context_blocks:
@@ -42,7 +43,10 @@ Your task:
 - Do NOT add unnecessary explanations or information.
 - Only output the email body (no greeting, no signature, unless context requires).
 """
+    return prompt
 
+def generate_multi_context_reply(po_number, info, context_blocks, thread_id, email_subject, email_body):
+    prompt = build_reply_prompt(info, context_blocks, email_subject, email_body)
     print("[📝 GPT PROMPT]", prompt)
 
     try:
@@ -55,4 +59,20 @@ Your task:
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"❌ Error generating reply: {e}")
-        return None 
\ No newline at end of file
+        return None
+
+async def generate_multi_context_reply_async(po_number, info, context_blocks, thread_id, email_subject, email_body):
+    """generate_multi_context_reply 의 비동기 버전"""
+    prompt = build_reply_prompt(info, context_blocks, email_subject, email_body)
+
+    try:
+        response = await get_async_openai(OPENAI_API_KEY).chat.completions.create(
+            model="gpt-4-turbo-preview",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            max_tokens=1000
+        )
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"❌ Error generating reply: {e}")
+        return None
@@ -0,0 +1,358 @@
+# gmail_sender.py
+"""
+드래프트 발송 서비스 (worker pool + Gmail quota 제한 + thread 이어 쓰기)
+
+send_po_emails_and_update_threads / confirm_and_send_drafts / handle_draft_send_message 가
+드래프트를 한 건씩 messages.send 하고 email_logs / purchase_orders 를 건마다 update 하던 것을 대신합니다.
+- 최대 workers 개의 스레드가 동시에 발송하고, 모든 worker 가 QuotaLimiter 하나로 Gmail per-user quota
+  (초당 quota unit)를 나눠 씁니다. 429 / rateLimitExceeded / 5xx 는 백오프 후 재시도합니다.
+- thread_id 가 있는 드래프트(벤더 답장, PO thread 후속 메일)는 threads.get 으로 마지막 메시지의
+  Message-ID / References / Subject 를 읽어 In-Reply-To / References 헤더와 threadId 를 붙여 같은 thread 로 보냅니다.
+  같은 thread 의 드래프트는 한 worker 가 순서대로 보내고, 직접 만든 Message-ID 로 다음 메일을 이어 붙입니다.
+- 발송 결과는 mark_emails_sent RPC(migrations/mark_emails_sent.sql)로 모아서 한 번에 기록합니다.
+
+googleapiclient 의 service 객체는 스레드 간에 공유하면 안 되므로 worker 스레드마다 service_factory 로 만듭니다.
+(factory 호출은 한 번에 하나씩 - 토큰 갱신 / 최초 인증을 여러 worker 가 동시에 하지 않도록)
+quota 는 Gmail 사용자 단위이므로 limiter 를 넘기지 않으면 프로세스의 모든 GmailSender 가 같은 limiter 를 씁니다.
+
+사용 예:
+    sender = GmailSender(supabase, authenticate_gmail, workers=settings.GMAIL_SEND_WORKERS)
+    results = sender.send_drafts(drafts)
+"""
+
+import re
+import time
+import base64
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from email.mime.text import MIMEText
+from email.utils import make_msgid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_WORKERS = 4
+# Gmail API per-user 제한: 초당 250 quota unit (messages.send 100, threads.get 10)
+QUOTA_UNITS_PER_SECOND = 250
+SEND_UNITS = 100
+THREAD_GET_UNITS = 10
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 32.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = (b"rateLimitExceeded", b"userRateLimitExceeded")
+FLUSH_SIZE = 50  # 발송 결과를 이 건수마다 mark_emails_sent 로 기록
+MARK_ATTEMPTS = 3  # mark_emails_sent 실패 시 재시도 횟수 (그래도 실패하면 다음 flush 때 다시 시도)
+
+_REPLY_PREFIX = re.compile(r"^\s*((re|fw|fwd)\s*:\s*)+", re.IGNORECASE)
+
+
+class QuotaLimiter:
+    """여러 worker 스레드가 공유하는 quota unit token bucket"""
+
+    def __init__(self, units_per_second: float = QUOTA_UNITS_PER_SECOND, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = units_per_second
+        self.capacity = burst or units_per_second
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, units: float):
+        """units 만큼 quota 가 찰 때까지 대기 후 사용"""
+        units = min(units, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= units:
+                    self._tokens -= units
+                    return
+                wait = (units - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def pause(self, seconds: float):
+        """rate limit 응답을 받으면 모든 worker 가 seconds 동안 쉬도록 quota 를 비움"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+_shared_limiter = QuotaLimiter()
+
+
+class SendResult:
+    """드래프트 1건의 발송 결과"""
+    __slots__ = ("draft_id", "po_number", "thread_id", "message_id", "error")
+
+    def __init__(self, draft_id, po_number: Optional[str] = None, thread_id: Optional[str] = None,
+                 message_id: Optional[str] = None, error: Optional[str] = None):
+        self.draft_id = draft_id
+        self.po_number = po_number
+        self.thread_id = thread_id
+        self.message_id = message_id
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_row(self) -> Dict[str, Any]:
+        """mark_emails_sent 의 sent 항목"""
+        return {"id": self.draft_id, "thread_id": self.thread_id,
+                "message_id": self.message_id, "po_number": self.po_number}
+
+    def __repr__(self) -> str:
+        return f"SendResult({self.draft_id!r}, thread_id={self.thread_id!r}, error={self.error!r})"
+
+
+def reply_subject(subject: Optional[str], thread_subject: Optional[str]) -> str:
+    """
+    Gmail 은 Subject 가 같아야 같은 thread 로 묶으므로,
+    드래프트 제목이 thread 제목과 다르면 "Re: <thread 제목>" 으로 보냄
+    """
+    subject = subject or ""
+    if not thread_subject:
+        return subject
+    base = _REPLY_PREFIX.sub("", thread_subject).strip()
+    if _REPLY_PREFIX.sub("", subject).strip() == base:
+        return subject
+    return f"Re: {base}"
+
+
+def create_message(to_email: str, subject: str, body: str, headers: Optional[Dict[str, str]] = None,
+                   thread_id: Optional[str] = None) -> Dict[str, Any]:
+    """Gmail API messages.send 용 body (thread_id 가 있으면 threadId 포함)"""
+    message = MIMEText(body or "", "plain")
+    message["to"] = to_email
+    message["subject"] = subject
+    for name, value in (headers or {}).items():
+        if value:
+            message[name] = value
+    result = {"raw": base64.urlsafe_b64encode(message.as_bytes()).decode()}
+    if thread_id:
+        result["threadId"] = thread_id
+    return result
+
+
+def _error_status(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "resp", None), "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    status = _error_status(error)
+    content = getattr(error, "content", b"") or b""
+    if isinstance(content, str):
+        content = content.encode()
+    return status == 429 or (status == 403 and any(reason in content for reason in RATE_LIMIT_REASONS))
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return _is_rate_limited(error) or _error_status(error) in RETRY_STATUSES
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    resp = getattr(error, "resp", None)
+    value = resp.get("retry-after") if hasattr(resp, "get") else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class GmailSender:
+    """드래프트를 worker pool 로 발송하고 결과를 mark_emails_sent 로 모아서 기록"""
+
+    def __init__(self, client, service_factory: Callable[[], Any], workers: int = DEFAULT_WORKERS,
+                 limiter: Optional[QuotaLimiter] = None, max_attempts: int = MAX_ATTEMPTS,
+                 flush_size: int = FLUSH_SIZE, sleep: Callable[[float], None] = time.sleep):
+        self.client = client
+        self.service_factory = service_factory
+        self.workers = max(1, workers)
+        self.limiter = limiter or _shared_limiter
+        self.max_attempts = max_attempts
+        self.flush_size = flush_size
+        self._sleep = sleep
+        self._local = threading.local()
+        self._factory_lock = threading.Lock()
+        # thread_id -> (마지막 Message-ID, References, Subject)
+        self._thread_headers: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
+        self._headers_lock = threading.Lock()
+
+    def service(self):
+        """현재 worker 스레드 전용 Gmail service"""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            with self._factory_lock:
+                service = self._local.service = self.service_factory()
+        return service
+
+    def _execute(self, request_fn: Callable[[], Any], units: int):
+        """quota 를 받은 뒤 요청 실행, 재시도 가능한 오류는 지수 백오프 후 다시 시도"""
+        for attempt in range(self.max_attempts):
+            self.limiter.acquire(units)
+            try:
+                return request_fn().execute()
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not _is_retryable(e):
+                    raise
+                delay = _retry_after(e) or random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+                if _is_rate_limited(e):
+                    self.limiter.pause(delay)
+                print(f"⏳ Gmail request failed ({e}), retrying in {delay:.1f}s ({attempt + 1}/{self.max_attempts})")
+                self._sleep(delay)
+
+    def thread_headers(self, thread_id: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """thread 마지막 메시지의 (Message-ID, References, Subject), 조회 결과는 캐시"""
+        with self._headers_lock:
+            cached = self._thread_headers.get(thread_id)
+        if cached is not None:
+            return cached
+        thread = self._execute(lambda: self.service().users().threads().get(
+            userId="me", id=thread_id, format="metadata",
+            metadataHeaders=["Message-ID", "References", "Subject"],
+        ), THREAD_GET_UNITS)
+        messages = thread.get("messages") or []
+        headers = {}
+        if messages:
+            for header in messages[-1].get("payload", {}).get("headers", []):
+                headers[header["name"].lower()] = header["value"]
+        subject = None
+        for message in messages:
+            for header in message.get("payload", {}).get("headers", []):
+                if header["name"].lower() == "subject":
+                    subject = header["value"]
+                    break
+            if subject:
+                break
+        result = (headers.get("message-id"), headers.get("references"), subject)
+        with self._headers_lock:
+            self._thread_headers[thread_id] = result
+        return result
+
+    def _remember_sent(self, thread_id: str, message_id_header: str, references: Optional[str], subject: str):
+        with self._headers_lock:
+            first_subject = (self._thread_headers.get(thread_id) or (None, None, None))[2]
+            self._thread_headers[thread_id] = (message_id_header, references, first_subject or subject)
+
+    def send_one(self, draft) -> SendResult:
+        """드래프트 1건 발송 (thread_id 가 있으면 그 thread 에 답장으로)"""
+        thread_id = draft.get("thread_id")
+        subject = draft.get("subject") or ""
+        message_id_header = make_msgid()
+        headers = {"Message-ID": message_id_header}
+        references = None
+        try:
+            if thread_id:
+                last_id, last_refs, thread_subject = self.thread_headers(thread_id)
+                subject = reply_subject(subject, thread_subject)
+                if last_id:
+                    references = f"{last_refs} {last_id}" if last_refs else last_id
+                    headers["In-Reply-To"] = last_id
+                    headers["References"] = references
+            body = create_message(draft.get("recipient_email"), subject, draft.get("draft_body"), headers, thread_id)
+            sent = self._execute(lambda: self.service().users().messages().send(userId="me", body=body), SEND_UNITS)
+        except Exception as e:
+            return SendResult(draft.get("id"), draft.get("po_number"), thread_id, error=str(e))
+        sent_thread_id = sent.get("threadId") or thread_id
+        if sent_thread_id:
+            self._remember_sent(sent_thread_id, message_id_header, references, subject)
+        return SendResult(draft.get("id"), draft.get("po_number"), sent_thread_id, sent.get("id"))
+
+    def _send_group(self, drafts: List[Any]) -> List[SendResult]:
+        """같은 thread 의 드래프트는 순서대로 (앞 메일의 Message-ID 에 이어 붙이도록)"""
+        return [self.send_one(draft) for draft in drafts]
+
+    def mark_sent(self, results: Iterable[SendResult]) -> int:
+        """성공한 발송 결과를 email_logs / purchase_orders 에 한 번에 기록"""
+        rows = [result.to_row() for result in results if result.ok]
+        if not rows:
+            return 0
+        response = self.client.rpc("mark_emails_sent", {
+            "sent": rows,
+            "sent_at": datetime.utcnow().isoformat(),
+        }).execute()
+        return response.data or 0
+
+    def send_drafts(self, drafts: Iterable[Any]) -> List[SendResult]:
+        """
+        드래프트들을 workers 개씩 동시에 발송하고 결과 반환 (입력 순서와 다를 수 있음)
+        thread 가 없는 드래프트는 각각, thread 가 있는 드래프트는 thread 단위로 worker 에 배정
+        """
+        groups: Dict[Any, List[Any]] = {}
+        for draft in drafts:
+            key = draft.get("thread_id") or ("draft", draft.get("id"))
+            groups.setdefault(key, []).append(draft)
+        if not groups:
+            return []
+
+        results: List[SendResult] = []
+        unmarked: List[SendResult] = []
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(groups)), thread_name_prefix="gmail-send") as pool:
+                futures = [pool.submit(self._send_group, group) for group in groups.values()]
+                for future in as_completed(futures):
+                    for result in future.result():
+                        results.append(result)
+                        if result.ok:
+                            print(f"✅ Sent draft ID {result.draft_id} (thread_id: {result.thread_id})")
+                            unmarked.append(result)
+                        else:
+                            print(f"❌ Error sending email for draft ID {result.draft_id}: {result.error}")
+                    # 발송은 끝났는데 기록이 늦어 다시 보내는 일이 없도록 너무 많이 모으지 않음
+                    if len(unmarked) >= self.flush_size and self._flush(unmarked):
+                        unmarked = []
+        finally:
+            # 도중에 예외가 나도 이미 보낸 메일은 기록 (기록하지 않으면 draft 로 남아 다음 주기에 다시 발송됨)
+            if unmarked and not self._flush(unmarked):
+                print(f"🚨 Sent but not recorded, may be sent again: draft IDs {[r.draft_id for r in unmarked]}")
+        return results
+
+    def _flush(self, results: List[SendResult]) -> bool:
+        """mark_sent 를 재시도하며 호출하고 성공 여부 반환 (실패해도 예외를 올리지 않음)"""
+        for attempt in range(MARK_ATTEMPTS):
+            try:
+                self.mark_sent(results)
+                return True
+            except Exception as e:
+                print(f"⚠️ Failed to record {len(results)} sent drafts ({attempt + 1}/{MARK_ATTEMPTS}): {e}")
+                if attempt + 1 < MARK_ATTEMPTS:
+                    self._sleep(min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+        return False
+
+
+def fill_po_thread_ids(client, drafts: List[Any]) -> List[Any]:
+    """
+    thread_id 가 없는 PO 드래프트(후속 메일 등)에 그 PO 의 최근 thread_id 를 채움 (한 번의 조회)
+    PO 발행 메일처럼 아직 thread 가 없는 PO 는 그대로 새 thread 로 발송됨
+    """
+    po_numbers = list(dict.fromkeys(
+        d.get("po_number") for d in drafts if not d.get("thread_id") and d.get("po_number")
+    ))
+    if not po_numbers:
+        return drafts
+    response = client.table("email_logs") \
+        .select("po_number, thread_id") \
+        .in_("po_number", po_numbers) \
+        .not_.is_("thread_id", "null") \
+        .order("created_at", desc=True) \
+        .execute()
+    latest: Dict[str, str] = {}
+    for row in response.data or []:
+        latest.setdefault(row["po_number"], row["thread_id"])
+    for draft in drafts:
+        if not draft.get("thread_id") and draft.get("po_number") in latest:
+            draft.thread_id = latest[draft["po_number"]]
+    return drafts
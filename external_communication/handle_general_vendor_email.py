@@ -1,5 +1,8 @@
 import os
 import sys
+import asyncio
+import logging
+import time
 from datetime import datetime
 from supabase import create_client
 from dotenv import load_dotenv
@@ -8,10 +11,15 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 sys.path.append(os.path.join(BASE_DIR, "utils"))
 
-from analyze_vendor_emails import analyze_email_content
-from aggregate_context_blocks import aggregate_context_blocks as get_context_blocks
-from generate_multi_context_reply import generate_multi_context_reply as generate_reply_draft
-from utils.email_thread_utils import get_latest_thread_id_for_po
+from analyze_vendor_emails import analyze_email_content_async
+from aggregate_context_blocks import aggregate_context_blocks_async as get_context_blocks
+from generate_multi_context_reply import generate_multi_context_reply_async as generate_reply_draft
+from utils.email_thread_utils import get_latest_thread_id_for_po, get_threads_awaiting_reply, get_new_vendor_messages
+from common.watermark import ScanWatermark
+from common.change_feed import INBOUND_DIRECTIONS
+from thread_fanout import ThreadFanout
+
+logger = logging.getLogger(__name__)
 
 # Load Supabase
 load_dotenv()
@@ -19,98 +27,162 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def handle_general_vendor_email():
-    print("[📬 VENDOR AGENT] Scanning vendor replies...")
-    # Step 1: 모든 이메일을 thread_id별로 최신순 정렬하여 가져옴
-    response = supabase.table("email_logs") \
-        .select("*") \
-        .order("created_at", desc=True) \
-        .execute()
-    emails = response.data
-
-    # Step 2: thread_id별로 가장 최근 이메일만 추출
-    latest_by_thread = {}
+# 동시에 답장 드래프트를 만드는 thread 수 (OpenAI rate limit 에 맞춰 조정)
+REPLY_CONCURRENCY = int(os.getenv("VENDOR_REPLY_CONCURRENCY", "8"))
+
+# 증분 스캔: 마지막으로 확인한 벤더 수신 메일 위치 (migrations/scan_watermarks.sql)
+WATERMARK_NAME = "vendor_reply"
+# 한 번의 스캔에서 읽을 새 수신 메일 최대 수 (남은 메일은 다음 스캔에서 이어 읽음)
+SCAN_BATCH = 500
+# watermark 뒤로 늦게 커밋된 메일 등 놓친 thread 를 위해 이 간격(초)마다 한 번은 뷰 전체를 조회
+FULL_SCAN_INTERVAL = float(os.getenv("VENDOR_REPLY_FULL_SCAN_INTERVAL", "3600"))
+_last_full_scan = None
+
+# 처리 중인 thread (스캔이 겹쳐 실행되어도 같은 thread 를 동시에 처리하지 않도록)
+_fanout = ThreadFanout()
+
+async def process_vendor_thread(email):
+    """
+    thread 하나의 최신 벤더 메일 처리: 분석 → context 조회 → 답장 생성 → 드래프트 저장 → processed 표시
+    단계는 thread 안에서 순서대로 실행되고, 다른 thread 는 그 사이 동시에 진행됩니다.
+    저장한 드래프트 row 를 반환 (답장이 필요 없으면 None)
+    """
+    thread_id = email["thread_id"]
+    email_subject = email.get("subject", "")
+    email_body = email.get("body", "")
+    vendor_email = email.get("sender_email", "")
+
+    logger.info(f"📨 Processing email from thread {thread_id}: Subject: {email_subject} | Received at: {email.get('sent_at')}")
+
+    po_number = email.get("mapped_po_number")
+    if po_number:
+        logger.info(f"🔗 Found PO number {po_number} mapped to thread {thread_id}")
+    else:
+        po_number = "UNKNOWN"
+        logger.warning(f"⚠️ Could not determine PO number for thread {thread_id} — proceeding with placeholder.")
+
+    full_input = f"{email_subject}\n\n{email_body}"
+    info = await analyze_email_content_async(email_subject, full_input, po_number)
+    logger.debug("Raw LLM response for info needs (thread %s): %s", thread_id, info)
+
+    if not info.get("reply_needed"):
+        logger.info(f"✅ No reply needed for thread {thread_id}.")
+        return None
+
+    info_needed = info.get("information_needed", [])
+    query_text = email_body
+    context_blocks = await get_context_blocks(info_needed, query_text)
+
+    for block in context_blocks:
+        logger.debug("[🧩 CONTEXT BLOCK] %s", block)
+
+    draft_body = await generate_reply_draft(
+        po_number=po_number,
+        info=info,
+        context_blocks=context_blocks,
+        thread_id=thread_id,
+        email_subject=email_subject,
+        email_body=email_body
+    )
+
+    subject = f"Re: {email_subject}" if email_subject else "Regarding your recent update"
+    draft = {
+        "po_number": po_number,
+        "thread_id": thread_id,
+        "direction": "outbound",
+        "status": "drafted",
+        "draft_body": draft_body,
+        "subject": subject,
+        "sender_role": "system",
+        "sender_email": None,
+        "recipient_email": vendor_email,
+        "created_at": datetime.utcnow().isoformat()
+    }
+    # 드래프트 저장과 원본 메일 processed 표시를 한 트랜잭션으로 (migrations/save_vendor_reply_draft.sql)
+    # 핸들러가 타임아웃으로 취소되어도 RPC 는 스레드에서 끝까지 실행되므로 둘 중 하나만 반영되지 않음
+    draft_id = await asyncio.to_thread(
+        lambda: supabase.rpc("save_vendor_reply_draft", {"draft": draft, "inbound_id": email["id"]}).execute().data
+    )
+    if draft_id is None:
+        logger.info(f"⏭️ Email {email['id']} in thread {thread_id} was already processed, draft discarded.")
+        return None
+
+    logger.info(f"[✅ VENDOR AGENT] Draft created and saved for PO {po_number}")
+    return draft
+
+def _full_scan_due() -> bool:
+    return _last_full_scan is None or time.monotonic() - _last_full_scan >= FULL_SCAN_INTERVAL
+
+async def handle_general_vendor_email_async(concurrency: int = REPLY_CONCURRENCY, full_scan: bool = False):
+    """
+    답장 대기 중인 thread 들을 최대 concurrency 개까지 동시에 처리하고, 저장한 드래프트 목록을 반환
+    thread 마다 최신 벤더 메일 하나만 처리하며, 이미 다른 스캔에서 처리 중인 thread 는 건너뜀
+
+    평소에는 watermark 이후 새로 들어온 벤더 메일의 thread 만 조회하고 (비용이 전체 이력이 아닌 새 메일 수에 비례),
+    처음 실행 / full_scan / FULL_SCAN_INTERVAL 마다 뷰 전체를 조회합니다.
+    """
+    global _last_full_scan
+    logger.info("[📬 VENDOR AGENT] Scanning vendor replies...")
+    watermark = ScanWatermark(supabase, WATERMARK_NAME)
+    cursor = await asyncio.to_thread(watermark.load)
+
+    # Step 1: 최신 메시지가 미처리 벤더 수신 메일인 thread만 DB에서 바로 조회 (PO 매핑 포함)
+    new_messages = []
+    if full_scan or cursor is None or _full_scan_due():
+        pending_threads = await asyncio.to_thread(get_threads_awaiting_reply)
+        _last_full_scan = time.monotonic()
+        if cursor is None:
+            # 처음 실행: 전체 조회로 처리한 뒤 현재 마지막 수신 메일부터 증분 스캔 시작
+            # (여기서 실패한 thread 는 다음 전체 조회에서 다시 처리됨)
+            new_messages = await asyncio.to_thread(get_new_vendor_messages, None, 1, True)
+    else:
+        new_messages = await asyncio.to_thread(get_new_vendor_messages, cursor, SCAN_BATCH)
+        if not new_messages:
+            logger.info("✅ No new vendor emails since last scan.")
+            return []
+        thread_ids = list(dict.fromkeys(m["thread_id"] for m in new_messages))
+        logger.info(f"📥 {len(new_messages)} new vendor emails in {len(thread_ids)} threads since {cursor[0]}")
+        pending_threads = await asyncio.to_thread(get_threads_awaiting_reply, thread_ids)
+
+    # Step 2: 각 thread의 최신 벤더 이메일 처리 (thread 간 동시 실행, 처리하지 못한 thread 에서 watermark 를 멈춤)
+    results, unfinished = await _fanout.run(pending_threads, process_vendor_thread, concurrency)
+
+    # Step 3: 처리가 끝난 메일까지 watermark 이동 (실패한 thread 의 메일부터 다음 스캔에서 다시 읽음)
+    if new_messages:
+        done = (lambda m: True) if cursor is None else (lambda m: m["thread_id"] not in unfinished)
+        await asyncio.to_thread(watermark.advance, new_messages, done)
+    return [draft for draft in results if draft]
+
+def _thread_email(email_data):
+    """claim-check 로 본문을 채운 MCP email_data 를 process_vendor_thread 입력 형태로 변환"""
+    return {
+        "id": email_data["email_log_id"],
+        "thread_id": email_data["thread_id"],
+        "subject": email_data.get("subject") or "",
+        "body": email_data.get("body_text") or "",
+        "sender_email": email_data.get("sender_email") or email_data.get("from") or "",
+        "sent_at": email_data.get("sent_at"),
+        "mapped_po_number": email_data.get("po_number"),
+    }
+
+async def handle_vendor_emails_async(emails, concurrency: int = REPLY_CONCURRENCY):
+    """
+    MCP vendor_email 메시지로 받은 메일의 thread 만 바로 처리하고, 저장한 드래프트 목록을 반환
+    email_logs 에서 본문을 채운 (EmailBodyResolver) 미처리 수신 메일만 대상이며, thread 마다 마지막 메일 하나만 처리
+    같은 메일은 다음 증분 스캔에서도 보이지만 processed 로 표시된 뒤라 다시 처리하지 않음
+    """
+    latest = {}
     for email in emails:
-        thread_id = email.get("thread_id")
-        if not thread_id:
+        if not email.get("email_log_id") or not email.get("thread_id"):
+            continue
+        if email.get("direction") not in INBOUND_DIRECTIONS or email.get("status") == "processed":
             continue
-        if thread_id not in latest_by_thread:
-            latest_by_thread[thread_id] = email
-
-    # Step 3: 각 thread의 최신 이메일만 검사
-    for thread_id, email in latest_by_thread.items():
-        try:
-            # Step 3 조건: vendor inbound, status != processed
-            if not (
-                email.get("direction") == "inbound" and
-                email.get("sender_role") == "vendor" and
-                email.get("status") != "processed"
-            ):
-                continue
-
-            email_subject = email.get("subject", "")
-            email_body = email.get("body", "")
-            vendor_email = email.get("sender_email", "")
-
-            print(f"📨 Processing email from thread {thread_id}: Subject: {email_subject} | Received at: {email.get('sent_at')}")
-
-            po_response = supabase.table("email_logs") \
-                .select("po_number") \
-                .eq("thread_id", thread_id) \
-                .neq("po_number", None) \
-                .limit(1) \
-                .execute()
-
-            if po_response.data:
-                po_number = po_response.data[0]["po_number"]
-                print(f"🔗 Found PO number {po_number} mapped to thread {thread_id}")
-            else:
-                po_number = "UNKNOWN"
-                print("⚠️ Could not determine PO number — proceeding with placeholder.")
-
-            full_input = f"{email_subject}\n\n{email_body}"
-            info = analyze_email_content(email_subject, full_input, po_number)
-            print("Raw LLM response for info needs:")
-            print(info)
-
-            if not info.get("reply_needed"):
-                print("✅ No reply needed for this email.")
-                continue
-
-            info_needed = info.get("information_needed", [])
-            query_text = email_body
-            context_blocks = get_context_blocks(info_needed, query_text)
-
-            for block in context_blocks:
-                print("[🧩 CONTEXT BLOCK]", block)
-
-            draft_body = generate_reply_draft(
-                po_number=po_number,
-                info=info,
-                context_blocks=context_blocks,
-                thread_id=thread_id,
-                email_subject=email_subject,
-                email_body=email_body
-            )
-
-            subject = f"Re: {email_subject}" if email_subject else "Regarding your recent update"
-            supabase.table("email_logs").insert({
-                "po_number": po_number,
-                "thread_id": thread_id,
-                "direction": "outbound",
-                "status": "drafted",
-                "draft_body": draft_body,
-                "subject": subject,
-                "sender_role": "system",
-                "sender_email": None,
-                "recipient_email": vendor_email,
-                "created_at": datetime.utcnow().isoformat()
-            }).execute()
-
-            # Step 4: 해당 이메일 status를 processed로 업데이트
-            supabase.table("email_logs").update({"status": "processed"}).eq("id", email["id"]).execute()
-
-            print(f"[✅ VENDOR AGENT] Draft created and saved for PO {po_number}")
-
-        except Exception as e:
-            print(f"[❌ VENDOR REPLY AGENT ERROR] {e}")
+        latest[email["thread_id"]] = _thread_email(email)
+    if not latest:
+        return []
+    results, _ = await _fanout.run(list(latest.values()), process_vendor_thread, concurrency)
+    return [draft for draft in results if draft]
+
+def handle_general_vendor_email(concurrency: int = REPLY_CONCURRENCY):
+    """동기 호출용 (실행 중인 이벤트 루프 안에서는 handle_general_vendor_email_async 를 await)"""
+    return asyncio.run(handle_general_vendor_email_async(concurrency))
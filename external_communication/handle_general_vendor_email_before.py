@@ -11,6 +11,7 @@ from aggregate_context_blocks import aggregate_context_blocks
 from generate_multi_context_reply import generate_multi_context_reply
 from email_context_utils import get_last_conversation_by_request_form
 from utils.summary_utils import summarize_text
+from utils.email_thread_utils import get_threads_awaiting_reply
 import supabase
 
 # Load environment variables and initialize Supabase client
@@ -122,38 +123,13 @@ def check_last_communication_is_admin(thread_id: str) -> bool:
 def handle_general_vendor_email():
     print("🔍 Step 1: Fetching the latest vendor emails for each unique thread...")
     
-    # 1. 먼저 unique thread_id 목록을 가져옴
-    threads_response = supabase.table("email_logs") \
-        .select("thread_id") \
-        .not_.is_("thread_id", "null") \
-        .not_.eq("thread_id", "") \
-        .execute()
-    
-    unique_threads = set(row["thread_id"] for row in threads_response.data if row["thread_id"])
-    print(f"📌 Found {len(unique_threads)} unique thread(s)")
+    # 최신 메시지가 미처리 벤더 수신 메일인 thread만 한 번에 조회 (PO 매핑 포함)
+    pending_threads = get_threads_awaiting_reply()
+    print(f"📌 Found {len(pending_threads)} thread(s) awaiting reply")
     
     results = []
-    for thread_id in unique_threads:
-        # 최신 커뮤니케이션이 admin 발신인지 확인
-        if check_last_communication_is_admin(thread_id):
-            print(f"\n📨 Thread {thread_id}: 최근 발신이 admin이므로 스킵")
-            continue
-            
-        # 2. 각 thread의 최신 vendor 이메일 조회
-        response = supabase.table("email_logs") \
-            .select("*") \
-            .eq("thread_id", thread_id) \
-            .eq("sender_role", "vendor") \
-            .in_("direction", ["inbound", "incoming"]) \
-            .is_("draft_body", "null") \
-            .order("created_at.desc") \
-            .limit(1) \
-            .execute()
-            
-        if not response.data:
-            continue
-            
-        email = response.data[0]
+    for email in pending_threads:
+        thread_id = email["thread_id"]
         email_subject = email["subject"]
         email_body = email["body"]
         
@@ -162,11 +138,9 @@ def handle_general_vendor_email():
         print(f"Received at: {email['received_at']}")
         
         # 1. Thread ID에 매핑된 PO 번호 확인
-        po_number = None
-        if thread_id:
-            po_number = get_thread_po_mapping(thread_id)
-            if po_number:
-                print(f"🔗 Found PO number {po_number} mapped to thread {thread_id}")
+        po_number = email.get("mapped_po_number")
+        if po_number:
+            print(f"🔗 Found PO number {po_number} mapped to thread {thread_id}")
         
         # 2. 매핑된 PO 번호가 없는 경우, 이메일에서 추출 시도
         if not po_number:
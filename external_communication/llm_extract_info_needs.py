@@ -4,12 +4,13 @@ import os
 import json # Import json module
 from openai import OpenAI
 from dotenv import load_dotenv
+from openai_clients import get_async_openai
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
-def llm_extract_info_needs(email_subject, email_body):
+def build_info_needs_messages(email_subject, email_body):
     prompt = f"""
 You are a helpful procurement planning assistant.
 You will receive an email from a vendor. Your task is to:
@@ -57,14 +58,24 @@ Another Example:
 }}
 """
 
+    return [
+        {"role": "system", "content": "You analyze vendor emails and respond ONLY with the specified JSON object."},
+        {"role": "user", "content": prompt}
+    ]
+
+FALLBACK_RESULT = json.dumps({
+    "intent": "Error during analysis",
+    "reply_needed": False,
+    "suggested_reply_type": "no_reply",
+    "information_needed": []
+})
+
+def llm_extract_info_needs(email_subject, email_body):
     try:
         response = client.chat.completions.create(
             model="gpt-4o",
             response_format={ "type": "json_object" },
-            messages=[
-                {"role": "system", "content": "You analyze vendor emails and respond ONLY with the specified JSON object."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_info_needs_messages(email_subject, email_body),
             temperature=0.2
         )
         
@@ -72,12 +83,22 @@ Another Example:
 
     except Exception as e:
         print(f"❌ Error calling OpenAI API in llm_extract_info_needs: {e}")
-        return json.dumps({
-            "intent": "Error during analysis",
-            "reply_needed": False,
-            "suggested_reply_type": "no_reply",
-            "information_needed": []
-        })
+        return FALLBACK_RESULT
+
+async def llm_extract_info_needs_async(email_subject, email_body):
+    """llm_extract_info_needs 의 비동기 버전 (여러 thread 를 동시에 처리할 때 사용)"""
+    try:
+        response = await get_async_openai(OPENAI_API_KEY).chat.completions.create(
+            model="gpt-4o",
+            response_format={ "type": "json_object" },
+            messages=build_info_needs_messages(email_subject, email_body),
+            temperature=0.2
+        )
+        return response.choices[0].message.content.strip()
+
+    except Exception as e:
+        print(f"❌ Error calling OpenAI API in llm_extract_info_needs: {e}")
+        return FALLBACK_RESULT
 
 # Example usage
 if __name__ == "__main__":
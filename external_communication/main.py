@@ -2,15 +2,22 @@ import argparse
 import asyncio
 from datetime import datetime
 import os
+import sys
 import logging
 from typing import Optional, Dict, List
 from dotenv import load_dotenv
 import json
 from supabase import create_client, Client
 
-from handle_general_vendor_email import handle_general_vendor_email
-from follow_up_vendor_email import send_follow_up_emails
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from handle_general_vendor_email import handle_general_vendor_email_async
+from follow_up_vendor_email import send_follow_up_emails, process_due_follow_ups
+from follow_up_scheduler import FollowUpScheduler
 from email_draft_confirm import confirm_and_send_drafts
+from common.change_feed import create_change_feed, is_new_po, is_inbound_email, is_draft
 
 # Load environment variables
 load_dotenv()
@@ -54,13 +61,15 @@ class MonitoringStats:
 class EmailProcessor:
     def __init__(self):
         self.last_po_check = datetime.now()
-        self.last_follow_up_check = datetime.now()
         self.stats = MonitoringStats()
+        # row 변경 이벤트 소스 (start() 에서 생성, 변경이 있을 때만 조회)
+        self.feed = None
 
     async def watch_new_pos(self):
         """
         새로운 PO 생성을 실시간으로 감지하고 처리
         """
+        subscription = self.feed.subscribe("purchase_orders", predicate=is_new_po)
         while True:
             try:
                 current_time = datetime.now()
@@ -77,7 +86,7 @@ class EmailProcessor:
                     await self.process_po_emails(response.data)
                 
                 self.last_po_check = current_time
-                await asyncio.sleep(10)  # 10초마다 체크
+                await subscription.wait(self.feed.idle_timeout(10))  # 새 PO 가 생기면 바로, 아니면 resync 간격마다
                 
             except Exception as e:
                 logger.error(f"PO 감지 중 오류: {e}")
@@ -87,15 +96,16 @@ class EmailProcessor:
         """
         새로운 벤더 이메일을 실시간으로 감지하고 처리
         """
+        subscription = self.feed.subscribe("email_logs", predicate=is_inbound_email)
         while True:
             try:
-                result = handle_general_vendor_email()
+                result = await handle_general_vendor_email_async()
                 if result:
                     self.stats.vendor_emails_processed = len(result)
                     self.stats.drafts_created = len([r for r in result if r.get('draft_body')])
                     logger.info(f"✅ {self.stats.drafts_created} 개의 드래프트 생성됨")
                 
-                await asyncio.sleep(30)  # 30초마다 체크
+                await subscription.wait(self.feed.idle_timeout(30))  # 벤더 메일이 저장되면 바로
                 
             except Exception as e:
                 logger.error(f"벤더 이메일 처리 중 오류: {e}")
@@ -105,19 +115,20 @@ class EmailProcessor:
         """
         생성된 드래프트를 실시간으로 감지하고 처리
         """
+        subscription = self.feed.subscribe("email_logs", predicate=is_draft)
         while True:
             try:
-                # 자동 승인이 필요한 드래프트 확인
+                # 자동 승인이 필요한 드래프트 확인 (건수만 필요하므로 row 없이 count 만 조회)
                 response = supabase.table("email_logs") \
-                    .select("*") \
+                    .select("id", count="exact", head=True) \
                     .eq("status", "draft") \
                     .execute()
                 
-                if response.data:
-                    logger.info(f"자동 승인 대상 드래프트 {len(response.data)}건 감지됨")
-                    await confirm_and_send_drafts()
+                if response.count:
+                    logger.info(f"자동 승인 대상 드래프트 {response.count}건 감지됨")
+                    await asyncio.to_thread(confirm_and_send_drafts)
                 
-                await asyncio.sleep(10)  # 10초마다 체크
+                await subscription.wait(self.feed.idle_timeout(10))  # 드래프트가 생기거나 바뀌면 바로
                 
             except Exception as e:
                 logger.error(f"드래프트 처리 중 오류: {e}")
@@ -125,33 +136,29 @@ class EmailProcessor:
 
     async def check_follow_ups(self):
         """
-        후속 조치가 필요한 건들을 주기적으로 확인
+        후속 조치가 due 된 PO 를 처리 (follow_up_schedule 의 가장 이른 due_at 까지 대기)
         """
-        while True:
-            try:
-                current_time = datetime.now()
-                
-                # 후속 조치 필요 여부 확인 (1시간마다)
-                if (current_time - self.last_follow_up_check).total_seconds() >= 3600:
-                    await send_follow_up_emails()
-                    self.last_follow_up_check = current_time
-                
-                await asyncio.sleep(600)  # 10분마다 체크
-                
-            except Exception as e:
-                logger.error(f"후속 조치 확인 중 오류: {e}")
-                await asyncio.sleep(300)
+        def process(po_numbers):
+            created = process_due_follow_ups(po_numbers)
+            self.stats.follow_ups_sent += created
+            return created
+
+        await FollowUpScheduler(supabase, self.feed, process).run()
 
     async def start(self):
         """
         모든 워커를 동시에 시작
         """
-        await asyncio.gather(
-            self.watch_new_pos(),
-            self.watch_vendor_emails(),
-            self.watch_drafts(),
-            self.check_follow_ups()
-        )
+        self.feed = create_change_feed()
+        try:
+            await asyncio.gather(
+                self.watch_new_pos(),
+                self.watch_vendor_emails(),
+                self.watch_drafts(),
+                self.check_follow_ups()
+            )
+        finally:
+            self.feed.stop()
 
 def print_monitoring_summary(stats: MonitoringStats):
     """모니터링 결과 요약 출력"""
@@ -245,17 +252,17 @@ async def main():
         else:
             # 기존의 단일 작업 실행 로직 유지
             if args.action == 'handle_vendor_email':
-                result = handle_general_vendor_email()
+                result = await handle_general_vendor_email_async()
                 if result:
                     print(f"✅ {len(result)} 개의 드래프트 생성됨")
             elif args.action == 'send_po':
                 pass
             elif args.action == 'follow_up':
-                await send_follow_up_emails()
+                await asyncio.to_thread(send_follow_up_emails)
             elif args.action == 'update_threads':
                 pass
             elif args.action == 'confirm_drafts':
-                await confirm_and_send_drafts()
+                await asyncio.to_thread(confirm_and_send_drafts)
             
     except KeyboardInterrupt:
         logger.warning("\n⚠️ 프로그램이 사용자에 의해 중단되었습니다.")
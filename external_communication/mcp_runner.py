@@ -1,5 +1,6 @@
 import sys
 import os
+import socket
 import asyncio
 
 # === PATH SETUP ===
@@ -9,83 +10,170 @@ sys.path.append(os.path.join(BASE_DIR, "external_communication"))
 sys.path.append(os.path.join(BASE_DIR, "Vendor_email_logger_agent"))
 
 # === IMPORTS ===
-from agents.po_agent import handle_po_message
+from agents.po_agent import handle_po_message, WORKER_ID as PO_WORKER_ID
 from agents.followup_agent import handle_followup_message
 from agents.vendor_reply_agent import handle_vendor_reply_message
+from agents.vendor_email_agent import handle_vendor_email_message
 from agents.draft_sender_agent import handle_draft_send_message
-from mcp_service import receive_messages
-from config import supabase
+from mcp_service import (
+    receive_messages, ack_messages, extend_messages, subscribe, receive_group_messages, ack_group_messages,
+    extend_group_messages, close as close_mcp_client,
+)
+from dispatcher import TypedDispatcher
+from follow_up_scheduler import FollowUpScheduler
+from follow_up_vendor_email import process_due_follow_ups
+from po_issued_vendor_email import draft_pending_pos
+from config import settings, supabase
+from common.change_feed import ChangeFeed, create_change_feed, is_po_ready_to_send, is_inbound_email
 
 # === MCP AGENT ID ===
 AGENT_ID = "external_comm_hub"
+# topic 메시지는 AGENT_ID 를 consumer group 으로 받음: hub 프로세스를 여러 개 띄우면 같은 group 의 member 로 나눠 받고,
+# 다른 group (예: 감사 로그용) 은 같은 메시지를 따로 한 번씩 받음
+GROUP_ID = AGENT_ID
+MEMBER_ID = f"{AGENT_ID}:{socket.gethostname()}:{os.getpid()}"
+# /receive long polling 대기 시간 (초)
+RECEIVE_WAIT = 20
+# /receive 한 번에 받을 최대 메시지 수
+RECEIVE_BATCH = 10
+
+# message type → 핸들러 (type 별 동시 처리 수 / 타임아웃은 config 의 DISPATCH_* 설정)
+# AGENT_ID 로 직접 보낸 메시지 (vendor_email 은 이전 버전 로거가 직접 보내 큐에 남아 있을 수 있는 메시지용)
+HANDLERS = {
+    "new_po": handle_po_message,
+    "follow_up_check": handle_followup_message,
+    "vendor_reply": handle_vendor_reply_message,
+    "vendor_email": handle_vendor_email_message,
+    "send_draft_email": handle_draft_send_message,
+}
+
+# topic → (message type → 핸들러): GROUP_ID 로 구독해 받는 메시지
+TOPIC_HANDLERS = {
+    "vendor_email": {"vendor_email": handle_vendor_email_message},  # Vendor_email_logger_agent 가 발행
+}
+
+# I/O 가 비동기라 메인 이벤트 루프에서 바로 실행하는 핸들러 (나머지는 스레드로 offload)
+# AsyncOpenAI 클라이언트(openai_clients, 루프별)를 poll_vendor_emails 와 같은 루프에서 공유하기 위해 vendor_reply / vendor_email 은 offload 하지 않음
+ASYNC_HANDLERS = {"vendor_reply", "vendor_email"}
+
+def build_dispatcher(on_ack, on_extend, handlers) -> TypedDispatcher:
+    dispatcher = TypedDispatcher(
+        on_ack=on_ack,
+        max_pending=settings.DISPATCH_MAX_PENDING,
+        on_extend=on_extend,
+        extend_interval=settings.DISPATCH_EXTEND_INTERVAL,
+    )
+    for msg_type, handler in handlers.items():
+        dispatcher.register(
+            msg_type, handler,
+            concurrency=settings.DISPATCH_CONCURRENCY.get(msg_type, 1),
+            timeout=settings.DISPATCH_TIMEOUTS.get(msg_type),
+            offload=msg_type not in ASYNC_HANDLERS,
+        )
+    return dispatcher
 
 # === POLL NEW POs (status = 'issued', human_confirmed = True, submitted_at is null) ===
-async def poll_new_pos():
+# change feed 로 해당 row 가 바뀌었을 때만 깨어남 (feed 가 live 가 아니면 기존처럼 10초마다)
+# PO 를 다시 조회해 하나씩 넘기지 않고, po_draft_claims 에서 claim 한 PO 만 드래프트를 작성 (PO 당 한 번)
+async def poll_new_pos(feed: ChangeFeed):
+    subscription = feed.subscribe("purchase_orders", predicate=is_po_ready_to_send)
     while True:
         try:
-            result = supabase.table("purchase_orders").select("po_number", "submitted_at") \
-                .eq("update_status", "issued") \
-                .eq("human_confirmed", True) \
-                .is_("submitted_at", "null") \
-                .execute()
-
-            if result.data:
-                print(f"[🔔 POLL: PO] {len(result.data)} new POs found")
-                for po in result.data:
-                    await handle_po_message({"po_number": po["po_number"]})
+            # 드래프트 작성(Supabase / OpenAI 동기 호출)이 다른 폴링 루프를 막지 않도록 별도 스레드에서 실행
+            drafted = await asyncio.to_thread(draft_pending_pos, PO_WORKER_ID, settings.PO_DRAFT_WORKERS)
+            if drafted:
+                print(f"[✅ POLL: New PO] {drafted} PO drafts created")
         except Exception as e:
             print(f"[❌ poll_new_pos ERROR] {e}")
-        await asyncio.sleep(10)
+        await subscription.wait(feed.idle_timeout(10))
 
 # === POLL VENDOR EMAILS (latest inbound by thread_id, unprocessed only) ===
-async def poll_vendor_emails():
+async def poll_vendor_emails(feed: ChangeFeed):
+    subscription = feed.subscribe("email_logs", predicate=is_inbound_email)
     while True:
         try:
             print("[📬 POLL: Vendor Email] Checking latest inbound vendor replies...")
             await handle_vendor_reply_message({})
         except Exception as e:
             print(f"[❌ poll_vendor_emails ERROR] {e}")
-        await asyncio.sleep(30)
+        await subscription.wait(feed.idle_timeout(30))
 
-# === POLL FOLLOW-UPS (check POs with ETA for 2-day reminders) ===
-async def poll_followups():
-    while True:
-        try:
-            print("[🔁 POLL: Follow-up] Triggering ETA reminder logic...")
-            await handle_followup_message({})
-        except Exception as e:
-            print(f"[❌ poll_followups ERROR] {e}")
-        await asyncio.sleep(3600)  # every 1 hour
+# === FOLLOW-UPS (PO 별 due_at 스케줄: 가장 이른 due_at 까지 잠들었다가 due 된 PO 만 처리) ===
+async def poll_followups(feed: ChangeFeed):
+    print("[🔁 POLL: Follow-up] Starting due-time follow-up scheduler...")
+    await FollowUpScheduler(supabase, feed, process_due_follow_ups).run()
 
 # === MCP DISPATCH LOOP (fallback for push-based message trigger) ===
+async def report_dispatch_metrics(name: str, dispatcher: TypedDispatcher):
+    while True:
+        await asyncio.sleep(settings.DISPATCH_METRICS_INTERVAL)
+        for msg_type, stats in dispatcher.metrics().items():
+            print(f"[📊 MCP Dispatch] {name} {msg_type}: {stats}")
+
+async def run_dispatcher(name: str, dispatcher: TypedDispatcher, receive):
+    """receive(max_messages) 로 받은 메시지를 dispatcher 로 넘기는 루프 (type 별 worker 가 동시에 처리하고 모아서 ack)"""
+    await dispatcher.start()
+    reporter = asyncio.create_task(report_dispatch_metrics(name, dispatcher))
+    try:
+        while True:
+            try:
+                # 처리 대기 중인 메시지가 가득 차면 자리가 날 때까지 받지 않음
+                free = dispatcher.free_slots()
+                if free <= 0:
+                    await asyncio.sleep(0.5)
+                    continue
+                # long polling: 메시지가 도착하면 바로 반환 (비동기 요청이라 대기 중에도 다른 poller 가 돔)
+                messages = await receive(min(RECEIVE_BATCH, free))
+                await dispatcher.submit(messages)
+            except Exception as e:
+                print(f"[❌ MCP Dispatch Error] {name}: {e}")
+                await asyncio.sleep(5)
+    finally:
+        reporter.cancel()
+        await dispatcher.stop()
+
 async def mcp_dispatch_loop():
+    dispatcher = build_dispatcher(
+        lambda receipts: ack_messages(AGENT_ID, receipts),
+        lambda receipts: extend_messages(AGENT_ID, receipts, settings.DISPATCH_VISIBILITY_TIMEOUT),
+        HANDLERS,
+    )
+    await run_dispatcher(AGENT_ID, dispatcher, lambda max_messages: receive_messages(
+        AGENT_ID, RECEIVE_WAIT, max_messages, settings.DISPATCH_VISIBILITY_TIMEOUT,
+    ))
+
+async def topic_dispatch_loop(topic: str, handlers):
+    """GROUP_ID 로 topic 을 구독하고 MEMBER_ID 로 받음 (다른 hub 프로세스와 메시지를 나눠 처리)"""
     while True:
         try:
-            messages = receive_messages(AGENT_ID)
-            for msg in messages:
-                msg_type = msg["type"]
-                payload = msg["payload"]
-                if msg_type == "new_po":
-                    await handle_po_message(payload)
-                elif msg_type == "follow_up_check":
-                    await handle_followup_message(payload)
-                elif msg_type == "vendor_reply":
-                    await handle_vendor_reply_message(payload)
-                elif msg_type == "send_draft_email":
-                    await handle_draft_send_message(payload)
-                else:
-                    print(f"[⚠️ Unknown Type] {msg_type}")
+            await subscribe(topic, GROUP_ID)
+            break
         except Exception as e:
-            print(f"[❌ MCP Dispatch Error] {e}")
-        await asyncio.sleep(5)
+            print(f"[❌ MCP Subscribe Error] {topic}: {e}")
+            await asyncio.sleep(5)
+    print(f"[📡 MCP] Subscribed to {topic} as {GROUP_ID} / {MEMBER_ID}")
+    dispatcher = build_dispatcher(
+        lambda receipts: ack_group_messages(topic, GROUP_ID, receipts),
+        lambda receipts: extend_group_messages(topic, GROUP_ID, receipts, settings.DISPATCH_VISIBILITY_TIMEOUT),
+        handlers,
+    )
+    await run_dispatcher(topic, dispatcher, lambda max_messages: receive_group_messages(
+        topic, GROUP_ID, MEMBER_ID, RECEIVE_WAIT, max_messages, settings.DISPATCH_VISIBILITY_TIMEOUT,
+    ))
 
 # === MAIN EVENT LOOP ===
 if __name__ == "__main__":
     async def main():
-        await asyncio.gather(
-            mcp_dispatch_loop(),
-            poll_new_pos(),
-            poll_vendor_emails(),
-            poll_followups()
-        )
+        feed = create_change_feed()
+        try:
+            await asyncio.gather(
+                mcp_dispatch_loop(),
+                *(topic_dispatch_loop(topic, handlers) for topic, handlers in TOPIC_HANDLERS.items()),
+                poll_new_pos(feed),
+                poll_vendor_emails(feed),
+                poll_followups(feed)
+            )
+        finally:
+            feed.stop()
+            await close_mcp_client()
     asyncio.run(main())
@@ -1,19 +1,64 @@
-import requests
+import os
+import sys
 
-MCP_BASE_URL = "http://localhost:8000"
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
 
-def send_message(sender: str, receiver: str, msg_type: str, payload: dict):
-    response = requests.post(f"{MCP_BASE_URL}/send", json={
+from common.mcp_client import get_mcp_client
+
+async def send_message(sender: str, receiver: str, msg_type: str, payload: dict, idempotency_key: str = None,
+                       priority: int = None, ttl: float = None):
+    """
+    메시지 전송 (같은 idempotency_key 로 다시 보내면 MCP 서버가 중복으로 무시)
+    priority 가 높을수록 먼저 전달되고, ttl 초 안에 전달되지 않으면 버려짐 (없으면 type 별 서버 기본값)
+    """
+    return await get_mcp_client().send({
         "sender": sender,
         "receiver": receiver,
         "content": "",
         "type": msg_type,
-        "payload": payload
+        "payload": payload,
+        "idempotency_key": idempotency_key,
+        "priority": priority,
+        "ttl": ttl
     })
-    response.raise_for_status()
-    return response.json()
 
-def receive_messages(agent_id: str):
-    response = requests.get(f"{MCP_BASE_URL}/receive/{agent_id}")
-    response.raise_for_status()
-    return response.json().get("messages", [])
\ No newline at end of file
+async def receive_messages(agent_id: str, wait: float = 0, max_messages: int = 10, visibility_timeout: float = None):
+    """
+    메시지를 최대 max_messages 건 수신 (처리 후 ack_messages 로 확인하지 않으면 visibility timeout 후 재전달됨)
+    wait > 0 이면 메시지가 도착하거나 wait 초가 지날 때까지 서버가 응답을 보류 (long polling)
+    """
+    return await get_mcp_client().receive(agent_id, max_messages=max_messages, wait=wait,
+                                          visibility_timeout=visibility_timeout)
+
+async def ack_messages(agent_id: str, receipts: list):
+    return await get_mcp_client().ack(agent_id, receipts)
+
+async def extend_messages(agent_id: str, receipts: list, visibility_timeout: float):
+    """처리 중이거나 처리 대기 중인 메시지가 visibility timeout 으로 재전달되지 않도록 lease 연장"""
+    return await get_mcp_client().extend(agent_id, receipts, visibility_timeout)
+
+# === topic / consumer group ===
+
+async def subscribe(topic: str, group: str):
+    """consumer group 을 topic 에 등록 (이미 등록되어 있으면 그대로)"""
+    return await get_mcp_client().subscribe(topic, group)
+
+async def receive_group_messages(topic: str, group: str, member: str, wait: float = 0, max_messages: int = 10,
+                                 visibility_timeout: float = None):
+    """
+    group member 로 수신 (같은 group 의 다른 프로세스와 메시지를 나눠 받음, 처리 후 ack_group_messages)
+    """
+    return await get_mcp_client().receive_group(topic, group, member, max_messages=max_messages, wait=wait,
+                                                visibility_timeout=visibility_timeout)
+
+async def ack_group_messages(topic: str, group: str, receipts: list):
+    return await get_mcp_client().ack_group(topic, group, receipts)
+
+async def extend_group_messages(topic: str, group: str, receipts: list, visibility_timeout: float):
+    return await get_mcp_client().extend_group(topic, group, receipts, visibility_timeout)
+
+async def close():
+    """공유 연결 풀 종료"""
+    await get_mcp_client().close()
@@ -0,0 +1,51 @@
+-- thread별 최신 메시지가 "아직 처리되지 않은 벤더 수신 메일"인 thread만 조회하는 뷰
+-- handle_general_vendor_email 의 thread별 N+1 조회(최신 발신자 확인, 최신 벤더 메일, PO 매핑)를 대체
+
+-- thread별 최신 메시지를 인덱스 순서대로 읽기 위한 인덱스
+CREATE INDEX IF NOT EXISTS idx_email_logs_thread_latest
+    ON email_logs (thread_id, created_at DESC, id DESC)
+    WHERE thread_id IS NOT NULL AND thread_id <> '';
+
+-- thread에 처음 매핑된 PO 번호 조회용 인덱스
+CREATE INDEX IF NOT EXISTS idx_email_logs_thread_po
+    ON email_logs (thread_id, created_at)
+    WHERE po_number IS NOT NULL;
+
+CREATE OR REPLACE VIEW email_threads_awaiting_reply AS
+SELECT
+    latest.id,
+    latest.thread_id,
+    latest.message_id,
+    latest.po_number,
+    latest.subject,
+    latest.body,
+    latest.sender_email,
+    latest.recipient_email,
+    latest.direction,
+    latest.sender_role,
+    latest.status,
+    latest.received_at,
+    latest.sent_at,
+    latest.created_at,
+    mapping.po_number AS mapped_po_number
+FROM (
+    -- thread별 가장 최근 메시지 1건
+    SELECT DISTINCT ON (e.thread_id) e.*
+    FROM email_logs e
+    WHERE e.thread_id IS NOT NULL
+      AND e.thread_id <> ''
+    ORDER BY e.thread_id, e.created_at DESC, e.id DESC
+) latest
+LEFT JOIN LATERAL (
+    -- thread에 가장 먼저 기록된 PO 번호 (get_thread_po_mapping 과 동일한 규칙)
+    SELECT p.po_number
+    FROM email_logs p
+    WHERE p.thread_id = latest.thread_id
+      AND p.po_number IS NOT NULL
+    ORDER BY p.created_at ASC
+    LIMIT 1
+) mapping ON true
+WHERE latest.sender_role = 'vendor'
+  AND latest.direction IN ('inbound', 'incoming')
+  AND latest.status IS DISTINCT FROM 'processed'
+  AND latest.draft_body IS NULL;
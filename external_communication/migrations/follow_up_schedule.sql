@@ -0,0 +1,186 @@
+-- PO 별 다음 후속 조치 시각(due_at) 스케줄
+-- 매시간 전체 PO 를 다시 훑는 대신, ETA / 벤더 답장 / 드래프트 / 리마인더가 바뀔 때 트리거가 해당 PO 의 due_at 을 다시 계산하고,
+-- external_communication/follow_up_scheduler.py 가 가장 이른 due_at 까지 잠들었다가 due 된 PO 만 처리합니다.
+-- (plan_follow_ups.sql 이 먼저 적용되어 있어야 합니다)
+--
+-- due_at 규칙 (plan_follow_ups 와 send_follow_up_emails 의 조건과 같음, reminder_days 는 같은 종류 드래프트 사이 최소 간격):
+--   ETA 없음: 벤더 답장이 있고 ETA 요청 드래프트가 발송 대기 중이 아니면
+--             greatest(마지막 벤더 답장, 마지막 ETA 요청 드래프트 + reminder_days)
+--   ETA 있음: 벤더의 ETA 언급이 있고 재확인 드래프트가 발송 대기 중이 아니면
+--             greatest(마지막 ETA 언급 + eta_reply_days, 마지막 리마인더 + reminder_days)
+--   그 외에는 스케줄에서 제거
+
+CREATE TABLE IF NOT EXISTS follow_up_schedule (
+    po_number text PRIMARY KEY,
+    due_at timestamptz NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_follow_up_schedule_due ON follow_up_schedule (due_at);
+
+CREATE OR REPLACE FUNCTION refresh_follow_up_schedule(
+    target_po text,
+    eta_reply_days integer DEFAULT 2,
+    reminder_days integer DEFAULT 2
+)
+RETURNS timestamptz
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    po record;
+    last_vendor_reply timestamptz;
+    last_eta_reply timestamptz;
+    last_eta_request timestamptz;
+    last_reminder timestamptz;
+    pending_request boolean;
+    pending_reconfirmation boolean;
+    next_due timestamptz;
+    previous_due timestamptz;
+BEGIN
+    IF target_po IS NULL OR target_po = '' OR target_po = 'None' THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT p.po_number, p.eta, p.request_form_id INTO po
+    FROM purchase_orders p WHERE p.po_number = target_po LIMIT 1;
+
+    IF FOUND THEN
+        SELECT max(e.created_at) INTO last_vendor_reply
+        FROM email_logs e WHERE e.po_number = target_po AND e.sender_role = 'vendor';
+
+        SELECT
+            bool_or(d.email_type = 'follow_up_eta_missing' AND d.status = 'draft' AND d.sent_at IS NULL),
+            bool_or(d.email_type = 'follow_up_eta_present' AND d.status = 'draft' AND d.sent_at IS NULL),
+            max(d.created_at) FILTER (WHERE d.email_type = 'follow_up_eta_missing')
+        INTO pending_request, pending_reconfirmation, last_eta_request
+        FROM email_logs d
+        WHERE d.po_number = target_po AND d.email_type IN ('follow_up_eta_missing', 'follow_up_eta_present');
+
+        IF po.eta IS NULL THEN
+            IF last_vendor_reply IS NOT NULL AND NOT coalesce(pending_request, false) THEN
+                next_due := greatest(last_vendor_reply, last_eta_request + make_interval(days => reminder_days));
+            END IF;
+        ELSE
+            IF po.request_form_id IS NOT NULL THEN
+                SELECT max(e.created_at) INTO last_eta_reply
+                FROM email_logs e
+                WHERE e.request_form_id = po.request_form_id
+                  AND e.sender_role = 'vendor'
+                  AND e.summary ILIKE '%eta%';
+            END IF;
+            SELECT pt.last_reminder_sent_at INTO last_reminder
+            FROM po_tracking pt WHERE pt.po_number = target_po LIMIT 1;
+
+            IF last_eta_reply IS NOT NULL AND NOT coalesce(pending_reconfirmation, false) THEN
+                -- greatest 는 NULL 을 무시 (리마인더를 보낸 적이 없으면 ETA 언급 기준)
+                next_due := greatest(
+                    last_eta_reply + make_interval(days => eta_reply_days),
+                    last_reminder + make_interval(days => reminder_days)
+                );
+            END IF;
+        END IF;
+    END IF;
+
+    SELECT s.due_at INTO previous_due FROM follow_up_schedule s WHERE s.po_number = target_po;
+
+    IF next_due IS NULL THEN
+        DELETE FROM follow_up_schedule WHERE po_number = target_po;
+    ELSIF previous_due IS DISTINCT FROM next_due THEN
+        INSERT INTO follow_up_schedule (po_number, due_at, updated_at)
+        VALUES (target_po, next_due, now())
+        ON CONFLICT (po_number) DO UPDATE SET due_at = EXCLUDED.due_at, updated_at = now();
+        -- 스케줄러가 더 이른 due_at 을 놓치지 않도록 깨움 (common/change_feed.py 채널)
+        PERFORM pg_notify('row_changes', jsonb_build_object(
+            'table', 'follow_up_schedule',
+            'op', 'UPDATE',
+            'row', jsonb_build_object('po_number', target_po, 'due_at', next_due)
+        )::text);
+    END IF;
+    RETURN next_due;
+END;
+$$;
+
+-- due 된 PO 를 최대 batch_size 건 가져감
+-- 가져간 PO 의 due_at 은 retry_seconds 뒤로 미뤄 두고 (처리 중 종료되거나 건너뛴 PO 는 그때 다시 due),
+-- 처리 결과(드래프트 저장 / 리마인더 기록)로 트리거가 다시 계산하면 그 값으로 바뀜
+CREATE OR REPLACE FUNCTION take_due_follow_ups(batch_size integer DEFAULT 100, retry_seconds integer DEFAULT 3600)
+RETURNS SETOF text
+LANGUAGE sql
+AS $$
+    UPDATE follow_up_schedule s
+    SET due_at = now() + make_interval(secs => retry_seconds), updated_at = now()
+    WHERE s.po_number IN (
+        SELECT d.po_number FROM follow_up_schedule d
+        WHERE d.due_at <= now()
+        ORDER BY d.due_at
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING s.po_number;
+$$;
+
+-- 가장 이른 due_at 까지 남은 시간 (초, 이미 지났으면 0 이하, 스케줄이 비어 있으면 NULL)
+CREATE OR REPLACE FUNCTION next_follow_up_in()
+RETURNS double precision
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT extract(epoch FROM min(due_at) - now())::double precision FROM follow_up_schedule;
+$$;
+
+-- === 트리거 ===
+
+CREATE OR REPLACE FUNCTION follow_up_schedule_on_change()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    changed record;
+    related_po text;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+
+    PERFORM refresh_follow_up_schedule(changed.po_number);
+    IF TG_OP = 'UPDATE' AND OLD.po_number IS DISTINCT FROM NEW.po_number THEN
+        PERFORM refresh_follow_up_schedule(OLD.po_number);
+    END IF;
+
+    -- 벤더의 ETA 언급은 request_form 단위로 집계되므로 같은 request_form 의 PO 도 다시 계산
+    -- (record 필드는 테이블마다 다르므로 테이블 확인 후 접근)
+    IF TG_TABLE_NAME = 'email_logs' THEN
+        IF changed.sender_role = 'vendor' AND changed.request_form_id IS NOT NULL THEN
+            FOR related_po IN
+                SELECT p.po_number FROM purchase_orders p
+                WHERE p.request_form_id = changed.request_form_id
+                  AND p.po_number IS DISTINCT FROM changed.po_number
+            LOOP
+                PERFORM refresh_follow_up_schedule(related_po);
+            END LOOP;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS purchase_orders_follow_up_schedule ON purchase_orders;
+CREATE TRIGGER purchase_orders_follow_up_schedule
+    AFTER INSERT OR DELETE OR UPDATE OF po_number, eta, request_form_id ON purchase_orders
+    FOR EACH ROW EXECUTE FUNCTION follow_up_schedule_on_change();
+
+DROP TRIGGER IF EXISTS email_logs_follow_up_schedule ON email_logs;
+CREATE TRIGGER email_logs_follow_up_schedule
+    AFTER INSERT OR DELETE OR UPDATE OF po_number, status, sent_at, email_type, summary, sender_role, request_form_id
+    ON email_logs
+    FOR EACH ROW EXECUTE FUNCTION follow_up_schedule_on_change();
+
+DROP TRIGGER IF EXISTS po_tracking_follow_up_schedule ON po_tracking;
+CREATE TRIGGER po_tracking_follow_up_schedule
+    AFTER INSERT OR DELETE OR UPDATE OF last_reminder_sent_at ON po_tracking
+    FOR EACH ROW EXECUTE FUNCTION follow_up_schedule_on_change();
+
+-- 기존 PO 스케줄 채우기
+SELECT refresh_follow_up_schedule(po_number) FROM purchase_orders;
@@ -0,0 +1,33 @@
+-- 발송한 드래프트의 email_logs / purchase_orders 상태를 한 번의 호출로 갱신
+-- external_communication/gmail_sender.py 가 worker pool 로 보낸 결과를 모아서 호출합니다.
+--
+-- sent: [{"id": email_logs.id, "thread_id": Gmail threadId, "message_id": Gmail message id, "po_number": ...}, ...]
+-- message_id 를 기록해 두면 Vendor_email_logger_agent 가 보낸편지함을 수집할 때 같은 메일을 중복 저장하지 않습니다.
+
+CREATE OR REPLACE FUNCTION mark_emails_sent(sent jsonb, sent_at timestamptz DEFAULT now())
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated integer;
+BEGIN
+    UPDATE email_logs e
+    SET thread_id = COALESCE(s.thread_id, e.thread_id),
+        message_id = COALESCE(s.message_id, e.message_id),
+        status = 'sent',
+        sent_at = mark_emails_sent.sent_at
+    FROM jsonb_to_recordset(sent) AS s(id bigint, thread_id text, message_id text, po_number text)
+    WHERE e.id = s.id;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+
+    UPDATE purchase_orders po
+    SET submitted_at = mark_emails_sent.sent_at
+    WHERE po.po_number IN (
+        SELECT s.po_number
+        FROM jsonb_to_recordset(sent) AS s(po_number text)
+        WHERE s.po_number IS NOT NULL
+    );
+
+    RETURN updated;
+END;
+$$;
@@ -0,0 +1,119 @@
+-- 후속 조치(follow-up) 대상 PO 를 한 번의 쿼리로 계산하는 함수
+-- get_pos_with_vendor_reply_but_no_eta / get_eta_reconfirmation_pos / get_stale_pos 의 PO 별 반복 조회를 대체
+--
+-- kind:
+--   eta_missing        벤더 답장은 있지만 ETA 가 없는 PO
+--   eta_reconfirmation ETA 가 있고, 벤더의 마지막 ETA 언급(summary 에 'eta')이 eta_reply_days 일 이상 지난 PO
+--   stale              발송(submitted_at) 후 stale_days 일 이상 지난 PO
+-- 한 PO 가 여러 kind 에 해당하면 kind 마다 한 row 씩 반환됩니다.
+-- po_numbers 를 주면 그 PO 들만 계산합니다 (follow_up_schedule 에서 due 된 PO 처리용).
+
+-- PO / request_form 별 벤더 메일 집계용 인덱스
+CREATE INDEX IF NOT EXISTS idx_email_logs_vendor_po
+    ON email_logs (po_number, created_at)
+    WHERE sender_role = 'vendor';
+
+CREATE INDEX IF NOT EXISTS idx_email_logs_vendor_request_form
+    ON email_logs (request_form_id, created_at)
+    WHERE sender_role = 'vendor';
+
+-- 발송 대기 중인 드래프트 조회용 인덱스
+CREATE INDEX IF NOT EXISTS idx_email_logs_pending_drafts
+    ON email_logs (po_number, email_type)
+    WHERE status = 'draft' AND sent_at IS NULL;
+
+DROP FUNCTION IF EXISTS plan_follow_ups(integer, integer);
+
+CREATE OR REPLACE FUNCTION plan_follow_ups(
+    stale_days integer DEFAULT 3,
+    eta_reply_days integer DEFAULT 2,
+    po_numbers text[] DEFAULT NULL
+)
+RETURNS TABLE (
+    kind text,
+    po_number text,
+    eta text,
+    submitted_at timestamptz,
+    request_form_id bigint,
+    vendor_name text,
+    vendor_email text,
+    thread_id text,
+    last_vendor_reply_at timestamptz,
+    last_eta_reply_at timestamptz,
+    last_reminder_sent_at timestamptz,
+    pending_draft_types text[]
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH vendor_replies AS (
+        SELECT e.po_number, max(e.created_at) AS last_vendor_reply_at
+        FROM email_logs e
+        WHERE e.sender_role = 'vendor'
+          AND e.po_number IS NOT NULL
+          AND e.po_number <> 'None'
+          AND (po_numbers IS NULL OR e.po_number = ANY(po_numbers))
+        GROUP BY e.po_number
+    ),
+    eta_replies AS (
+        SELECT e.request_form_id, max(e.created_at) AS last_eta_reply_at
+        FROM email_logs e
+        WHERE e.sender_role = 'vendor'
+          AND e.request_form_id IS NOT NULL
+          AND e.summary ILIKE '%eta%'
+          AND (po_numbers IS NULL OR e.request_form_id IN (
+              SELECT f.request_form_id FROM purchase_orders f WHERE f.po_number = ANY(po_numbers)
+          ))
+        GROUP BY e.request_form_id
+    ),
+    pending_drafts AS (
+        SELECT d.po_number, array_agg(DISTINCT d.email_type::text) AS types
+        FROM email_logs d
+        WHERE d.status = 'draft'
+          AND d.sent_at IS NULL
+          AND d.email_type IS NOT NULL
+          AND (po_numbers IS NULL OR d.po_number = ANY(po_numbers))
+        GROUP BY d.po_number
+    ),
+    base AS (
+        SELECT
+            po.po_number::text AS po_number,
+            po.eta::text AS eta,
+            po.submitted_at::timestamptz AS submitted_at,
+            po.request_form_id::bigint AS request_form_id,
+            COALESCE(v.name, po.vendor_name)::text AS vendor_name,
+            COALESCE(v.email, po.vendor_email)::text AS vendor_email,
+            vr.last_vendor_reply_at::timestamptz AS last_vendor_reply_at,
+            er.last_eta_reply_at::timestamptz AS last_eta_reply_at,
+            t.last_reminder_sent_at::timestamptz AS last_reminder_sent_at,
+            COALESCE(pd.types, '{}') AS pending_draft_types
+        FROM purchase_orders po
+        LEFT JOIN request_form rf ON rf.id = po.request_form_id
+        LEFT JOIN vendors v ON v.id = rf.vendor_id
+        LEFT JOIN vendor_replies vr ON vr.po_number = po.po_number
+        LEFT JOIN eta_replies er ON er.request_form_id = po.request_form_id
+        LEFT JOIN pending_drafts pd ON pd.po_number = po.po_number
+        LEFT JOIN LATERAL (
+            SELECT pt.last_reminder_sent_at FROM po_tracking pt WHERE pt.po_number = po.po_number LIMIT 1
+        ) t ON true
+        WHERE po_numbers IS NULL OR po.po_number = ANY(po_numbers)
+    )
+    SELECT 'eta_missing', b.po_number, b.eta, b.submitted_at, b.request_form_id, b.vendor_name, b.vendor_email,
+           NULL::text, b.last_vendor_reply_at, b.last_eta_reply_at, b.last_reminder_sent_at, b.pending_draft_types
+    FROM base b
+    WHERE b.eta IS NULL AND b.last_vendor_reply_at IS NOT NULL
+    UNION ALL
+    SELECT 'eta_reconfirmation', b.po_number, b.eta, b.submitted_at, b.request_form_id, b.vendor_name, b.vendor_email,
+           -- get_latest_thread_id_for_po 와 같은 규칙: PO 의 가장 최근 메일 thread
+           (SELECT l.thread_id::text FROM email_logs l
+            WHERE l.po_number = b.po_number AND l.thread_id IS NOT NULL
+            ORDER BY l.sent_at DESC NULLS LAST LIMIT 1),
+           b.last_vendor_reply_at, b.last_eta_reply_at, b.last_reminder_sent_at, b.pending_draft_types
+    FROM base b
+    WHERE b.eta IS NOT NULL AND b.last_eta_reply_at <= now() - make_interval(days => eta_reply_days)
+    UNION ALL
+    SELECT 'stale', b.po_number, b.eta, b.submitted_at, b.request_form_id, b.vendor_name, b.vendor_email,
+           NULL::text, b.last_vendor_reply_at, b.last_eta_reply_at, b.last_reminder_sent_at, b.pending_draft_types
+    FROM base b
+    WHERE b.submitted_at < now() - make_interval(days => stale_days);
+$$;
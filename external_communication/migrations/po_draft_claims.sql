@@ -0,0 +1,145 @@
+-- PO 발행 이메일 드래프트 작성 작업의 claim / lease 상태 테이블과 함수
+-- 여러 worker 가 동시에 claim_po_drafts 를 호출해도 FOR UPDATE SKIP LOCKED 로 각 PO 는 한 worker 에게만 할당되고,
+-- complete_po_draft 가 드래프트 저장과 'drafted' 전환을 한 트랜잭션에서 처리하므로 PO 당 드래프트는 한 번만 만들어집니다.
+--
+-- 상태: pending → claimed (lease) → drafted
+--                          └ 실패 / lease 만료 → pending (재시도) → max_attempts 초과 시 failed
+-- attempts 는 claim 할 때마다 증가하며, complete / release 는 claim 받은 attempts 값이 그대로일 때만 반영됩니다
+-- (lease 가 만료되어 다른 worker 가 다시 claim 한 뒤 늦게 끝난 worker 의 결과는 버려짐).
+-- 실패로 반납된 작업은 not_before 까지 (retry_seconds * 2^(attempts-1), 최대 1시간) 다시 claim 되지 않아
+-- 계속 실패하는 PO 가 한 번의 호출 안에서 재시도 횟수를 모두 소모하지 않습니다.
+
+CREATE TABLE IF NOT EXISTS po_draft_claims (
+    po_number text PRIMARY KEY,
+    state text NOT NULL DEFAULT 'pending' CHECK (state IN ('pending', 'claimed', 'drafted', 'failed')),
+    claimed_by text,
+    lease_expires_at timestamptz,
+    attempts integer NOT NULL DEFAULT 0,
+    last_error text,
+    email_log_id bigint,
+    not_before timestamptz,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+ALTER TABLE po_draft_claims ADD COLUMN IF NOT EXISTS not_before timestamptz;
+
+CREATE INDEX IF NOT EXISTS idx_po_draft_claims_open
+    ON po_draft_claims (created_at, po_number)
+    WHERE state IN ('pending', 'claimed');
+
+-- 이 테이블 도입 전에 이미 PO 발행 드래프트가 만들어진 PO 는 drafted 로 등록해
+-- 첫 claim_po_drafts 호출이 같은 PO 의 드래프트를 다시 만들지 않게 함
+INSERT INTO po_draft_claims (po_number, state, email_log_id)
+SELECT DISTINCT ON (e.po_number) e.po_number, 'drafted', e.id
+FROM email_logs e
+WHERE e.trigger_reason = 'po_issued' AND e.po_number IS NOT NULL
+ORDER BY e.po_number, e.id DESC
+ON CONFLICT (po_number) DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_ready_to_send
+    ON purchase_orders (po_number)
+    WHERE update_status = 'issued' AND human_confirmed AND submitted_at IS NULL;
+
+CREATE OR REPLACE FUNCTION claim_po_drafts(
+    worker_id text,
+    batch_size integer DEFAULT 10,
+    lease_seconds integer DEFAULT 300,
+    max_attempts integer DEFAULT 5
+)
+RETURNS SETOF po_draft_claims
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- 발행 확정되었지만 아직 작업이 등록되지 않은 PO 를 pending 으로 등록
+    INSERT INTO po_draft_claims (po_number)
+    SELECT po.po_number
+    FROM purchase_orders po
+    WHERE po.update_status = 'issued'
+      AND po.human_confirmed
+      AND po.submitted_at IS NULL
+      AND NOT EXISTS (SELECT 1 FROM po_draft_claims c WHERE c.po_number = po.po_number)
+    ON CONFLICT (po_number) DO NOTHING;
+
+    -- 재시도 횟수를 다 쓴 채 lease 가 만료된 작업은 failed
+    UPDATE po_draft_claims
+    SET state = 'failed', claimed_by = NULL, lease_expires_at = NULL, updated_at = now()
+    WHERE state = 'claimed' AND lease_expires_at < now() AND attempts >= max_attempts;
+
+    RETURN QUERY
+    UPDATE po_draft_claims c
+    SET state = 'claimed',
+        claimed_by = worker_id,
+        lease_expires_at = now() + make_interval(secs => lease_seconds),
+        attempts = c.attempts + 1,
+        updated_at = now()
+    WHERE c.po_number IN (
+        SELECT o.po_number
+        FROM po_draft_claims o
+        WHERE (o.state = 'pending' OR (o.state = 'claimed' AND o.lease_expires_at < now()))
+          AND o.attempts < max_attempts
+          AND (o.not_before IS NULL OR o.not_before <= now())
+        ORDER BY o.created_at, o.po_number
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING c.*;
+END;
+$$;
+
+-- 드래프트(email_logs row)를 저장하고 작업을 drafted 로 전환
+-- claim 이 그대로일 때만 저장하고 email_logs id 를 반환, 아니면 NULL (다른 worker 가 가져감)
+CREATE OR REPLACE FUNCTION complete_po_draft(claimed_po text, claim_attempt integer, draft jsonb)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    log_row email_logs;
+    new_id bigint;
+BEGIN
+    PERFORM 1 FROM po_draft_claims
+    WHERE po_number = claimed_po AND state = 'claimed' AND attempts = claim_attempt
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    log_row := jsonb_populate_record(NULL::email_logs, draft);
+    INSERT INTO email_logs (
+        sender_role, direction, sent_at, subject, draft_body, recipient_email,
+        status, trigger_reason, summary, po_number
+    ) VALUES (
+        log_row.sender_role, log_row.direction, log_row.sent_at, log_row.subject, log_row.draft_body,
+        log_row.recipient_email, log_row.status, log_row.trigger_reason, log_row.summary, log_row.po_number
+    )
+    RETURNING id INTO new_id;
+
+    UPDATE po_draft_claims
+    SET state = 'drafted', email_log_id = new_id, lease_expires_at = NULL, last_error = NULL, updated_at = now()
+    WHERE po_number = claimed_po;
+    RETURN new_id;
+END;
+$$;
+
+-- 실패한 작업을 다시 pending 으로 (재시도 횟수를 다 썼으면 failed), 다음 claim 은 백오프 후에
+DROP FUNCTION IF EXISTS release_po_draft(text, integer, text, integer);
+CREATE OR REPLACE FUNCTION release_po_draft(
+    claimed_po text,
+    claim_attempt integer,
+    error text,
+    max_attempts integer DEFAULT 5,
+    retry_seconds integer DEFAULT 60
+)
+RETURNS text
+LANGUAGE sql
+AS $$
+    UPDATE po_draft_claims
+    SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+        claimed_by = NULL,
+        lease_expires_at = NULL,
+        last_error = left(error, 1000),
+        not_before = now() + make_interval(secs => least(3600, retry_seconds * power(2, greatest(attempts - 1, 0)))),
+        updated_at = now()
+    WHERE po_number = claimed_po AND state = 'claimed' AND attempts = claim_attempt
+    RETURNING state;
+$$;
@@ -0,0 +1,60 @@
+-- purchase_orders / email_logs row 변경 시 pg_notify('row_changes', ...) 로 알림
+-- common/change_feed.py 의 PostgresChangeFeed 가 LISTEN 하여 폴링 루프 대신 변경이 있을 때만 조회
+--
+-- payload: {"table": ..., "op": "INSERT" | "UPDATE" | "DELETE", "row": {식별 / 상태 컬럼}}
+-- NOTIFY payload 는 8000 bytes 제한이 있으므로 본문은 보내지 않습니다.
+-- 같은 트랜잭션 안의 알림은 커밋된 뒤에 전달되므로 수신 측이 조회하면 변경된 row 가 보입니다.
+
+CREATE OR REPLACE FUNCTION notify_row_change()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    changed record;
+    row_data jsonb;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+
+    IF TG_TABLE_NAME = 'purchase_orders' THEN
+        row_data := jsonb_build_object(
+            'id', changed.id,
+            'po_number', changed.po_number,
+            'update_status', changed.update_status,
+            'human_confirmed', changed.human_confirmed,
+            'submitted_at', changed.submitted_at,
+            'eta', changed.eta
+        );
+    ELSE
+        row_data := jsonb_build_object(
+            'id', changed.id,
+            'message_id', changed.message_id,
+            'thread_id', changed.thread_id,
+            'po_number', changed.po_number,
+            'direction', changed.direction,
+            'sender_role', changed.sender_role,
+            'status', changed.status
+        );
+    END IF;
+
+    PERFORM pg_notify('row_changes', jsonb_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'row', row_data
+    )::text);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS purchase_orders_notify_change ON purchase_orders;
+CREATE TRIGGER purchase_orders_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON purchase_orders
+    FOR EACH ROW EXECUTE FUNCTION notify_row_change();
+
+DROP TRIGGER IF EXISTS email_logs_notify_change ON email_logs;
+CREATE TRIGGER email_logs_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON email_logs
+    FOR EACH ROW EXECUTE FUNCTION notify_row_change();
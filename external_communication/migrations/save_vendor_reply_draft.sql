@@ -0,0 +1,33 @@
+-- 벤더 답장 드래프트 저장과 원본 수신 메일의 processed 표시를 한 트랜잭션으로
+-- handle_general_vendor_email 이 드래프트 insert 후 별도 update 로 processed 를 표시하면,
+-- 그 사이에 핸들러가 타임아웃으로 취소될 때 드래프트는 있는데 원본은 미처리로 남아 다음 스캔에서 드래프트가 또 만들어집니다.
+--
+-- 원본 메일이 이미 processed 면 (다른 스캔이 먼저 처리) 드래프트를 저장하지 않고 NULL 을 반환합니다.
+
+CREATE OR REPLACE FUNCTION save_vendor_reply_draft(draft jsonb, inbound_id bigint)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    log_row email_logs;
+    new_id bigint;
+BEGIN
+    UPDATE email_logs
+    SET status = 'processed'
+    WHERE id = inbound_id AND status IS DISTINCT FROM 'processed';
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    log_row := jsonb_populate_record(NULL::email_logs, draft);
+    INSERT INTO email_logs (
+        po_number, thread_id, direction, status, draft_body, subject,
+        sender_role, sender_email, recipient_email, created_at
+    ) VALUES (
+        log_row.po_number, log_row.thread_id, log_row.direction, log_row.status, log_row.draft_body, log_row.subject,
+        log_row.sender_role, log_row.sender_email, log_row.recipient_email, COALESCE(log_row.created_at, now())
+    )
+    RETURNING id INTO new_id;
+    RETURN new_id;
+END;
+$$;
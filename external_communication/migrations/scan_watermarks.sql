@@ -0,0 +1,18 @@
+-- 증분 스캔 위치(watermark) 저장 테이블
+-- handle_general_vendor_email 은 마지막으로 확인한 벤더 수신 메일의 (created_at, id) 를 'vendor_reply' 이름으로 저장하고,
+-- 다음 스캔에서는 그 이후에 들어온 메일의 thread 만 email_threads_awaiting_reply 뷰에서 조회합니다.
+
+CREATE TABLE IF NOT EXISTS scan_watermarks (
+    name text PRIMARY KEY,
+    last_created_at timestamptz NOT NULL,
+    last_id bigint NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- watermark 이후의 벤더 수신 메일을 (created_at, id) 순서로 읽기 위한 인덱스
+CREATE INDEX IF NOT EXISTS idx_email_logs_vendor_inbound_seq
+    ON email_logs (created_at, id)
+    WHERE sender_role = 'vendor'
+      AND direction IN ('inbound', 'incoming')
+      AND thread_id IS NOT NULL
+      AND thread_id <> '';
@@ -0,0 +1,31 @@
+# openai_clients.py
+"""
+이벤트 루프별 AsyncOpenAI 클라이언트
+
+AsyncOpenAI 의 연결 풀은 처음 사용한 이벤트 루프에 묶이므로, 모듈 전역 클라이언트 하나를
+asyncio.run 으로 새로 만든 루프(동기 wrapper, offload 된 핸들러)에서 다시 쓰면 "Event loop is closed" 로 실패합니다.
+실행 중인 루프마다 클라이언트를 하나씩 만들어 그 루프 안에서 공유하고, 루프가 사라지면 함께 버립니다.
+
+사용 예:
+    response = await get_async_openai(OPENAI_API_KEY).chat.completions.create(...)
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Optional
+
+from openai import AsyncOpenAI
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_async_openai(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """현재 이벤트 루프의 AsyncOpenAI 클라이언트 (루프 안에서 호출해야 함)"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+        if client is None:
+            client = _clients[loop] = AsyncOpenAI(api_key=api_key)
+        return client
@@ -0,0 +1,100 @@
+# po_draft_claims.py
+"""
+PO 발행 이메일 드래프트 작성 작업 claim (external_communication/migrations/po_draft_claims.sql)
+
+발행 확정된 PO 는 po_draft_claims 에 한 번 등록되고, FOR UPDATE SKIP LOCKED 로 worker 하나에게만 lease 와 함께 할당됩니다.
+드래프트 저장과 'drafted' 전환은 complete_po_draft 한 트랜잭션에서 처리되고, claim 받은 attempts 값으로 fencing 하므로
+lease 가 만료되어 다른 worker 가 다시 claim 한 뒤 늦게 끝난 결과는 버려집니다 (PO 당 드래프트는 한 번만 저장됨).
+
+사용 예:
+    drafted = draft_pending_pos(supabase, worker_id, build_draft, concurrency=4)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+PO_DRAFT_LEASE_SECONDS = 300  # 이 시간 안에 끝내지 못하면 (worker 종료 등) 다른 worker 가 다시 claim
+PO_DRAFT_MAX_ATTEMPTS = 5  # 이 횟수만큼 실패하면 'failed' 로 두고 더 이상 시도하지 않음
+PO_DRAFT_RETRY_SECONDS = 60  # 실패한 PO 를 다시 claim 하기까지의 첫 대기 시간 (실패할 때마다 2배, 최대 1시간)
+
+# po_number -> 저장할 email_logs row
+DraftBuilder = Callable[[str], Dict[str, Any]]
+
+
+def claim_po_drafts(client, worker_id: str, batch_size: int = 10,
+                    lease_seconds: int = PO_DRAFT_LEASE_SECONDS) -> List[Dict[str, Any]]:
+    """드래프트가 필요한 PO 를 최대 batch_size 건 claim (po_number / attempts 포함 claim row 목록)"""
+    return client.rpc("claim_po_drafts", {
+        "worker_id": worker_id,
+        "batch_size": batch_size,
+        "lease_seconds": lease_seconds,
+        "max_attempts": PO_DRAFT_MAX_ATTEMPTS,
+    }).execute().data or []
+
+
+def release_po_draft(client, claim: Dict[str, Any], error) -> Optional[str]:
+    """실패한 claim 을 반납 (재시도 횟수가 남았으면 백오프 후 다시 claim 되는 pending, 아니면 failed)"""
+    return client.rpc("release_po_draft", {
+        "claimed_po": claim["po_number"],
+        "claim_attempt": claim["attempts"],
+        "error": str(error),
+        "max_attempts": PO_DRAFT_MAX_ATTEMPTS,
+        "retry_seconds": PO_DRAFT_RETRY_SECONDS,
+    }).execute().data
+
+
+def draft_claimed_po(client, claim: Dict[str, Any], build_draft: DraftBuilder) -> Optional[int]:
+    """
+    claim 한 PO 의 드래프트를 만들어 저장하고 'drafted' 로 전환한 뒤 email_logs id 반환
+    lease 가 만료되어 다른 worker 가 다시 claim 했으면 저장하지 않고 None 을 반환
+    """
+    po_number = claim["po_number"]
+    try:
+        email_log_id = client.rpc("complete_po_draft", {
+            "claimed_po": po_number,
+            "claim_attempt": claim["attempts"],
+            "draft": build_draft(po_number),
+        }).execute().data
+    except Exception as e:
+        print(f"❌ Draft failed for PO {po_number}: {e}")
+        try:
+            release_po_draft(client, claim, e)
+        except Exception as release_error:
+            # 반납하지 못해도 lease 가 만료되면 다시 claim 됨
+            print(f"⚠️ Failed to release claim for PO {po_number}: {release_error}")
+        raise
+
+    if email_log_id is None:
+        print(f"⚠️ Claim for PO {po_number} was lost (lease expired), draft discarded.")
+        return None
+    print(f"📩 Draft inserted into email_logs for PO: {po_number}")
+    return email_log_id
+
+
+def draft_pending_pos(client, worker_id: str, build_draft: DraftBuilder, concurrency: int = 4,
+                      max_rounds: Optional[int] = None) -> int:
+    """
+    claim 할 PO 가 없을 때까지 concurrency 개씩 claim 해서 동시에 드래프트 작성하고 저장한 수 반환
+    (여러 프로세스에서 동시에 실행해도 같은 PO 를 두 번 처리하지 않음)
+    """
+    drafted = 0
+    rounds = 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="po-draft") as pool:
+        while max_rounds is None or rounds < max_rounds:
+            claims = claim_po_drafts(client, worker_id, batch_size=concurrency)
+            if not claims:
+                break
+            rounds += 1
+            print(f"📦 Claimed {len(claims)} POs for drafting: {[c['po_number'] for c in claims]}")
+            futures = [pool.submit(draft_claimed_po, client, claim, build_draft) for claim in claims]
+            failed = 0
+            for future in futures:
+                try:
+                    if future.result() is not None:
+                        drafted += 1
+                except Exception:
+                    failed += 1
+            if failed == len(claims):
+                # 모두 실패했으면 (LLM / DB 장애 등) 바로 다시 claim 해서 재시도 횟수를 소모하지 않고 다음 호출로 미룸
+                break
+    return drafted
@@ -1,11 +1,19 @@
 # po_issued_vendor_email.py
 
 import os
+import sys
 from dotenv import load_dotenv
 from supabase import create_client
 from datetime import datetime
 from po_templates.generate_po_draft import generate_po_email_draft
-from utils.insert_draft import insert_po_email_draft
+from utils.insert_draft import insert_po_email_draft, build_po_email_draft
+import po_draft_claims
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from common.models import PurchaseOrderForEmail, PoItem
 
 # Load environment
 load_dotenv()
@@ -13,42 +21,27 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def fetch_po_to_email():
-    # Step 1: Find all POs that are confirmed and not sent yet
-    pending_pos = supabase.table("purchase_orders") \
-        .select("*") \
-        .eq("update_status", "issued") \
-        .eq("human_confirmed", True) \
-        .is_("submitted_at", "null") \
-        .execute().data
-
-    if not pending_pos:
-        print("✅ No pending POs to email.")
-        return None
-
-    # Step 2: Filter out POs that already have a drafted email
-    for po in pending_pos:
-        po_id = po["id"]
-        existing_draft = supabase.table("email_logs") \
-            .select("id") \
-            .eq("po_number", po["po_number"]) \
-            .eq("status", "draft") \
-            .eq("sender_role", "system") \
-            .execute().data
-
-        if not existing_draft:
-            return po  # only return first PO without draft
+def build_po_draft(po_number):
+    """claim 한 PO 의 드래프트 email_logs row (po_draft_claims.complete_po_draft 에 저장됨)"""
+    context = fetch_po_context(po_number=po_number)
+    draft = generate_po_email_draft(context)
+    return build_po_email_draft(context, draft["body"], po_number)
 
-    print("✅ All pending POs already have a draft.")
-    return None
+def draft_pending_pos(worker_id, concurrency=4, max_rounds=None):
+    """claim 할 수 있는 PO 를 모두 concurrency 개씩 동시에 드래프트 작성 (po_draft_claims.draft_pending_pos)"""
+    return po_draft_claims.draft_pending_pos(supabase, worker_id, build_po_draft, concurrency, max_rounds)
 
 # Step 2: Fetch all related data for context
-def fetch_po_context(po_id):
-    # Fetch PO itself
-    po = supabase.table("purchase_orders").select("*").eq("id", po_id).single().execute().data
+def fetch_po_context(po_id=None, po_number=None):
+    # Fetch PO itself (id 또는 po_number 로)
+    query = supabase.table("purchase_orders").select(PurchaseOrderForEmail.projection())
+    query = query.eq("po_number", po_number) if po_number else query.eq("id", po_id)
+    po = PurchaseOrderForEmail.from_row(query.single().execute().data)
     
     # Fetch PO items using po_number
-    items = supabase.table("po_items").select("*").eq("po_number", po["po_number"]).execute().data
+    items = PoItem.from_rows(
+        supabase.table("po_items").select(PoItem.projection()).eq("po_number", po["po_number"]).execute().data
+    )
     
     return {
         "po": po,
@@ -66,16 +59,7 @@ def create_and_save_draft(context):
     return draft
 
 # Test
-po = fetch_po_to_email()
-if po:
-    print("📦 Fetched PO:", po)
-    context = fetch_po_context(po["id"])
-    print("📦 Full PO Context:")
-    print(context)
-    
-    # Create and save draft
-    draft = create_and_save_draft(context)
-    print("\n📧 Generated Email Draft:")
-    print("Subject:", draft["subject"])
-    print("\nBody:")
-    print(draft["body"]) 
\ No newline at end of file
+if __name__ == "__main__":
+    import socket
+    drafted = draft_pending_pos(f"{socket.gethostname()}:{os.getpid()}")
+    print(f"\n📧 Drafted {drafted} PO emails")
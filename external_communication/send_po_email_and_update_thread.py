@@ -1,20 +1,19 @@
 # send_po_email_and_update_thread.py
 
 import os
-import base64
-from datetime import datetime
-from email.mime.text import MIMEText
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+import sys
 from dotenv import load_dotenv
 
 # 프로젝트 루트(=po_agent_os) 경로
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv(dotenv_path=os.path.join(BASE_DIR, '.env'))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
 
-from config import supabase
+from config import settings, supabase
+from common.models import EmailLogDraft
+from common.gmail_auth import get_gmail_auth
+from gmail_sender import GmailSender, fill_po_thread_ids
 
 # Gmail API 범위 설정
 SCOPES = ['https://www.googleapis.com/auth/gmail.send', 'https://www.googleapis.com/auth/gmail.modify']
@@ -24,80 +23,26 @@ CREDENTIALS_PATH = os.path.join(BASE_DIR, 'credentials.json')
 TOKEN_PATH = os.path.join(BASE_DIR, 'token.json')
 
 def authenticate_gmail():
-    """Gmail API 인증"""
-    creds = None
-    if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                CREDENTIALS_PATH, SCOPES
-            )
-            creds = flow.run_local_server(port=0)
-        # 인증 후 token 저장
-        with open(TOKEN_PATH, 'w') as token:
-            token.write(creds.to_json())
-    service = build('gmail', 'v1', credentials=creds)
-    return service
-
-def create_message(to_email, subject, body):
-    """Gmail API용 메시지 포맷 생성"""
-    message = MIMEText(body, "plain")
-    message["to"] = to_email
-    message["subject"] = subject
-    raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    return {"raw": raw_message}
-
-def send_email(service, to_email, subject, body):
-    """Gmail API를 이용한 이메일 발송"""
-    message = create_message(to_email, subject, body)
-    sent_message = service.users().messages().send(userId="me", body=message).execute()
-    return sent_message.get("threadId")
+    """Gmail API 인증 (token / service 는 common.gmail_auth 가 프로세스에서 캐시)"""
+    return get_gmail_auth(TOKEN_PATH, CREDENTIALS_PATH, SCOPES).service()
 
 def send_po_emails_and_update_threads():
-    """draft 상태의 이메일들을 실제 발송하고, thread_id를 업데이트"""
+    """draft 상태의 이메일들을 worker pool 로 발송하고, thread_id / 상태를 한 번에 업데이트"""
     # draft 상태인 이메일들 불러오기
-    drafts_response = supabase.table("email_logs").select("*").eq("status", "draft").execute()
-    drafts = drafts_response.data
+    drafts_response = supabase.table("email_logs").select(EmailLogDraft.projection()).eq("status", "draft").execute()
+    drafts = EmailLogDraft.from_rows(drafts_response.data)
 
     if not drafts:
         print("No drafts to send.")
-        return
-
-    # Gmail 서비스 인증
-    service = authenticate_gmail()
-
-    for draft in drafts:
-        try:
-            print(f"\nSending email for draft ID: {draft['id']}, subject: {draft['subject']}")
-
-            # 이메일 발송
-            thread_id = send_email(
-                service,
-                to_email=draft["recipient_email"],
-                subject=draft["subject"],
-                body=draft["draft_body"]
-            )
-
-            # email_logs 업데이트
-            supabase.table("email_logs").update({
-                "thread_id": thread_id,
-                "status": "sent",
-                "sent_at": datetime.utcnow().isoformat()
-            }).eq("id", draft["id"]).execute()
-
-            # purchase_orders도 업데이트 (submitted_at)
-            if draft.get("po_number"):
-                supabase.table("purchase_orders").update({
-                    "submitted_at": datetime.utcnow().isoformat()
-                }).eq("po_number", draft["po_number"]).execute()
-
-            print(f"✅ Successfully sent and updated draft ID {draft['id']} (thread_id: {thread_id})")
-
-        except Exception as e:
-            print(f"❌ Error sending email for draft ID {draft['id']}: {e}")
+        return []
+
+    # PO 후속 메일은 그 PO 의 기존 thread 에 이어서 발송
+    fill_po_thread_ids(supabase, drafts)
+    print(f"\nSending {len(drafts)} drafts...")
+    sender = GmailSender(supabase, authenticate_gmail, workers=settings.GMAIL_SEND_WORKERS)
+    results = sender.send_drafts(drafts)
+    print(f"📤 Sent {sum(r.ok for r in results)}/{len(results)} drafts")
+    return results
 
 if __name__ == "__main__":
     send_po_emails_and_update_threads() 
\ No newline at end of file
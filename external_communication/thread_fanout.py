@@ -0,0 +1,68 @@
+# thread_fanout.py
+"""
+email thread 단위 동시 처리
+
+handle_general_vendor_email 이 답장 대기 중인 thread 들을 최대 concurrency 개까지 동시에 처리할 때 사용합니다.
+- thread 하나의 단계(분석 → context 조회 → 답장 생성 → 저장)는 process 코루틴 안에서 순서대로 실행되고,
+  다른 thread 는 그 사이 동시에 진행됩니다.
+- 스캔이 겹쳐 실행되어도 같은 thread 는 한 번에 하나만 처리하고, 이미 처리 중인 thread 는 건너뜁니다.
+- 건너뛰었거나 실패한 thread 는 unfinished 로 돌려줘 호출 측이 watermark 를 그 앞에서 멈추게 합니다.
+
+사용 예:
+    fanout = ThreadFanout()
+    results, unfinished = await fanout.run(pending_threads, process_vendor_thread, concurrency=8)
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadFanout:
+    """처리 중인 thread 목록을 프로세스 안에서 공유 (다른 이벤트 루프 / 스레드의 스캔과도)"""
+
+    def __init__(self):
+        self._active: Set[Any] = set()
+        self._lock = threading.Lock()
+
+    def claim(self, thread_id) -> bool:
+        with self._lock:
+            if thread_id in self._active:
+                return False
+            self._active.add(thread_id)
+            return True
+
+    def release(self, thread_id):
+        with self._lock:
+            self._active.discard(thread_id)
+
+    async def run(self, emails: Iterable[Dict[str, Any]], process: Callable[[Dict[str, Any]], Awaitable[Any]],
+                  concurrency: int) -> Tuple[List[Any], Set[Any]]:
+        """
+        emails (thread 마다 최신 메일 하나) 를 최대 concurrency 개까지 동시에 process 하고
+        (결과 목록 - 입력 순서, 건너뛰었거나 실패한 thread_id 집합) 반환
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        unfinished: Set[Any] = set()
+
+        async def run_one(email):
+            thread_id = email["thread_id"]
+            if not self.claim(thread_id):
+                logger.info(f"⏭️ Thread {thread_id} is already being processed, skipping.")
+                unfinished.add(thread_id)
+                return None
+            try:
+                async with semaphore:
+                    return await process(email)
+            except Exception as e:
+                logger.exception(f"[❌ VENDOR REPLY AGENT ERROR] thread {thread_id}: {e}")
+                unfinished.add(thread_id)
+                return None
+            finally:
+                self.release(thread_id)
+
+        results = await asyncio.gather(*(run_one(email) for email in emails))
+        return list(results), unfinished
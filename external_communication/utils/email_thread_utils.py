@@ -1,4 +1,16 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
 from config import supabase
+from common.models import ThreadAwaitingReply
+from common.pagination import fetch_page, iter_keyset
+
+# body 포함 뷰를 읽을 때의 페이지 크기
+THREAD_PAGE_SIZE = 200
 
 def get_latest_thread_id_for_po(po_number: str) -> str | None:
     response = supabase.table("email_logs").select("thread_id") \
@@ -9,4 +21,38 @@ def get_latest_thread_id_for_po(po_number: str) -> str | None:
         .execute()
     if response.data and response.data[0]["thread_id"]:
         return response.data[0]["thread_id"]
-    return None
\ No newline at end of file
+    return None
+
+def get_threads_awaiting_reply(thread_ids: list[str] | None = None) -> list[ThreadAwaitingReply]:
+    """
+    최신 메시지가 아직 처리되지 않은 벤더 수신 메일인 thread 목록을 한 번의 쿼리로 조회합니다.
+    각 row에는 thread에 매핑된 PO 번호(mapped_po_number)가 함께 포함됩니다.
+    thread_ids 를 주면 그 thread 들만 조회합니다 (증분 스캔).
+    body 를 포함하므로 (created_at, id) keyset 으로 한 페이지씩 읽어 PostgREST max-rows 에서 잘리지 않게 합니다.
+    (migrations/email_threads_awaiting_reply.sql 뷰 사용)
+    """
+    where = None
+    if thread_ids is not None:
+        if not thread_ids:
+            return []
+        where = lambda q: q.in_("thread_id", thread_ids)
+    rows = iter_keyset(supabase, "email_threads_awaiting_reply", ThreadAwaitingReply.projection(),
+                       where=where, page_size=THREAD_PAGE_SIZE)
+    return ThreadAwaitingReply.from_rows(rows)
+
+def get_new_vendor_messages(after=None, limit: int = 500, descending: bool = False) -> list[dict]:
+    """
+    watermark 커서 after=(created_at, id) 이후에 저장된 벤더 수신 메일을 (created_at, id) 순서로 최대 limit 건 조회
+    (id / created_at / thread_id 만, migrations/scan_watermarks.sql 의 인덱스 사용)
+    descending=True 이고 after 가 없으면 가장 최근 메일부터
+    """
+    return fetch_page(
+        supabase, "email_logs", "id, created_at, thread_id",
+        where=lambda q: q.eq("sender_role", "vendor")
+            .in_("direction", ["inbound", "incoming"])
+            .not_.is_("thread_id", "null")
+            .neq("thread_id", ""),
+        after=after,
+        page_size=limit,
+        descending=descending,
+    )
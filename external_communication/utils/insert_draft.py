@@ -1,7 +1,8 @@
-def insert_po_email_draft(supabase, po_context, draft_body, po_number):
+def build_po_email_draft(po_context, draft_body, po_number):
+    """PO 발행 이메일 드래프트의 email_logs row"""
     po = po_context["po"]
 
-    result = supabase.table("email_logs").insert({
+    return {
         "sender_role": "admin",
         "direction": "outgoing",
         "sent_at": None,
@@ -12,6 +13,14 @@ def insert_po_email_draft(supabase, po_context, draft_body, po_number):
         "trigger_reason": "po_issued",
         "summary": "Initial PO draft created for vendor confirmation.",
         "po_number": po_number,
-    }).execute()
+    }
+
+
+def insert_po_email_draft(supabase, po_context, draft_body, po_number):
+    po = po_context["po"]
+
+    result = supabase.table("email_logs").insert(
+        build_po_email_draft(po_context, draft_body, po_number)
+    ).execute()
 
-    print(f"📩 Draft inserted into email_logs for PO: {po['po_number']}") 
\ No newline at end of file
+    print(f"📩 Draft inserted into email_logs for PO: {po['po_number']}")
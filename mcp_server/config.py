@@ -1,12 +1,56 @@
+import os
 from pydantic_settings import BaseSettings
 
+MCP_SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
 class MCPSettings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     DEBUG: bool = True
     CORS_ORIGINS: list = ["*"]
+
+    # 메시지 큐 저장소 (SQLite WAL)
+    MCP_QUEUE_PATH: str = os.path.join(MCP_SERVER_DIR, "data", "queue.sqlite3")
+    # /receive 로 전달된 메시지가 ack 없이 다시 전달되기까지의 시간 (초)
+    VISIBILITY_TIMEOUT: float = 60.0
+    # /receive 한 번에 전달하는 최대 메시지 수
+    RECEIVE_MAX_MESSAGES: int = 100
+    # /receive long polling 최대 대기 시간 (초)
+    LONG_POLL_MAX_WAIT: float = 30.0
+    # receiver 별 큐 최대 메시지 수 / 바이트 수 (넘으면 429 + Retry-After)
+    MAX_QUEUE_DEPTH: int = 10000
+    MAX_QUEUE_BYTES: int = 50 * 1024 * 1024
+    QUEUE_FULL_RETRY_AFTER: int = 5
+    # /send_batch 한 번에 보낼 수 있는 최대 메시지 수
+    MAX_BATCH_SIZE: int = 500
+    # 같은 idempotency key 의 메시지를 중복으로 보고 버리는 기간 (초) / 보관할 최대 key 수
+    IDEMPOTENCY_WINDOW: float = 24 * 3600
+    IDEMPOTENCY_MAX_KEYS: int = 100000
+    # 메시지에 priority / ttl 이 없을 때 type 별 기본값 (priority 가 높을수록 먼저 전달, ttl 초가 지나면 버림)
+    MESSAGE_TYPE_PRIORITIES: dict = {
+        "vendor_email": 10,
+        "vendor_reply": 10,
+        "send_draft_email": 10,
+        "new_po": 5,
+        "follow_up_check": 0,
+    }
+    MESSAGE_TYPE_TTLS: dict = {
+        "follow_up_check": 3600,
+    }
+
+    # uvicorn worker 수 (큐는 receiver 기준 파티션 파일로 나눠 모든 worker 가 공유)
+    WORKERS: int = 1
+    # 1 이면 MCP_QUEUE_PATH 파일 하나를 그대로 사용, 2 이상이면 queue-0.sqlite3 ... 파일로 나눔
+    # 기존 파일의 메시지는 새 파티션 파일로 옮겨지지 않으므로, 값을 바꾸기 전에는 큐를 모두 ack 해 비워야 함
+    MCP_QUEUE_PARTITIONS: int = 1
+    # worker 가 여러 개일 때 다른 worker 가 받은 메시지를 long polling 대기 중에 확인하는 주기 (초)
+    WORKER_SYNC_INTERVAL: float = 0.05
+
+    # consumer group member 가 이 시간(초) 동안 수신 요청이 없으면 live member 에서 제외
+    GROUP_MEMBER_TIMEOUT: float = 60.0
     
     class Config:
         env_file = ".env"
+        extra = "ignore"
 
-settings = MCPSettings() 
\ No newline at end of file
+settings = MCPSettings()
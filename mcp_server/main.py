@@ -1,11 +1,28 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Dict, List
-from datetime import datetime
+from fastapi import FastAPI, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Optional, Tuple
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+import os
+import sys
+import time
+import asyncio
 import uvicorn
+import orjson
+from datetime import datetime, timezone
 
-app = FastAPI()
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from mcp_server.config import settings
+from mcp_server.queue_store import QueueFull, group_queue
+from mcp_server.partitions import PartitionedMessageStore
+from mcp_server import metrics
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # CORS 설정
 app.add_middleware(
@@ -16,33 +33,475 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-# 메시지 큐 (agent_id 기준)
-message_queues: Dict[str, List[Dict]] = {}
+# 메시지 큐 (agent_id 기준, 서버 재시작 후에도 유지)
+store = PartitionedMessageStore(settings.MCP_QUEUE_PATH, settings.MCP_QUEUE_PARTITIONS)
+
+# long polling 중인 /receive 요청을 깨우기 위한 receiver 별 Condition
+receiver_conditions: Dict[str, asyncio.Condition] = {}
 
-class MCPMessage(BaseModel):
+def get_condition(agent_id: str) -> asyncio.Condition:
+    if agent_id not in receiver_conditions:
+        receiver_conditions[agent_id] = asyncio.Condition()
+    return receiver_conditions[agent_id]
+
+async def notify_receiver(agent_id: str):
+    condition = get_condition(agent_id)
+    async with condition:
+        condition.notify_all()
+
+class TopicMessage(BaseModel):
+    """topic 으로 발행하는 메시지 (receiver 대신 구독 중인 group 마다 한 번씩 전달)"""
     sender: str
-    receiver: str
     content: str
     type: str
     payload: dict
+    # 재전송된 메시지를 걸러내기 위한 key (없으면 payload 의 이메일 message_id 사용)
+    idempotency_key: Optional[str] = None
+    # 높을수록 먼저 전달 (없으면 MESSAGE_TYPE_PRIORITIES 의 type 별 기본값)
+    priority: Optional[int] = None
+    # 이 시각(또는 ttl 초)이 지나도록 전달되지 않은 메시지는 버림 (없으면 MESSAGE_TYPE_TTLS 의 기본값)
+    expires_at: Optional[datetime] = None
+    ttl: Optional[float] = None
+
+    def resolved_priority(self) -> int:
+        if self.priority is not None:
+            return self.priority
+        return settings.MESSAGE_TYPE_PRIORITIES.get(self.type, 0)
+
+    def resolved_expires_at(self) -> Optional[float]:
+        if self.expires_at is not None:
+            expires_at = self.expires_at
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            return expires_at.timestamp()
+        ttl = self.ttl if self.ttl is not None else settings.MESSAGE_TYPE_TTLS.get(self.type)
+        return time.time() + ttl if ttl is not None else None
+
+    def resolved_idempotency_key(self) -> Optional[str]:
+        if self.idempotency_key:
+            return self.idempotency_key
+        email_data = self.payload.get("email_data")
+        message_id = (email_data.get("message_id") if isinstance(email_data, dict) else None) \
+            or self.payload.get("message_id")
+        return f"{self.type}:{message_id}" if message_id else None
+
+class MCPMessage(TopicMessage):
+    receiver: str
+
+class PublishRequest(BaseModel):
+    messages: List[TopicMessage]
+
+class BatchSendRequest(BaseModel):
+    messages: List[MCPMessage]
+
+class AckRequest(BaseModel):
+    receipts: List[str]
+
+class ExtendRequest(BaseModel):
+    receipts: List[str]
+    visibility_timeout: float = Field(gt=0)
+
+def queue_full_error(e: QueueFull) -> HTTPException:
+    metrics.rejected.inc(reason="queue_full", status="429")
+    return HTTPException(
+        status_code=429,
+        detail={"error": "queue full", "receiver": e.receiver, "depth": e.depth, "bytes": e.size},
+        headers={"Retry-After": str(settings.QUEUE_FULL_RETRY_AFTER)},
+    )
+
+async def enqueue_messages(messages: List[MCPMessage]) -> List[Tuple[int, bool]]:
+    """
+    메시지 저장 후 대기 중인 수신자 깨우기 (큐가 가득 차면 QueueFull, 아무것도 저장되지 않음)
+    Returns: 메시지별 (메시지 id, IDEMPOTENCY_WINDOW 안에 이미 받은 중복 메시지인지)
+    """
+    results = store.enqueue_many(
+        [
+            {
+                **msg.model_dump(),
+                "idempotency_key": msg.resolved_idempotency_key(),
+                "priority": msg.resolved_priority(),
+                "expires_at": msg.resolved_expires_at(),
+            }
+            for msg in messages
+        ],
+        max_depth=settings.MAX_QUEUE_DEPTH,
+        max_bytes=settings.MAX_QUEUE_BYTES,
+        dedup_window=settings.IDEMPOTENCY_WINDOW,
+        dedup_max_keys=settings.IDEMPOTENCY_MAX_KEYS,
+    )
+    stored = set()
+    for msg, (_, duplicate) in zip(messages, results):
+        if duplicate:
+            metrics.duplicates.inc(receiver=msg.receiver)
+            continue
+        stored.add(msg.receiver)
+        metrics.enqueued.inc(receiver=msg.receiver)
+        metrics.payload_size.observe(len(msg.content.encode()) + len(orjson.dumps(msg.payload, default=str)))
+    for receiver in stored:
+        await notify_receiver(receiver)
+    return results
 
 @app.post("/send")
-def send_message(msg: MCPMessage):
-    if msg.receiver not in message_queues:
-        message_queues[msg.receiver] = []
-    message_queues[msg.receiver].append({
-        "sender": msg.sender,
-        "type": msg.type,
-        "payload": msg.payload,
-        "timestamp": datetime.utcnow().isoformat()
-    })
-    return {"status": "message queued", "to": msg.receiver}
+async def send_message(msg: MCPMessage, idempotency_key: Optional[str] = Header(None)):
+    """메시지 저장 (Idempotency-Key 헤더 또는 idempotency_key 필드가 같은 재전송은 저장하지 않음)"""
+    if idempotency_key and not msg.idempotency_key:
+        msg.idempotency_key = idempotency_key
+    try:
+        (message_id, duplicate), = await enqueue_messages([msg])
+    except QueueFull as e:
+        raise queue_full_error(e)
+    if duplicate:
+        return {"status": "duplicate ignored", "to": msg.receiver, "id": message_id}
+    return {"status": "message queued", "to": msg.receiver, "id": message_id}
+
+@app.post("/send_batch")
+async def send_batch(req: BatchSendRequest):
+    """
+    여러 메시지를 한 번에 저장 (전부 저장되거나 전부 거절됨)
+    한 receiver 큐라도 가득 차면 429 + Retry-After
+    """
+    if len(req.messages) > settings.MAX_BATCH_SIZE:
+        metrics.rejected.inc(reason="batch_too_large", status="413")
+        raise HTTPException(status_code=413, detail=f"batch larger than {settings.MAX_BATCH_SIZE} messages")
+    try:
+        results = await enqueue_messages(req.messages)
+    except QueueFull as e:
+        raise queue_full_error(e)
+    return {
+        "status": "messages queued",
+        "ids": [message_id for message_id, _ in results],
+        "duplicates": [i for i, (_, duplicate) in enumerate(results) if duplicate],
+    }
+
+def record_delivery(agent_id: str, messages: List[Dict]):
+    """전달한 메시지 수와 저장 후 전달까지 걸린 시간 기록"""
+    if not messages:
+        return
+    now = time.time()
+    metrics.dequeued.inc(len(messages), receiver=agent_id)
+    metrics.message_age.observe_many(
+        (now - datetime.fromisoformat(m["timestamp"]).replace(tzinfo=timezone.utc).timestamp() for m in messages),
+        receiver=agent_id,
+    )
+
+async def lease_messages(agent_id: str, max_messages: int, visibility_timeout: float,
+                         wait: Optional[float], members: int = 1) -> List[Dict]:
+    """
+    메시지를 lease 하고, 없으면 도착할 때까지 최대 wait 초 대기 (wait=None 이면 무기한)
+    members > 1 (consumer group) 이면 한 member 가 모두 가져가지 않도록 전달 가능한 메시지의 1/members 까지만 lease
+    """
+    deadline = None if wait is None else time.time() + wait
+    condition = get_condition(agent_id)
+    # lease 와 대기를 같은 lock 안에서 해야 그 사이에 도착한 메시지의 알림을 놓치지 않음
+    # SQLite 호출은 스레드에서 실행 (쓰기 lock 을 기다리는 동안 이벤트 루프를 막지 않도록)
+    async with condition:
+        while True:
+            # 읽기 전용 COUNT 로 먼저 확인하고, 전달할 메시지가 있을 때만 쓰기 트랜잭션(BEGIN IMMEDIATE)으로 lease
+            # (WORKERS > 1 에서 빈 큐를 WORKER_SYNC_INTERVAL 마다 확인할 때 쓰기 lock 을 잡지 않음)
+            available = await asyncio.to_thread(store.available, agent_id)
+            messages = []
+            if available:
+                limit = max_messages
+                if members > 1:
+                    limit = min(max_messages, max(1, -(-available // members)))
+                messages = await asyncio.to_thread(store.lease, agent_id, limit, visibility_timeout)
+            remaining = None if deadline is None else deadline - time.time()
+            if messages or (remaining is not None and remaining <= 0):
+                record_delivery(agent_id, messages)
+                return messages
+            # ack 되지 않은 메시지가 다시 전달 가능해지는 시각에도 깨어남
+            next_visible = await asyncio.to_thread(store.next_visible_at, agent_id)
+            if next_visible is not None:
+                until_visible = max(0.0, next_visible - time.time())
+                remaining = until_visible if remaining is None else min(remaining, until_visible)
+            # 다른 worker 프로세스로 들어온 메시지는 이 Condition 을 깨우지 못하므로 주기적으로 다시 확인
+            if settings.WORKERS > 1:
+                sync = settings.WORKER_SYNC_INTERVAL
+                remaining = sync if remaining is None else min(remaining, sync)
+            try:
+                await asyncio.wait_for(condition.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
 
 @app.get("/receive/{agent_id}")
-def receive_messages(agent_id: str):
-    messages = message_queues.get(agent_id, [])
-    message_queues[agent_id] = []  # 메시지 수신 후 큐 비우기
+async def receive_messages(
+    agent_id: str,
+    max_messages: int = Query(settings.RECEIVE_MAX_MESSAGES, ge=1, le=1000),
+    visibility_timeout: Optional[float] = Query(None, ge=0),
+    wait: float = Query(0, ge=0, le=settings.LONG_POLL_MAX_WAIT),
+):
+    """
+    메시지 수신 (큐에서 삭제되지 않음)
+    처리가 끝난 메시지는 receipt 로 /ack 해야 하며, visibility_timeout 안에 ack 되지 않으면 다시 전달됨
+    wait > 0 이면 메시지가 도착하거나 wait 초가 지날 때까지 응답을 보류 (long polling)
+    """
+    if visibility_timeout is None:
+        visibility_timeout = settings.VISIBILITY_TIMEOUT
+    messages = await lease_messages(agent_id, max_messages, visibility_timeout, wait)
+    return {"messages": messages}
+
+@app.post("/ack/{agent_id}")
+def ack_messages(agent_id: str, req: AckRequest):
+    acked = store.ack(agent_id, req.receipts)
+    metrics.acked.inc(acked, receiver=agent_id)
+    return {"status": "acked", "acked": acked}
+
+@app.post("/extend/{agent_id}")
+def extend_messages(agent_id: str, req: ExtendRequest):
+    """처리 중인 메시지의 lease 를 지금부터 visibility_timeout 초로 연장 (재전달된 메시지의 이전 receipt 는 무시)"""
+    return {"status": "extended", "extended": store.extend(agent_id, req.receipts, req.visibility_timeout)}
+
+@app.exception_handler(RequestValidationError)
+async def count_invalid_requests(request, exc: RequestValidationError):
+    metrics.rejected.inc(reason="invalid", status="422")
+    return await request_validation_exception_handler(request, exc)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text format 메트릭 (큐 깊이 / 저장·전달·ack 수 / 전달 지연 / 메시지 크기 / 거절 수)"""
+    return PlainTextResponse(
+        metrics.render(store.queue_stats(), store.expired_count, settings.WORKERS),
+        media_type="text/plain; version=0.0.4",
+    )
+
+# === topic / consumer group ===
+
+def require_group(topic: str, group: str) -> str:
+    queue = group_queue(topic, group)
+    if store.group_state(queue) is None:
+        raise HTTPException(status_code=404, detail=f"group {group} is not subscribed to topic {topic}")
+    return queue
+
+@app.put("/topics/{topic}/groups/{group}")
+def subscribe_group(topic: str, group: str):
+    """consumer group 을 topic 에 등록 (이후 발행된 메시지부터 group 마다 한 번씩 전달)"""
+    store.subscribe(topic, group)
+    return {"status": "subscribed", "topic": topic, "group": group, **store.group_state(group_queue(topic, group))}
+
+@app.delete("/topics/{topic}/groups/{group}")
+def unsubscribe_group(topic: str, group: str):
+    """group 구독 해제 (group 에 남은 메시지도 삭제)"""
+    if not store.unsubscribe(topic, group):
+        raise HTTPException(status_code=404, detail=f"group {group} is not subscribed to topic {topic}")
+    return {"status": "unsubscribed", "topic": topic, "group": group}
+
+@app.get("/topics/{topic}/groups/{group}")
+def group_status(topic: str, group: str):
+    """group cursor (committed_offset 이하는 모두 ack 됨), 남은 메시지 수, live member"""
+    return {"topic": topic, "group": group, **store.group_state(require_group(topic, group))}
+
+@app.post("/topics/{topic}/publish")
+async def publish(topic: str, req: PublishRequest):
+    """
+    topic 을 구독 중인 모든 group 에 메시지 저장 (전부 저장되거나 전부 거절됨)
+    idempotency key 는 group 별로 적용되어 재발행해도 group 마다 한 번만 전달됨
+    """
+    if len(req.messages) * max(1, len(store.groups(topic))) > settings.MAX_BATCH_SIZE:
+        metrics.rejected.inc(reason="batch_too_large", status="413")
+        raise HTTPException(status_code=413, detail=f"batch larger than {settings.MAX_BATCH_SIZE} messages")
+    try:
+        groups = await publish_messages(topic, req.messages)
+    except QueueFull as e:
+        raise queue_full_error(e)
+    return {"status": "published" if groups else "no subscribers", "groups": groups}
+
+async def publish_messages(topic: str, messages: List[TopicMessage]) -> Dict[str, List[int]]:
+    """
+    topic 을 구독 중인 group 마다 메시지 저장 (큐가 가득 차면 QueueFull, 아무것도 저장되지 않음)
+    Returns: group → 메시지 id 목록 (구독 중인 group 이 없으면 빈 dict)
+    """
+    groups = store.groups(topic)
+    results = await enqueue_messages([
+        MCPMessage(**msg.model_dump(), receiver=group_queue(topic, group))
+        for group in groups for msg in messages
+    ])
+    count = len(messages)
+    return {
+        group: [message_id for message_id, _ in results[i * count:(i + 1) * count]]
+        for i, group in enumerate(groups)
+    }
+
+@app.get("/topics/{topic}/groups/{group}/receive")
+async def receive_group_messages(
+    topic: str,
+    group: str,
+    member: str,
+    max_messages: int = Query(settings.RECEIVE_MAX_MESSAGES, ge=1, le=1000),
+    visibility_timeout: Optional[float] = Query(None, ge=0),
+    wait: float = Query(0, ge=0, le=settings.LONG_POLL_MAX_WAIT),
+):
+    """
+    group member 로 메시지 수신 (/receive 와 같은 lease 방식)
+    같은 group 의 member 끼리는 메시지를 나눠 받으며, 전달 가능한 메시지를 live member 수로 나눈 만큼만 받음
+    """
+    queue = require_group(topic, group)
+    members = store.heartbeat(queue, member, settings.GROUP_MEMBER_TIMEOUT)
+    if visibility_timeout is None:
+        visibility_timeout = settings.VISIBILITY_TIMEOUT
+    messages = await lease_messages(queue, max_messages, visibility_timeout, wait, members)
     return {"messages": messages}
 
+@app.post("/topics/{topic}/groups/{group}/ack")
+def ack_group_messages(topic: str, group: str, req: AckRequest):
+    """처리한 메시지 ack (group cursor 가 ack 되지 않은 가장 오래된 메시지 앞까지 이동)"""
+    queue = require_group(topic, group)
+    acked = store.ack(queue, req.receipts)
+    metrics.acked.inc(acked, receiver=queue)
+    return {"status": "acked", "acked": acked, "committed_offset": store.group_state(queue)["committed_offset"]}
+
+@app.post("/topics/{topic}/groups/{group}/extend")
+def extend_group_messages(topic: str, group: str, req: ExtendRequest):
+    """group member 가 처리 중인 메시지의 lease 연장"""
+    queue = require_group(topic, group)
+    return {"status": "extended", "extended": store.extend(queue, req.receipts, req.visibility_timeout)}
+
+def parse_stream_frame(text: Optional[str]) -> Dict:
+    """/stream 클라이언트 frame 파싱 / 형식 검증 (잘못된 frame 이면 ValueError)"""
+    if text is None:
+        raise ValueError("frames must be JSON text")
+    frame = orjson.loads(text)  # orjson.JSONDecodeError 는 ValueError
+    if not isinstance(frame, dict):
+        raise ValueError("frame must be a JSON object")
+    frame_type = frame.get("type")
+    if frame_type == "credit":
+        credit = frame.get("credit", 0)
+        if isinstance(credit, bool) or not isinstance(credit, int):
+            raise ValueError("credit must be an integer")
+    elif frame_type == "ack":
+        receipts = frame.get("receipts", [])
+        if not isinstance(receipts, list) or not all(isinstance(receipt, str) for receipt in receipts):
+            raise ValueError("receipts must be a list of strings")
+    elif frame_type in ("send", "publish"):
+        messages = frame.get("messages", [])
+        if not isinstance(messages, list) or not all(isinstance(m, dict) for m in messages):
+            raise ValueError("messages must be a list of objects")
+        if frame_type == "publish" and not (isinstance(frame.get("topic"), str) and frame["topic"]):
+            raise ValueError("topic is required")
+    else:
+        raise ValueError(f"unknown frame type: {frame_type!r}")
+    return frame
+
+@app.websocket("/stream/{agent_id}")
+async def stream_messages(
+    websocket: WebSocket,
+    agent_id: str,
+    after: int = 0,
+    visibility_timeout: Optional[float] = None,
+):
+    """
+    agent_id 메시지 스트림 (WebSocket)
+
+    클라이언트 → 서버 frame:
+      {"type": "credit", "credit": n}     n 건을 더 받을 수 있음 (credit 만큼만 전송 = flow control)
+      {"type": "ack", "receipts": [...]}  처리 완료
+      {"type": "send", "request_id": ..., "messages": [{MCPMessage}, ...]}  /send_batch 와 동일 → {"type": "sent", "ids": [...]}
+      {"type": "publish", "request_id": ..., "topic": ..., "messages": [{TopicMessage}, ...]}
+        /topics/{topic}/publish 와 동일 → {"type": "sent", "groups": {group: [...]}}
+      형식이 잘못된 frame (JSON 이 아니거나 필드 타입이 다름) 은 {"type": "error", "status": 400} 으로 거절하고 연결은 유지
+        (큐가 가득 차면 {"type": "error", "status": 429, "retry_after": ...})
+    서버 → 클라이언트 frame:
+      {"type": "message", "offset": <메시지 id>, "message": {...}}  message 는 /receive 의 메시지와 같은 형식
+
+    재연결 시 after=<마지막으로 처리한 offset> 을 주면 그 이하의 메시지는 처리 완료로 보고 이어서 전달합니다.
+    연결이 끊기면 ack 되지 않은 메시지는 바로 다시 전달 가능 상태가 됩니다.
+    """
+    if visibility_timeout is None:
+        visibility_timeout = settings.VISIBILITY_TIMEOUT
+    await websocket.accept()
+    if after:
+        store.ack_through(agent_id, after)
+
+    credit = 0
+    credit_granted = asyncio.Event()
+    in_flight: Dict[str, int] = {}  # receipt -> offset
+    send_lock = asyncio.Lock()
+
+    async def send_frame(frame: Dict):
+        async with send_lock:
+            await websocket.send_text(orjson.dumps(frame, default=str).decode())
+
+    async def write_messages():
+        nonlocal credit
+        while True:
+            if credit <= 0:
+                credit_granted.clear()
+                await credit_granted.wait()
+                continue
+            messages = await lease_messages(agent_id, credit, visibility_timeout, None)
+            for message in messages:
+                in_flight[message["receipt"]] = message["id"]
+                await send_frame({"type": "message", "offset": message["id"], "message": message})
+            credit -= len(messages)
+
+    async def read_frames():
+        nonlocal credit
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                frame = parse_stream_frame(message.get("text"))
+            except ValueError as e:
+                # 잘못된 frame 은 거절하고 연결은 유지 (lease 중인 메시지는 그대로)
+                metrics.rejected.inc(reason="invalid", status="400")
+                await send_frame({"type": "error", "status": 400, "detail": str(e)})
+                continue
+            frame_type = frame["type"]
+            if frame_type == "credit":
+                credit += max(0, frame.get("credit", 0))
+                credit_granted.set()
+            elif frame_type == "ack":
+                receipts = frame.get("receipts", [])
+                metrics.acked.inc(store.ack(agent_id, receipts), receiver=agent_id)
+                for receipt in receipts:
+                    in_flight.pop(receipt, None)
+            elif frame_type == "send":
+                request_id = frame.get("request_id")
+                try:
+                    messages = [MCPMessage(**m) for m in frame.get("messages", [])]
+                    results = await enqueue_messages(messages)
+                except ValidationError as e:
+                    metrics.rejected.inc(reason="invalid", status="422")
+                    await send_frame({"type": "error", "request_id": request_id, "status": 422,
+                                      "detail": e.errors(include_url=False)})
+                    continue
+                except QueueFull as e:
+                    metrics.rejected.inc(reason="queue_full", status="429")
+                    await send_frame({"type": "error", "request_id": request_id, "status": 429,
+                                      "detail": str(e), "retry_after": settings.QUEUE_FULL_RETRY_AFTER})
+                    continue
+                await send_frame({"type": "sent", "request_id": request_id,
+                                  "ids": [message_id for message_id, _ in results],
+                                  "duplicates": [i for i, (_, duplicate) in enumerate(results) if duplicate]})
+            elif frame_type == "publish":
+                request_id = frame.get("request_id")
+                try:
+                    messages = [TopicMessage(**m) for m in frame.get("messages", [])]
+                    groups = await publish_messages(frame["topic"], messages)
+                except ValidationError as e:
+                    metrics.rejected.inc(reason="invalid", status="422")
+                    await send_frame({"type": "error", "request_id": request_id, "status": 422,
+                                      "detail": e.errors(include_url=False)})
+                    continue
+                except QueueFull as e:
+                    metrics.rejected.inc(reason="queue_full", status="429")
+                    await send_frame({"type": "error", "request_id": request_id, "status": 429,
+                                      "detail": str(e), "retry_after": settings.QUEUE_FULL_RETRY_AFTER})
+                    continue
+                await send_frame({"type": "sent", "request_id": request_id, "groups": groups})
+
+    writer = asyncio.create_task(write_messages())
+    try:
+        await read_frames()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        writer.cancel()
+        # 처리되지 않은 메시지는 visibility timeout 을 기다리지 않고 다시 전달
+        store.release(agent_id, list(in_flight))
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    if settings.WORKERS > 1:
+        uvicorn.run("mcp_server.main:app", host="127.0.0.1", port=8000, workers=settings.WORKERS)
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=8000)
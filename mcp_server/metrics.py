@@ -0,0 +1,125 @@
+"""
+MCP 서버 메트릭 (Prometheus text exposition format)
+
+별도 라이브러리 없이 counter / histogram 을 프로세스 메모리에 모으고 /metrics 에서 텍스트로 내보냅니다.
+counter 와 histogram 은 uvicorn worker 프로세스마다 따로 집계되므로 WORKERS > 1 이면 worker 라벨(pid)로 구분되고,
+큐 깊이 / 바이트 수는 모든 worker 가 공유하는 큐 파일에서 매번 읽습니다.
+"""
+
+import os
+import bisect
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# 메시지가 저장된 뒤 전달되기까지 걸린 시간 (초)
+AGE_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+# content + payload 크기 (바이트)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self, extra: Labels = ()) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(labels + extra)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._counts: Dict[Labels, List[int]] = {}  # 버킷별 개수 (마지막은 +Inf)
+        self._sums: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def observe_many(self, values: Iterable[float], **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for value in values:
+                counts[bisect.bisect_left(self.buckets, value)] += 1
+                self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def observe(self, value: float, **labels):
+        self.observe_many((value,), **labels)
+
+    def render(self, extra: Labels = ()) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), self._sums.get(key, 0.0)) for key, counts in self._counts.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + extra + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels + extra)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels + extra)} {cumulative}")
+        return lines
+
+
+enqueued = Counter("mcp_messages_enqueued_total", "Messages stored, by receiver")
+duplicates = Counter("mcp_messages_duplicate_total", "Messages ignored as idempotent duplicates, by receiver")
+dequeued = Counter("mcp_messages_dequeued_total", "Messages delivered (leased), by receiver")
+acked = Counter("mcp_messages_acked_total", "Messages acknowledged, by receiver")
+rejected = Counter("mcp_requests_rejected_total", "Send requests rejected, by reason and HTTP status")
+message_age = Histogram("mcp_message_age_seconds", "Time from enqueue to delivery, by receiver", AGE_BUCKETS)
+payload_size = Histogram("mcp_message_size_bytes", "Content plus payload size of stored messages", SIZE_BUCKETS)
+
+REGISTRY = (enqueued, duplicates, dequeued, acked, rejected, message_age, payload_size)
+
+
+def render(queue_stats: Dict[str, Tuple[int, int]], expired: int, workers: int) -> str:
+    """
+    queue_stats: receiver -> (메시지 수, 바이트 수) (lease 중인 메시지 포함)
+    expired: 이 프로세스가 만료로 버린 메시지 수
+    """
+    extra: Labels = (("worker", str(os.getpid())),) if workers > 1 else ()
+    lines = [
+        "# HELP mcp_queue_depth Messages waiting or in flight, by receiver",
+        "# TYPE mcp_queue_depth gauge",
+    ]
+    for receiver, (depth, _) in sorted(queue_stats.items()):
+        lines.append(f"mcp_queue_depth{_format_labels((('receiver', receiver),))} {depth}")
+    lines += ["# HELP mcp_queue_bytes Stored content plus payload bytes, by receiver", "# TYPE mcp_queue_bytes gauge"]
+    for receiver, (_, size) in sorted(queue_stats.items()):
+        lines.append(f"mcp_queue_bytes{_format_labels((('receiver', receiver),))} {size}")
+    lines += [
+        "# HELP mcp_messages_expired_total Messages dropped after their expiry time",
+        "# TYPE mcp_messages_expired_total counter",
+        f"mcp_messages_expired_total{_format_labels(extra)} {expired}",
+    ]
+    for metric in REGISTRY:
+        lines += metric.render(extra)
+    return "\n".join(lines) + "\n"
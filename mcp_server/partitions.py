@@ -0,0 +1,154 @@
+"""
+receiver 기준으로 나눈 MCP 메시지 큐 저장소
+
+receiver(agent_id)를 consistent hashing 으로 여러 SQLite 파티션 파일에 나눠 저장합니다.
+파티션마다 쓰기 lock 이 따로 있으므로 서로 다른 receiver 로 가는 메시지는 동시에 기록되고,
+모든 uvicorn worker 가 같은 로컬 파일들을 공유하므로 어느 worker 가 요청을 받아도 같은 큐를 봅니다.
+한 receiver 의 메시지는 항상 한 파티션에 있으므로 receiver 내 순서와 offset 은 그대로 유지됩니다.
+
+파티션이 1개면 기존 단일 큐 파일(path)을 그대로 쓰고, 2개 이상이면 path-0, path-1 ... 파일을 씁니다.
+파티션 수를 바꾸면 일부 receiver 가 다른 파티션으로 옮겨지고 (consistent hashing 이라 약 1/N 만 이동)
+1개에서 늘리면 기존 파일은 더 이상 열리지 않으므로, 파티션 수 변경 전에는 큐를 비워야 합니다.
+"""
+
+import os
+import bisect
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcp_server.queue_store import MessageStore, group_queue
+
+VIRTUAL_NODES = 64
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """파티션 번호를 고르는 consistent hash ring"""
+
+    def __init__(self, partitions: int, virtual_nodes: int = VIRTUAL_NODES):
+        ring = sorted(
+            (_hash(f"partition-{partition}-{vnode}"), partition)
+            for partition in range(partitions)
+            for vnode in range(virtual_nodes)
+        )
+        self._keys = [key for key, _ in ring]
+        self._partitions = [partition for _, partition in ring]
+
+    def partition_for(self, key: str) -> int:
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._partitions[index]
+
+
+class PartitionedMessageStore:
+    """MessageStore 와 같은 인터페이스로 receiver 별 파티션에 위임"""
+
+    def __init__(self, path: str, partitions: int = 1):
+        if partitions == 1 or path == ":memory:":
+            paths = [path] * partitions
+        else:
+            root, ext = os.path.splitext(path)
+            paths = [f"{root}-{partition}{ext}" for partition in range(partitions)]
+        self.partitions = [MessageStore(p) for p in paths]
+        self.ring = HashRing(partitions)
+        self._receiver_partitions: Dict[str, MessageStore] = {}
+
+    def partition_for(self, receiver: str) -> MessageStore:
+        if receiver not in self._receiver_partitions:
+            self._receiver_partitions[receiver] = self.partitions[self.ring.partition_for(receiver)]
+        return self._receiver_partitions[receiver]
+
+    def enqueue(self, message: Dict[str, Any], max_depth: Optional[int] = None,
+                max_bytes: Optional[int] = None) -> int:
+        return self.partition_for(message["receiver"]).enqueue(message, max_depth, max_bytes)
+
+    def enqueue_many(self, messages: List[Dict[str, Any]], max_depth: Optional[int] = None,
+                     max_bytes: Optional[int] = None, dedup_window: Optional[float] = None,
+                     dedup_max_keys: Optional[int] = None) -> List[Tuple[int, bool]]:
+        """
+        파티션별로 나눠 저장
+        뒤쪽 파티션에서 QueueFull 이 나면 앞서 저장한 메시지를 지워 배치 전체를 거절한 것과 같게 만듭니다.
+        """
+        groups: Dict[int, List[int]] = {}  # 파티션 index -> messages 내 위치
+        for position, message in enumerate(messages):
+            partition = self.partitions.index(self.partition_for(message["receiver"]))
+            groups.setdefault(partition, []).append(position)
+
+        results: List[Optional[Tuple[int, bool]]] = [None] * len(messages)
+        stored = []  # (파티션, [(receiver, id)]) - 이번에 새로 저장한 메시지만
+        try:
+            for partition, positions in groups.items():
+                group_results = self.partitions[partition].enqueue_many(
+                    [messages[p] for p in positions], max_depth, max_bytes, dedup_window, dedup_max_keys
+                )
+                stored.append((partition, [
+                    (messages[p]["receiver"], message_id)
+                    for p, (message_id, duplicate) in zip(positions, group_results) if not duplicate
+                ]))
+                for position, result in zip(positions, group_results):
+                    results[position] = result
+        except Exception:
+            for partition, receiver_ids in stored:
+                self.partitions[partition].discard(receiver_ids)
+            raise
+        return results
+
+    def lease(self, receiver: str, limit: int, visibility_timeout: float) -> List[Dict[str, Any]]:
+        return self.partition_for(receiver).lease(receiver, limit, visibility_timeout)
+
+    def ack(self, receiver: str, receipts: List[str]) -> int:
+        return self.partition_for(receiver).ack(receiver, receipts)
+
+    def release(self, receiver: str, receipts: List[str]) -> int:
+        return self.partition_for(receiver).release(receiver, receipts)
+
+    def extend(self, receiver: str, receipts: List[str], visibility_timeout: float) -> int:
+        return self.partition_for(receiver).extend(receiver, receipts, visibility_timeout)
+
+    def ack_through(self, receiver: str, offset: int) -> int:
+        return self.partition_for(receiver).ack_through(receiver, offset)
+
+    def next_visible_at(self, receiver: str) -> Optional[float]:
+        return self.partition_for(receiver).next_visible_at(receiver)
+
+    def available(self, receiver: str) -> int:
+        return self.partition_for(receiver).available(receiver)
+
+    def depth(self, receiver: str) -> int:
+        return self.partition_for(receiver).depth(receiver)
+
+    def queue_stats(self) -> Dict[str, Tuple[int, int]]:
+        stats = {}
+        for partition in set(self.partitions):
+            stats.update(partition.queue_stats())
+        return stats
+
+    @property
+    def expired_count(self) -> int:
+        return sum(partition.expired_count for partition in set(self.partitions))
+
+    # topic 구독 정보는 topic 기준 파티션에, group 큐 / cursor / member 는 group 큐(receiver) 기준 파티션에 저장
+
+    def subscribe(self, topic: str, group: str):
+        self.partition_for(group_queue(topic, group)).create_group_queue(group_queue(topic, group))
+        self.partition_for(f"topic:{topic}").subscribe(topic, group)
+
+    def unsubscribe(self, topic: str, group: str) -> bool:
+        removed = self.partition_for(f"topic:{topic}").unsubscribe(topic, group)
+        self.partition_for(group_queue(topic, group)).drop_group_queue(group_queue(topic, group))
+        return removed
+
+    def groups(self, topic: str) -> List[str]:
+        return self.partition_for(f"topic:{topic}").groups(topic)
+
+    def heartbeat(self, queue: str, member: str, member_timeout: float) -> int:
+        return self.partition_for(queue).heartbeat(queue, member, member_timeout)
+
+    def group_state(self, queue: str) -> Optional[Dict[str, Any]]:
+        return self.partition_for(queue).group_state(queue)
+
+    def close(self):
+        for partition in set(self.partitions):
+            partition.close()
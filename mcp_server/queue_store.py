@@ -0,0 +1,435 @@
+"""
+MCP 서버 메시지 큐 저장소 (SQLite WAL)
+
+receiver(agent_id)별 메시지를 파일에 저장하므로 서버를 재시작해도 큐가 유지됩니다.
+수신(lease) 시 메시지는 삭제되지 않고 visibility timeout 동안만 다른 수신자에게 숨겨지며,
+소비자가 처리 후 receipt 로 ack 해야 삭제됩니다. ack 되지 않은 메시지는 timeout 후 다시 전달됩니다.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+# idempotency key 보관 수 상한을 확인하는 주기 (새 key 수 기준)
+KEY_PRUNE_INTERVAL = 1000
+
+
+def group_queue(topic: str, group: str) -> str:
+    """topic 의 consumer group 이 메시지를 받는 큐(receiver) 이름"""
+    return f"{topic}#{group}"
+
+
+class QueueFull(Exception):
+    """receiver 큐가 최대 메시지 수 / 바이트 수를 넘어 더 받을 수 없음"""
+
+    def __init__(self, receiver: str, depth: int, size: int):
+        super().__init__(f"queue for {receiver} is full ({depth} messages, {size} bytes)")
+        self.receiver = receiver
+        self.depth = depth
+        self.size = size
+
+
+class MessageStore:
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._keys_since_prune = 0
+        # 여러 worker 프로세스가 같은 파일을 쓰므로 쓰기 lock 을 기다릴 시간(timeout)을 둠
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                receiver TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                type TEXT NOT NULL,
+                content TEXT NOT NULL DEFAULT '',
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                visible_at REAL NOT NULL,
+                delivery_count INTEGER NOT NULL DEFAULT 0,
+                size INTEGER NOT NULL DEFAULT 0,
+                priority INTEGER NOT NULL DEFAULT 0,
+                expires_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                receiver TEXT NOT NULL,
+                key TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (receiver, key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys (created_at);
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                topic TEXT NOT NULL,
+                group_name TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (topic, group_name)
+            );
+            CREATE TABLE IF NOT EXISTS group_cursors (
+                queue TEXT PRIMARY KEY,
+                committed_offset INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS group_members (
+                queue TEXT NOT NULL,
+                member TEXT NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (queue, member)
+            );
+        """)
+        # 이전 버전 큐 파일에 없는 컬럼 추가
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+        for column, definition in (("size", "INTEGER NOT NULL DEFAULT 0"),
+                                   ("priority", "INTEGER NOT NULL DEFAULT 0"),
+                                   ("expires_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE messages ADD COLUMN {column} {definition}")
+        self._conn.executescript("""
+            DROP INDEX IF EXISTS idx_messages_receiver;
+            CREATE INDEX IF NOT EXISTS idx_messages_receiver_priority ON messages (receiver, priority DESC, id);
+            CREATE INDEX IF NOT EXISTS idx_messages_receiver_expiry ON messages (receiver, expires_at)
+                WHERE expires_at IS NOT NULL;
+        """)
+        # 만료되어 전달하지 않고 버린 메시지 수
+        self.expired_count = 0
+
+    def enqueue(self, message: Dict[str, Any], max_depth: Optional[int] = None,
+                max_bytes: Optional[int] = None) -> int:
+        """메시지를 receiver 큐에 추가하고 메시지 id 를 반환"""
+        return self.enqueue_many([message], max_depth, max_bytes)[0][0]
+
+    def enqueue_many(self, messages: List[Dict[str, Any]], max_depth: Optional[int] = None,
+                     max_bytes: Optional[int] = None, dedup_window: Optional[float] = None,
+                     dedup_max_keys: Optional[int] = None) -> List[Tuple[int, bool]]:
+        """
+        여러 메시지를 한 트랜잭션으로 추가하고 (메시지 id, 중복 여부) 목록을 반환
+
+        dedup_window 가 주어지면 idempotency_key 가 있는 메시지 중 같은 receiver 로 최근 dedup_window 초 안에
+        같은 key 가 들어온 메시지는 저장하지 않고 처음 저장된 메시지 id 를 중복으로 반환합니다.
+        (key 는 메시지가 ack 된 뒤에도 dedup_window 동안 유지되며, 최대 dedup_max_keys 개까지만 보관)
+        추가 후 어느 receiver 큐라도 max_depth(메시지 수) / max_bytes(content + payload 크기)를 넘으면
+        아무것도 추가하지 않고 QueueFull 을 발생시킵니다.
+        """
+        now = time.time()
+        results: List[Optional[Tuple[int, bool]]] = [None] * len(messages)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if dedup_window is not None:
+                    self._conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (now - dedup_window,))
+
+                rows = []  # (batch 내 위치, messages row, idempotency key)
+                batch_keys: Dict[Tuple[str, str], int] = {}  # 같은 배치 안의 중복
+                added: Dict[str, List[int]] = {}  # receiver -> [메시지 수, 바이트 수]
+                for position, message in enumerate(messages):
+                    receiver = message["receiver"]
+                    key = message.get("idempotency_key") if dedup_window is not None else None
+                    if key:
+                        if (receiver, key) in batch_keys:
+                            continue
+                        existing = self._conn.execute(
+                            "SELECT message_id FROM idempotency_keys WHERE receiver = ? AND key = ?", (receiver, key)
+                        ).fetchone()
+                        if existing:
+                            results[position] = (existing[0], True)
+                            continue
+                        batch_keys[(receiver, key)] = position
+                    content = message.get("content", "")
+                    payload = orjson.dumps(message.get("payload", {}), default=str)
+                    size = len(content.encode()) + len(payload)
+                    payload = payload.decode()
+                    rows.append((position, (receiver, message["sender"], message["type"], content, payload,
+                                            now, now, size, message.get("priority") or 0,
+                                            message.get("expires_at")), key))
+                    counts = added.setdefault(receiver, [0, 0])
+                    counts[0] += 1
+                    counts[1] += size
+
+                if max_depth is not None or max_bytes is not None:
+                    for receiver, (count, size) in added.items():
+                        depth, total = self._conn.execute(
+                            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM messages WHERE receiver = ?", (receiver,)
+                        ).fetchone()
+                        if (max_depth is not None and depth + count > max_depth) or \
+                                (max_bytes is not None and total + size > max_bytes):
+                            raise QueueFull(receiver, depth, total)
+
+                for position, row, key in rows:
+                    cursor = self._conn.execute(
+                        "INSERT INTO messages (receiver, sender, type, content, payload, created_at, visible_at, size, "
+                        "priority, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+                    )
+                    results[position] = (cursor.lastrowid, False)
+                    if key:
+                        self._conn.execute(
+                            "INSERT INTO idempotency_keys (receiver, key, message_id, created_at) VALUES (?, ?, ?, ?)",
+                            (row[0], key, cursor.lastrowid, now)
+                        )
+                for position, message in enumerate(messages):
+                    if results[position] is None:
+                        first = batch_keys[(message["receiver"], message["idempotency_key"])]
+                        results[position] = (results[first][0], True)
+
+                # 보관 key 수 상한은 매번 세지 않고 일정 건수마다 정리
+                self._keys_since_prune += len(batch_keys)
+                if dedup_max_keys is not None and self._keys_since_prune >= KEY_PRUNE_INTERVAL:
+                    self._keys_since_prune = 0
+                    self._conn.execute(
+                        "DELETE FROM idempotency_keys WHERE rowid IN ("
+                        "SELECT rowid FROM idempotency_keys ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                        (dedup_max_keys,)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return results
+
+    def lease(self, receiver: str, limit: int, visibility_timeout: float) -> List[Dict[str, Any]]:
+        """
+        전달 가능한 메시지를 우선순위가 높은 순서, 같은 우선순위 안에서는 오래된 순서로
+        최대 limit 건 가져오고 visibility_timeout 초 동안 숨김 (만료된 메시지는 전달하지 않고 삭제)
+
+        각 메시지의 receipt 는 이번 전달에서만 유효하며, timeout 후 재전달되면 새 receipt 가 발급됩니다.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.expired_count += self._conn.execute(
+                    "DELETE FROM messages WHERE receiver = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                    (receiver, now)
+                ).rowcount
+                rows = self._conn.execute(
+                    "SELECT id, sender, type, content, payload, created_at, delivery_count, priority, expires_at "
+                    "FROM messages WHERE receiver = ? AND visible_at <= ? ORDER BY priority DESC, id LIMIT ?",
+                    (receiver, now, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE messages SET visible_at = ?, delivery_count = delivery_count + 1 WHERE id = ?",
+                    [(now + visibility_timeout, row[0]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            {
+                "id": row[0],
+                "receipt": f"{row[0]}:{row[6] + 1}",
+                "sender": row[1],
+                "type": row[2],
+                "content": row[3],
+                "payload": orjson.loads(row[4]),
+                "timestamp": datetime.utcfromtimestamp(row[5]).isoformat(),
+                "delivery_count": row[6] + 1,
+                "priority": row[7],
+                "expires_at": datetime.utcfromtimestamp(row[8]).isoformat() if row[8] is not None else None,
+            }
+            for row in rows
+        ]
+
+    def ack(self, receiver: str, receipts: List[str]) -> int:
+        """처리가 끝난 메시지 삭제 (재전달된 메시지의 이전 receipt 는 무시)"""
+        params = _parse_receipts(receiver, receipts)
+        if not params:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "DELETE FROM messages WHERE receiver = ? AND id = ? AND delivery_count = ?", params
+            )
+            acked = self._conn.total_changes - before
+            if acked:
+                self._advance_cursor(receiver, max(p[1] for p in params))
+            return acked
+
+    def discard(self, receiver_ids: List[tuple]) -> int:
+        """(receiver, id) 목록의 메시지와 그 idempotency key 를 전달 여부와 관계없이 삭제"""
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("DELETE FROM messages WHERE receiver = ? AND id = ?", receiver_ids)
+            deleted = self._conn.total_changes - before
+            self._conn.executemany(
+                "DELETE FROM idempotency_keys WHERE receiver = ? AND message_id = ?", receiver_ids
+            )
+            return deleted
+
+    def release(self, receiver: str, receipts: List[str]) -> int:
+        """lease 중인 메시지를 즉시 다시 전달 가능하게 함 (스트림 연결이 끊긴 경우 등)"""
+        params = [(time.time(),) + p for p in _parse_receipts(receiver, receipts)]
+        if not params:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE messages SET visible_at = ? WHERE receiver = ? AND id = ? AND delivery_count = ?", params
+            )
+            return self._conn.total_changes - before
+
+    def extend(self, receiver: str, receipts: List[str], visibility_timeout: float) -> int:
+        """
+        lease 중인 메시지를 지금부터 visibility_timeout 초 동안 더 숨김 (처리가 길어지는 메시지의 재전달 방지)
+        이미 다른 소비자에게 재전달된 메시지의 이전 receipt 는 무시
+        """
+        params = [(time.time() + visibility_timeout,) + p for p in _parse_receipts(receiver, receipts)]
+        if not params:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE messages SET visible_at = ? WHERE receiver = ? AND id = ? AND delivery_count = ?", params
+            )
+            return self._conn.total_changes - before
+
+    def ack_through(self, receiver: str, offset: int) -> int:
+        """
+        offset(메시지 id) 이하이면서 이미 전달된 적이 있는 메시지를 처리 완료로 보고 삭제 (누적 ack)
+        아직 한 번도 전달되지 않았거나 다른 소비자가 lease 중인 메시지는 그대로 둠
+        """
+        with self._lock:
+            acked = self._conn.execute(
+                "DELETE FROM messages WHERE receiver = ? AND id <= ? AND delivery_count > 0 AND visible_at <= ?",
+                (receiver, offset, time.time())
+            ).rowcount
+            if acked:
+                self._advance_cursor(receiver, offset)
+            return acked
+
+    def next_visible_at(self, receiver: str) -> Optional[float]:
+        """lease 중인 메시지가 다시 전달 가능해지는 가장 빠른 시각"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT MIN(visible_at) FROM messages WHERE receiver = ? AND visible_at > ?", (receiver, time.time())
+            ).fetchone()[0]
+
+    def available(self, receiver: str) -> int:
+        """지금 바로 전달할 수 있는 (lease 중이 아닌) 메시지 수"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE receiver = ? AND visible_at <= ?", (receiver, time.time())
+            ).fetchone()[0]
+
+    def depth(self, receiver: str) -> int:
+        """receiver 큐에 남아 있는 메시지 수 (lease 중인 메시지 포함)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE receiver = ?", (receiver,)
+            ).fetchone()[0]
+
+    def queue_stats(self) -> Dict[str, Tuple[int, int]]:
+        """receiver 별 (메시지 수, content + payload 바이트 수) (lease 중인 메시지 포함)"""
+        with self._lock:
+            return {
+                row[0]: (row[1], row[2])
+                for row in self._conn.execute(
+                    "SELECT receiver, COUNT(*), COALESCE(SUM(size), 0) FROM messages GROUP BY receiver"
+                )
+            }
+
+    # === topic / consumer group ===
+
+    def subscribe(self, topic: str, group: str):
+        """topic 에 consumer group 등록 (등록 이후 발행된 메시지부터 받음)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO subscriptions (topic, group_name, created_at) VALUES (?, ?, ?)",
+                (topic, group, time.time())
+            )
+
+    def unsubscribe(self, topic: str, group: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM subscriptions WHERE topic = ? AND group_name = ?", (topic, group)
+            ).rowcount > 0
+
+    def groups(self, topic: str) -> List[str]:
+        """topic 을 구독 중인 consumer group 목록"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT group_name FROM subscriptions WHERE topic = ? ORDER BY group_name", (topic,)
+            )]
+
+    def create_group_queue(self, queue: str):
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO group_cursors (queue) VALUES (?)", (queue,))
+
+    def drop_group_queue(self, queue: str):
+        """group 큐의 메시지 / cursor / member 기록 삭제"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table, column in (("messages", "receiver"), ("idempotency_keys", "receiver"),
+                                      ("group_cursors", "queue"), ("group_members", "queue")):
+                    self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (queue,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, queue: str, member: str, member_timeout: float) -> int:
+        """
+        member 가 살아 있음을 기록하고 group 의 live member 수를 반환
+        member_timeout 초 동안 수신 요청이 없던 member 는 제외하고 삭제
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO group_members (queue, member, last_seen) VALUES (?, ?, ?)", (queue, member, now)
+            )
+            self._conn.execute(
+                "DELETE FROM group_members WHERE queue = ? AND last_seen < ?", (queue, now - member_timeout)
+            )
+            return self._conn.execute("SELECT COUNT(*) FROM group_members WHERE queue = ?", (queue,)).fetchone()[0]
+
+    def group_state(self, queue: str) -> Optional[Dict[str, Any]]:
+        """group 큐의 cursor (committed_offset 이하 메시지는 모두 ack 됨) / 남은 메시지 수 / member 목록"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT committed_offset FROM group_cursors WHERE queue = ?", (queue,)
+            ).fetchone()
+            if row is None:
+                return None
+            depth = self._conn.execute("SELECT COUNT(*) FROM messages WHERE receiver = ?", (queue,)).fetchone()[0]
+            members = [r[0] for r in self._conn.execute(
+                "SELECT member FROM group_members WHERE queue = ? ORDER BY member", (queue,)
+            )]
+        return {"committed_offset": row[0], "depth": depth, "members": members}
+
+    def _advance_cursor(self, queue: str, acked_offset: int):
+        """
+        ack 후 group cursor 를 남은 메시지 중 가장 작은 id 바로 앞까지 이동 (lock 안에서 호출)
+        남은 메시지가 없으면 이번에 ack 한 offset 까지 이동
+        """
+        row = self._conn.execute("SELECT committed_offset FROM group_cursors WHERE queue = ?", (queue,)).fetchone()
+        if row is None:
+            return
+        pending = self._conn.execute("SELECT MIN(id) FROM messages WHERE receiver = ?", (queue,)).fetchone()[0]
+        committed = pending - 1 if pending is not None else max(row[0], acked_offset)
+        if committed > row[0]:
+            self._conn.execute(
+                "UPDATE group_cursors SET committed_offset = ? WHERE queue = ?", (committed, queue)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+
+def _parse_receipts(receiver: str, receipts: List[str]) -> List[tuple]:
+    """receipt("<id>:<delivery_count>") 목록을 (receiver, id, delivery_count) 파라미터로 변환"""
+    params = []
+    for receipt in receipts:
+        message_id, _, delivery_count = str(receipt).partition(":")
+        if message_id.isdigit() and delivery_count.isdigit():
+            params.append((receiver, int(message_id), int(delivery_count)))
+    return params
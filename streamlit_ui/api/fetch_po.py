@@ -1,13 +1,16 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
 from api.supabase import supabase
+from common.pagination import iter_keyset
+
+PO_LIST_COLUMNS = "po_id, po_number, vendor_id, created_at, expected_delivery_date, submitted_at, ai_status, flag, status, comments, vendors(name)"
 
 def get_po_list(user_id=None):
-    query = (
-        supabase
-        .table("purchase_orders")
-        .select("po_id, po_number, vendor_id, created_at, expected_delivery_date, submitted_at, ai_status, flag, status, comments, vendors(name)")
-        .order("created_at", desc=True)
-    )
-    if user_id:
-        query = query.eq("user_id", user_id)
-    response = query.execute()
-    return response.data
+    # keyset 페이지 단위로 읽어 PostgREST 행 제한에 걸려 목록이 잘리지 않도록 함
+    where = (lambda query: query.eq("user_id", user_id)) if user_id else None
+    return list(iter_keyset(supabase, "purchase_orders", PO_LIST_COLUMNS, where=where, descending=True))
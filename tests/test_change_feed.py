@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import asyncio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from common.change_feed import LocalChangeFeed, RowChange, RESYNC, is_draft, is_inbound_email, is_po_ready_to_send
+
+
+def test_subscription_wakes_on_matching_change_only():
+    async def scenario():
+        feed = LocalChangeFeed(live=True)
+        drafts = feed.subscribe("email_logs", predicate=is_draft)
+        pos = feed.subscribe("purchase_orders", predicate=is_po_ready_to_send)
+
+        feed.publish("email_logs", "UPDATE", {"id": 1, "status": "sent"})
+        feed.publish("purchase_orders", "UPDATE", {"po_number": "PO-1", "update_status": "issued",
+                                                   "human_confirmed": True, "submitted_at": None})
+        started = time.monotonic()
+        assert await drafts.wait(0.3) == []
+        changes = await pos.wait(5)
+        # 이벤트가 있으면 폴링 간격을 기다리지 않고 바로 깨어남
+        assert time.monotonic() - started < 1
+        assert [c.row["po_number"] for c in changes] == ["PO-1"]
+
+        # 연이어 온 변경은 한 번에 묶어서 반환
+        for i in range(3):
+            feed.publish("email_logs", "INSERT", {"id": i, "status": "draft"})
+        assert len(await drafts.wait(5)) == 3
+
+    asyncio.run(scenario())
+
+
+def test_resync_reaches_every_subscription_and_idle_timeout_falls_back():
+    async def scenario():
+        feed = LocalChangeFeed(resync_interval=300)
+        subscriptions = [feed.subscribe("email_logs"), feed.subscribe("purchase_orders")]
+        feed.emit(RowChange("*", RESYNC))
+        for subscription in subscriptions:
+            assert [c.op for c in await subscription.wait(1)] == [RESYNC]
+        # 실제 DB 알림이 없으면 기존 폴링 간격, 있으면 resync 간격으로 대기
+        assert feed.idle_timeout(10) == 10
+        assert LocalChangeFeed(resync_interval=300, live=True).idle_timeout(10) == 300
+
+    asyncio.run(scenario())
+
+
+def test_inbound_email_predicate_matches_both_direction_values():
+    assert is_inbound_email(RowChange("email_logs", "INSERT", {"id": 1, "direction": "inbound"}))
+    assert is_inbound_email(RowChange("email_logs", "INSERT", {"id": 2, "direction": "incoming"}))
+    assert not is_inbound_email(RowChange("email_logs", "INSERT", {"id": 3, "direction": "outbound"}))
+    assert not is_inbound_email(RowChange("email_logs", "UPDATE", {"id": 4, "direction": "inbound"}))
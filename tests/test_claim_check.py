@@ -0,0 +1,96 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from common.claim_check import EmailBodyResolver
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, client):
+        self.client = client
+        self.columns = None
+        self.message_ids = None
+
+    def select(self, columns):
+        self.columns = columns
+        return self
+
+    def in_(self, column, values):
+        assert column == "message_id"
+        self.message_ids = list(values)
+        return self
+
+    def execute(self):
+        self.client.queries.append(self.message_ids)
+        return Response([row for row in self.client.rows if row["message_id"] in self.message_ids])
+
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def table(self, name):
+        assert name == "email_logs"
+        return FakeQuery(self)
+
+
+def email_log(n):
+    return {"id": n, "message_id": f"m-{n}", "thread_id": f"t-{n}", "po_number": f"PO-{n}",
+            "sender_email": "vendor@example.com", "direction": "inbound", "status": "unprocessed",
+            "body": f"ETA for PO-{n} is next week"}
+
+
+def claim_check_payload(n):
+    # Vendor_email_logger_agent 의 MCPService.build_message 가 claim-check 모드에서 보내는 payload
+    return {
+        "email_data": {"message_id": f"m-{n}", "thread_id": f"t-{n}", "subject": "ETA",
+                       "from": "Vendor <vendor@example.com>", "direction": "inbound"},
+        "claim_check": True,
+    }
+
+
+def test_claim_check_payload_is_resolved_by_message_id():
+    client = FakeClient([email_log(1), email_log(2)])
+    resolver = EmailBodyResolver(client)
+
+    email_data = resolver.resolve(claim_check_payload(1))
+
+    assert client.queries == [["m-1"]]
+    assert email_data["body_text"] == "ETA for PO-1 is next week"
+    assert email_data["email_log_id"] == 1 and email_data["po_number"] == "PO-1"
+    assert email_data["sender_email"] == "vendor@example.com" and email_data["status"] == "unprocessed"
+    # 라우팅 필드는 그대로 유지
+    assert email_data["thread_id"] == "t-1" and email_data["subject"] == "ETA"
+
+
+def test_batch_is_fetched_once_and_cached_rows_are_not_queried_again():
+    client = FakeClient([email_log(n) for n in range(1, 4)])
+    resolver = EmailBodyResolver(client, cache_size=2)
+
+    resolver.resolve(claim_check_payload(1))
+    results = resolver.resolve_many([claim_check_payload(n) for n in (1, 2, 3)] + [claim_check_payload(9)])
+
+    # m-1 은 캐시에서, 나머지는 한 번의 쿼리로 조회 / email_logs 에 없는 message_id 는 본문 없이 반환
+    assert client.queries == [["m-1"], ["m-2", "m-3", "m-9"]]
+    assert [r.get("email_log_id") for r in results] == [1, 2, 3, None]
+    assert "body_text" not in results[3]
+    # cache_size 를 넘으면 오래된 row 부터 버림
+    resolver.resolve(claim_check_payload(1))
+    assert client.queries[-1] == ["m-1"]
+
+
+def test_payload_without_claim_check_is_returned_as_is():
+    client = FakeClient([email_log(1)])
+    payload = {"email_data": {"message_id": "m-1", "body_text": "inline body"}, "claim_check": False}
+
+    assert EmailBodyResolver(client).resolve(payload) == payload["email_data"]
+    assert client.queries == []
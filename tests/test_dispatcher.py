@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+import asyncio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BASE_DIR, os.path.join(BASE_DIR, "external_communication")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from dispatcher import TypedDispatcher
+
+
+def message(msg_type, n, **payload):
+    return {"type": msg_type, "receipt": f"{msg_type}-{n}", "payload": {"n": n, **payload}}
+
+
+class Acks:
+    def __init__(self):
+        self.receipts = []
+
+    async def __call__(self, receipts):
+        self.receipts.extend(receipts)
+
+
+def test_each_type_runs_up_to_its_own_concurrency():
+    async def scenario():
+        running = {"slow": 0, "fast": 0}
+        peak = {"slow": 0, "fast": 0}
+
+        def tracked(msg_type):
+            async def handler(payload):
+                running[msg_type] += 1
+                peak[msg_type] = max(peak[msg_type], running[msg_type])
+                await asyncio.sleep(0.05)
+                running[msg_type] -= 1
+            return handler
+
+        acks = Acks()
+        dispatcher = TypedDispatcher(on_ack=acks, ack_interval=0.01)
+        dispatcher.register("slow", tracked("slow"), concurrency=2, offload=False)
+        dispatcher.register("fast", tracked("fast"), concurrency=3, offload=False)
+        await dispatcher.start()
+        started = time.perf_counter()
+        await dispatcher.submit([message("slow", n) for n in range(6)] + [message("fast", n) for n in range(6)])
+        while len(acks.receipts) < 12:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        await dispatcher.stop()
+        return peak, elapsed
+
+    peak, elapsed = asyncio.run(scenario())
+    assert peak == {"slow": 2, "fast": 3}
+    # slow 6건을 2개씩 (3라운드) 처리하는 동안 fast 도 함께 처리됨
+    assert elapsed < 0.5
+
+
+def test_only_successful_messages_are_acked():
+    async def scenario():
+        async def handler(payload):
+            if payload["n"] % 2:
+                raise RuntimeError("boom")
+
+        acks = Acks()
+        dispatcher = TypedDispatcher(on_ack=acks, ack_interval=0.01)
+        dispatcher.register("job", handler, concurrency=2, offload=False)
+        await dispatcher.start()
+        await dispatcher.submit([message("job", n) for n in range(4)] + [message("unknown", 9)])
+        while dispatcher.routes["job"].stats.succeeded + dispatcher.routes["job"].stats.failed < 4:
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        return acks.receipts, dispatcher.metrics()["job"]
+
+    receipts, stats = asyncio.run(scenario())
+    # 실패한 메시지는 ack 하지 않아 visibility timeout 후 재전달됨, 핸들러가 없는 type 은 ack
+    assert sorted(receipts) == ["job-0", "job-2", "unknown-9"]
+    assert stats["succeeded"] == 2 and stats["failed"] == 2
+
+
+def test_timeout_cancels_in_loop_handler_but_offloaded_handler_finishes():
+    async def scenario():
+        async def in_loop(payload):
+            await asyncio.sleep(1)
+
+        async def offloaded(payload):
+            time.sleep(0.2)  # 스레드에서 실행되는 동기 작업
+
+        acks = Acks()
+        dispatcher = TypedDispatcher(on_ack=acks, ack_interval=0.01)
+        dispatcher.register("in_loop", in_loop, timeout=0.05, offload=False)
+        dispatcher.register("offloaded", offloaded, timeout=0.05, offload=True)
+        await dispatcher.start()
+        await dispatcher.submit([message("in_loop", 0), message("offloaded", 0)])
+        await asyncio.sleep(0.1)
+        mid = dispatcher.metrics()
+        while dispatcher.routes["offloaded"].stats.succeeded < 1:
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        return mid, dispatcher.metrics(), acks.receipts
+
+    mid, final, receipts = asyncio.run(scenario())
+    # in-loop 핸들러는 타임아웃에 취소되고 ack 되지 않음
+    assert final["in_loop"]["timed_out"] == 1 and final["in_loop"]["succeeded"] == 0
+    # offload 핸들러는 타임아웃이 기록된 뒤에도 계속 실행되고, 끝나면 성공으로 집계 / ack
+    assert mid["offloaded"]["timed_out"] == 1 and mid["offloaded"]["in_flight"] == 1
+    assert final["offloaded"]["succeeded"] == 1
+    assert receipts == ["offloaded-0"]
+
+
+def test_submit_waits_while_max_pending_messages_are_in_flight():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(payload):
+            await release.wait()
+
+        acks = Acks()
+        dispatcher = TypedDispatcher(on_ack=acks, max_pending=2, ack_interval=0.01)
+        dispatcher.register("job", handler, concurrency=1, offload=False)
+        await dispatcher.start()
+        await dispatcher.submit([message("job", 0), message("job", 1)])
+        assert dispatcher.free_slots() == 0
+
+        third = asyncio.create_task(dispatcher.submit([message("job", 2)]))
+        await asyncio.sleep(0.05)
+        blocked = not third.done()
+        release.set()
+        await asyncio.wait_for(third, timeout=1)
+        while len(acks.receipts) < 3:
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        return blocked, dispatcher.free_slots()
+
+    blocked, free = asyncio.run(scenario())
+    assert blocked
+    assert free == 2
+
+
+def test_leases_of_queued_and_overrunning_messages_are_extended():
+    async def scenario():
+        release = asyncio.Event()
+        extended = []
+
+        async def slow(payload):
+            time.sleep(0.15)  # 타임아웃을 넘겨 스레드에서 계속 실행
+
+        async def blocked(payload):
+            await release.wait()
+
+        async def on_extend(receipts):
+            extended.append(sorted(receipts))
+
+        acks = Acks()
+        dispatcher = TypedDispatcher(on_ack=acks, ack_interval=0.01, on_extend=on_extend, extend_interval=0.05)
+        dispatcher.register("slow", slow, timeout=0.01, offload=True)
+        dispatcher.register("blocked", blocked, concurrency=1, offload=False)
+        await dispatcher.start()
+        await dispatcher.submit([message("slow", 0), message("blocked", 0), message("blocked", 1)])
+        await asyncio.sleep(0.12)
+        while_running = list(extended)
+        release.set()
+        while len(acks.receipts) < 3:
+            await asyncio.sleep(0.01)
+        extended.clear()
+        await asyncio.sleep(0.12)
+        await dispatcher.stop()
+        return while_running, extended, dispatcher.metrics()
+
+    while_running, after, stats = asyncio.run(scenario())
+    # 처리 중 (타임아웃을 넘긴 offload 핸들러 포함) / 큐에서 대기 중인 메시지 모두 lease 연장
+    assert while_running and while_running[0] == ["blocked-0", "blocked-1", "slow-0"]
+    # 끝난 메시지는 더 이상 연장하지 않음
+    assert after == []
+    assert stats["slow"]["timed_out"] == 1 and stats["slow"]["succeeded"] == 1 and stats["slow"]["failed"] == 0
@@ -0,0 +1,47 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BASE_DIR, os.path.join(BASE_DIR, "external_communication")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from follow_up_planner import plan_follow_ups
+
+
+class FakeRpc:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self):
+        return type("Response", (), {"data": self.rows})
+
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return FakeRpc(self.rows)
+
+
+def test_plan_groups_candidates_by_kind_in_one_call():
+    client = FakeClient([
+        {"kind": "eta_missing", "po_number": "PO-1", "vendor_email": "a@vendor.com",
+         "pending_draft_types": ["follow_up_eta_missing"]},
+        {"kind": "eta_reconfirmation", "po_number": "PO-2", "eta": "2025-06-01", "thread_id": "t-2",
+         "pending_draft_types": []},
+        {"kind": "stale", "po_number": "PO-1", "submitted_at": "2025-05-01T00:00:00+00:00"},
+    ])
+    plan = plan_follow_ups(client, stale_days=5)
+
+    assert client.calls == [("plan_follow_ups", {"stale_days": 5, "eta_reply_days": 2})]
+    assert [c.po_number for c in plan.eta_missing] == ["PO-1"]
+    assert [c["po_number"] for c in plan.eta_reconfirmation] == ["PO-2"]
+    assert [c.get("submitted_at") for c in plan.stale] == ["2025-05-01T00:00:00+00:00"]
+
+    assert plan.eta_missing[0].has_pending_draft("follow_up_eta_missing")
+    assert not plan.eta_reconfirmation[0].has_pending_draft("follow_up_eta_present")
+    assert not plan.stale[0].has_pending_draft("follow_up_eta_missing")
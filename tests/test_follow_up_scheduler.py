@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import asyncio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BASE_DIR, os.path.join(BASE_DIR, "external_communication")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from common.change_feed import LocalChangeFeed
+from follow_up_scheduler import FollowUpScheduler
+
+
+class FakeScheduleClient:
+    """follow_up_schedule 테이블과 take_due_follow_ups / next_follow_up_in RPC 흉내"""
+
+    def __init__(self):
+        self.schedule = {}  # po_number -> due (time.monotonic 기준)
+        self.calls = 0
+
+    def rpc(self, name, params):
+        self.calls += 1
+        now = time.monotonic()
+        if name == "next_follow_up_in":
+            data = min(self.schedule.values()) - now if self.schedule else None
+        else:
+            due = sorted((d, po) for po, d in self.schedule.items() if d <= now)[:params["batch_size"]]
+            for _, po in due:
+                self.schedule[po] = now + params["retry_seconds"]
+            data = [po for _, po in due]
+        return type("Rpc", (), {"execute": lambda self: type("Response", (), {"data": data})})()
+
+
+def test_scheduler_sleeps_until_due_and_wakes_on_schedule_change():
+    async def scenario():
+        client = FakeScheduleClient()
+        feed = LocalChangeFeed(resync_interval=30, live=True)
+        processed = []
+
+        def process(po_numbers):
+            processed.append((time.monotonic(), po_numbers))
+            for po in po_numbers:
+                client.schedule.pop(po, None)  # 처리 결과로 트리거가 스케줄에서 제거
+            return len(po_numbers)
+
+        client.schedule["PO-1"] = time.monotonic() + 0.5
+        started = time.monotonic()
+        task = asyncio.create_task(FollowUpScheduler(client, feed, process).run())
+
+        # due_at 까지 잠들었다가 제때 처리
+        while not processed:
+            await asyncio.sleep(0.05)
+        assert processed[0][1] == ["PO-1"]
+        assert 0.45 <= processed[0][0] - started < 1.5
+        idle_calls = client.calls
+
+        # 스케줄이 비면 resync 간격(30초)까지 잠듦 → 추가 조회 없음
+        await asyncio.sleep(0.5)
+        assert client.calls == idle_calls
+
+        # 더 이른 항목이 생겼다는 알림이 오면 바로 깨어나 처리
+        client.schedule["PO-2"] = time.monotonic()
+        feed.publish("follow_up_schedule", "UPDATE", {"po_number": "PO-2"})
+        while len(processed) < 2:
+            await asyncio.sleep(0.05)
+        assert processed[1][1] == ["PO-2"]
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
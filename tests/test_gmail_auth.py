@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from common.gmail_auth import GmailAuth, get_gmail_auth
+
+
+class FakeCreds:
+    def __init__(self, expires_in):
+        self.expiry = datetime.utcnow() + timedelta(seconds=expires_in)
+        self.refreshes = 0
+
+    @property
+    def valid(self):
+        return self.expiry > datetime.utcnow()
+
+
+class FakeAuth(GmailAuth):
+    """token 파일 / google 라이브러리 대신 FakeCreds 로 동작"""
+
+    def __init__(self, expires_in, refresh_margin=300):
+        super().__init__("token.json", "credentials.json", ["scope"], refresh_margin=refresh_margin)
+        self.expires_in = expires_in
+        self.loads = 0
+        self.builds = 0
+
+    def _load_credentials(self):
+        self.loads += 1
+        return FakeCreds(self.expires_in)
+
+    def _refresh_credentials(self, creds):
+        creds.refreshes += 1
+        creds.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    def _build_service(self, creds):
+        self.builds += 1
+        return object()
+
+
+def test_service_is_cached_per_thread_and_credentials_loaded_once():
+    auth = FakeAuth(expires_in=3600)
+    try:
+        first = auth.service()
+        assert auth.service() is first
+        other = []
+        thread = threading.Thread(target=lambda: other.append(auth.service()))
+        thread.start()
+        thread.join()
+        assert other[0] is not first
+        assert auth.loads == 1 and auth.builds == 2
+    finally:
+        auth.close()
+
+
+def test_token_close_to_expiry_is_refreshed_before_use():
+    auth = FakeAuth(expires_in=60)
+    try:
+        creds = auth.credentials()
+        assert creds.refreshes == 1
+        assert auth.credentials() is creds and creds.refreshes == 1
+    finally:
+        auth.close()
+
+
+def test_background_timer_refreshes_ahead_of_expiry():
+    auth = FakeAuth(expires_in=0.2, refresh_margin=0.1)
+    try:
+        creds = auth.credentials()
+        assert creds.refreshes == 0
+        deadline = datetime.utcnow() + timedelta(seconds=2)
+        while creds.refreshes == 0 and datetime.utcnow() < deadline:
+            threading.Event().wait(0.02)
+        assert creds.refreshes == 1
+    finally:
+        auth.close()
+
+
+def test_providers_are_shared_per_token_file():
+    a = get_gmail_auth("/tmp/token.json", "/tmp/credentials.json", ["scope"])
+    assert get_gmail_auth("/tmp/token.json", "/tmp/credentials.json", ["scope"]) is a
+    assert get_gmail_auth("/tmp/other.json", "/tmp/credentials.json", ["scope"]) is not a
@@ -0,0 +1,166 @@
+import os
+import sys
+import base64
+import threading
+from email import message_from_bytes
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BASE_DIR, os.path.join(BASE_DIR, "external_communication")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from common.models import EmailLogDraft
+from gmail_sender import GmailSender, QuotaLimiter, reply_subject
+
+
+class Request:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def execute(self):
+        return self.fn()
+
+
+class RateLimited(Exception):
+    def __init__(self):
+        super().__init__("429 Too Many Requests")
+        self.resp = {"retry-after": "0"}
+        self.status_code = 429
+
+
+class FakeGmail:
+    """users().messages().send / users().threads().get 흉내 (service 객체는 worker 스레드마다 하나)"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def threads(self):
+        return self
+
+    def get(self, userId, id, format, metadataHeaders):
+        def run():
+            self.store.thread_gets += 1
+            return {"messages": [{"payload": {"headers": [
+                {"name": "Subject", "value": "PO-1 ETA"},
+                {"name": "Message-ID", "value": "<vendor-1@example.com>"},
+            ]}}]}
+        return Request(run)
+
+    def send(self, userId, body):
+        def run():
+            with self.store.lock:
+                if self.store.fail_first:
+                    self.store.fail_first -= 1
+                    raise RateLimited()
+                self.store.sent.append(body)
+                return {"id": f"gmail-{len(self.store.sent)}", "threadId": body.get("threadId") or f"new-{len(self.store.sent)}"}
+        return Request(run)
+
+
+class FakeStore:
+    def __init__(self, fail_first=0, rpc_failures=0):
+        self.lock = threading.Lock()
+        self.rpc_failures = rpc_failures
+        self.sent = []
+        self.thread_gets = 0
+        self.fail_first = fail_first
+        self.services = 0
+        self.rpc_calls = []
+
+    def factory(self):
+        self.services += 1
+        return FakeGmail(self)
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+
+        def run():
+            if self.rpc_failures:
+                self.rpc_failures -= 1
+                raise ConnectionError("supabase unavailable")
+            return type("Response", (), {"data": len(params["sent"])})
+        return Request(run)
+
+
+def draft(id, thread_id=None, subject="Purchase Order", po_number=None):
+    return EmailLogDraft.from_row({
+        "id": id, "thread_id": thread_id, "po_number": po_number, "subject": subject,
+        "recipient_email": "vendor@example.com", "draft_body": f"body {id}", "status": "draft",
+    })
+
+
+def parse(body):
+    return message_from_bytes(base64.urlsafe_b64decode(body["raw"]))
+
+
+def test_replies_continue_thread_and_status_is_recorded_in_one_call():
+    store = FakeStore()
+    sender = GmailSender(store, store.factory, workers=4, limiter=QuotaLimiter(10 ** 6), sleep=lambda s: None)
+    drafts = [draft(1, po_number="PO-0"), draft(2, thread_id="t-1", subject="Re: PO-1 ETA"), draft(3, thread_id="t-1")]
+
+    results = sender.send_drafts(drafts)
+
+    assert all(r.ok for r in results) and len(store.sent) == 3
+    assert store.thread_gets == 1  # 같은 thread 의 두 번째 답장은 캐시된 헤더 사용
+    replies = [parse(b) for b in store.sent if b.get("threadId") == "t-1"]
+    assert replies[0]["In-Reply-To"] == "<vendor-1@example.com>"
+    # 두 번째 답장은 첫 답장에 이어 붙고, 제목은 thread 제목을 따름
+    assert replies[1]["In-Reply-To"] == replies[0]["Message-ID"]
+    assert replies[1]["References"].split() == ["<vendor-1@example.com>", replies[0]["Message-ID"]]
+    assert replies[1]["Subject"] == "Re: PO-1 ETA"
+    assert "threadId" not in [b for b in store.sent if parse(b)["Subject"] == "Purchase Order"][0]
+
+    assert len(store.rpc_calls) == 1
+    name, params = store.rpc_calls[0]
+    assert name == "mark_emails_sent"
+    assert sorted(row["id"] for row in params["sent"]) == [1, 2, 3]
+
+
+def test_failed_status_update_is_retried_and_every_sent_draft_recorded():
+    store = FakeStore(rpc_failures=1)
+    sender = GmailSender(store, store.factory, workers=2, limiter=QuotaLimiter(10 ** 6),
+                         flush_size=1, sleep=lambda s: None)
+
+    results = sender.send_drafts([draft(i) for i in range(1, 6)])
+
+    assert len(store.sent) == 5 and all(r.ok for r in results)
+    # 첫 기록이 실패해도 발송은 계속되고, 보낸 5건은 모두 성공한 mark_emails_sent 에 포함됨
+    recorded = [row["id"] for i, (_, params) in enumerate(store.rpc_calls) if i > 0 for row in params["sent"]]
+    assert sorted(recorded) == [1, 2, 3, 4, 5]
+
+
+def test_rate_limited_send_is_retried_and_pauses_limiter():
+    store = FakeStore(fail_first=1)
+    limiter = QuotaLimiter(1000, sleep=lambda s: None)
+    sender = GmailSender(store, store.factory, workers=1, limiter=limiter, sleep=lambda s: None)
+
+    results = sender.send_drafts([draft(1)])
+
+    assert results[0].ok and len(store.sent) == 1
+
+
+def test_quota_limiter_waits_for_refill():
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    limiter = QuotaLimiter(250, clock=lambda: now[0], sleep=sleep)
+    limiter.acquire(100)
+    limiter.acquire(100)
+    limiter.acquire(100)  # 250 unit 을 다 쓰고 50 unit 이 더 필요 → 0.2초 대기
+    assert abs(sum(waits) - 0.2) < 1e-9
+
+
+def test_reply_subject():
+    assert reply_subject("Re: PO-1 ETA", "PO-1 ETA") == "Re: PO-1 ETA"
+    assert reply_subject("ETA request", "RE: PO-1 ETA") == "Re: PO-1 ETA"
+    assert reply_subject("New PO", None) == "New PO"
@@ -0,0 +1,354 @@
+import os
+import sys
+import time
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+os.environ.setdefault("MCP_QUEUE_PATH", ":memory:")
+
+from mcp_server import main as mcp_main
+from mcp_server.queue_store import MessageStore, QueueFull
+from mcp_server.partitions import HashRing, PartitionedMessageStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcp_main, "store", PartitionedMessageStore(str(tmp_path / "queue.sqlite3"), 4))
+    monkeypatch.setattr(mcp_main, "receiver_conditions", {})
+    return TestClient(mcp_main.app)
+
+
+def send(client, receiver="external_comm_hub", msg_type="vendor_reply", payload=None):
+    response = client.post("/send", json={
+        "sender": "test",
+        "receiver": receiver,
+        "content": "",
+        "type": msg_type,
+        "payload": payload or {},
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_receive_leases_until_ack(client):
+    send(client, payload={"n": 1})
+    send(client, payload={"n": 2})
+
+    messages = client.get("/receive/external_comm_hub").json()["messages"]
+    assert [m["payload"]["n"] for m in messages] == [1, 2]
+    # lease 중인 메시지는 다시 전달되지 않음
+    assert client.get("/receive/external_comm_hub").json()["messages"] == []
+
+    acked = client.post("/ack/external_comm_hub", json={"receipts": [m["receipt"] for m in messages]})
+    assert acked.json()["acked"] == 2
+    assert mcp_main.store.depth("external_comm_hub") == 0
+
+
+def test_unacked_message_is_redelivered(client):
+    send(client)
+
+    first = client.get("/receive/external_comm_hub", params={"visibility_timeout": 0}).json()["messages"]
+    second = client.get("/receive/external_comm_hub", params={"visibility_timeout": 0}).json()["messages"]
+    assert [m["id"] for m in first] == [m["id"] for m in second]
+    assert second[0]["delivery_count"] == 2
+
+    # 재전달 전의 receipt 로는 삭제되지 않음
+    stale = client.post("/ack/external_comm_hub", json={"receipts": [first[0]["receipt"]]})
+    assert stale.json()["acked"] == 0
+    fresh = client.post("/ack/external_comm_hub", json={"receipts": [second[0]["receipt"]]})
+    assert fresh.json()["acked"] == 1
+
+
+def test_extend_keeps_message_hidden_and_ignores_stale_receipts(client):
+    send(client)
+
+    [first] = client.get("/receive/external_comm_hub", params={"visibility_timeout": 0.05}).json()["messages"]
+    extended = client.post("/extend/external_comm_hub", json={"receipts": [first["receipt"]], "visibility_timeout": 30})
+    assert extended.json()["extended"] == 1
+    time.sleep(0.1)
+    # 연장된 lease 안에는 재전달되지 않음
+    assert client.get("/receive/external_comm_hub").json()["messages"] == []
+
+    # lease 가 끝나 재전달된 뒤에는 이전 receipt 로 연장할 수 없음
+    client.post("/extend/external_comm_hub", json={"receipts": [first["receipt"]], "visibility_timeout": 0.01})
+    time.sleep(0.05)
+    [second] = client.get("/receive/external_comm_hub").json()["messages"]
+    stale = client.post("/extend/external_comm_hub", json={"receipts": [first["receipt"]], "visibility_timeout": 30})
+    assert second["delivery_count"] == 2 and stale.json()["extended"] == 0
+
+
+def test_queue_survives_restart(tmp_path):
+    path = str(tmp_path / "queue.sqlite3")
+    store = MessageStore(path)
+    store.enqueue({"sender": "test", "receiver": "a", "type": "t", "payload": {"k": "v"}})
+    store.close()
+
+    reopened = MessageStore(path)
+    messages = reopened.lease("a", 10, 30)
+    assert [m["payload"] for m in messages] == [{"k": "v"}]
+
+
+def test_default_partitioning_keeps_the_existing_queue_file(tmp_path):
+    # 파티션 도입 이전 버전이 남긴 단일 큐 파일의 미처리 메시지
+    path = str(tmp_path / "queue.sqlite3")
+    legacy = MessageStore(path)
+    legacy.enqueue({"sender": "test", "receiver": "external_comm_hub", "type": "t", "payload": {"k": "v"}})
+    legacy.close()
+
+    store = PartitionedMessageStore(path, mcp_main.settings.MCP_QUEUE_PARTITIONS)
+    messages = store.lease("external_comm_hub", 10, 30)
+    assert [m["payload"] for m in messages] == [{"k": "v"}]
+    assert not any(name.startswith("queue-") for name in os.listdir(tmp_path))
+
+
+def test_long_poll_returns_when_message_arrives(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcp_main, "store", MessageStore(str(tmp_path / "queue.sqlite3")))
+    monkeypatch.setattr(mcp_main, "receiver_conditions", {})
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=mcp_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp") as http:
+            started = time.perf_counter()
+            receive = asyncio.create_task(http.get("/receive/external_comm_hub", params={"wait": 5}))
+            await asyncio.sleep(0.05)
+            await http.post("/send", json={
+                "sender": "test", "receiver": "external_comm_hub", "content": "", "type": "vendor_reply", "payload": {},
+            })
+            response = await receive
+            return response.json()["messages"], time.perf_counter() - started
+
+    messages, elapsed = asyncio.run(scenario())
+    assert len(messages) == 1
+    assert elapsed < 1
+
+
+def test_long_poll_times_out_empty(client):
+    assert client.get("/receive/external_comm_hub", params={"wait": 0.1}).json()["messages"] == []
+
+
+def test_idle_long_poll_with_workers_checks_without_leasing(client, monkeypatch):
+    monkeypatch.setattr(mcp_main.settings, "WORKERS", 2)
+    monkeypatch.setattr(mcp_main.settings, "WORKER_SYNC_INTERVAL", 0.01)
+    store = mcp_main.store
+    leases = []
+    original_lease = store.lease
+
+    def counting_lease(*args):
+        leases.append(args)
+        return original_lease(*args)
+
+    monkeypatch.setattr(store, "lease", counting_lease)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=mcp_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp") as http:
+            # 빈 큐를 주기적으로 확인하는 동안에는 쓰기 트랜잭션(lease)을 실행하지 않음
+            idle = (await http.get("/receive/external_comm_hub", params={"wait": 0.2})).json()["messages"]
+            idle_leases = len(leases)
+
+            receive = asyncio.create_task(http.get("/receive/external_comm_hub", params={"wait": 5}))
+            await asyncio.sleep(0.05)
+            # 다른 worker 프로세스가 저장한 메시지 (이 프로세스의 Condition 은 깨어나지 않음)
+            store.enqueue({"sender": "test", "receiver": "external_comm_hub", "content": "",
+                           "type": "vendor_reply", "payload": {}})
+            return idle, idle_leases, (await receive).json()["messages"]
+
+    idle, idle_leases, messages = asyncio.run(scenario())
+    assert idle == [] and idle_leases == 0
+    assert len(messages) == 1
+    assert len(leases) == 1
+
+
+def test_stream_respects_credit_and_resumes_from_offset(client):
+    for n in range(3):
+        send(client, payload={"n": n})
+
+    with client.websocket_connect("/stream/external_comm_hub") as ws:
+        ws.send_json({"type": "credit", "credit": 2})
+        frames = [ws.receive_json(), ws.receive_json()]
+        assert [f["message"]["payload"]["n"] for f in frames] == [0, 1]
+        # credit 을 다 쓰면 더 보내지 않고, ack 전까지 남은 메시지는 큐에 유지됨
+        assert mcp_main.store.depth("external_comm_hub") == 3
+        first_offset = frames[0]["offset"]
+
+    # 첫 메시지까지 처리했다고 보고 재연결 → 두 번째 메시지부터 다시 전달
+    with client.websocket_connect(f"/stream/external_comm_hub?after={first_offset}") as ws:
+        ws.send_json({"type": "credit", "credit": 10})
+        frames = [ws.receive_json(), ws.receive_json()]
+        assert [f["message"]["payload"]["n"] for f in frames] == [1, 2]
+        ws.send_json({"type": "ack", "receipts": [f["message"]["receipt"] for f in frames]})
+
+        ws.send_json({"type": "send", "request_id": 1, "messages": [{
+            "sender": "test", "receiver": "other_agent", "content": "", "type": "t", "payload": {},
+        }]})
+        assert ws.receive_json()["type"] == "sent"
+
+    assert mcp_main.store.depth("external_comm_hub") == 0
+    assert mcp_main.store.depth("other_agent") == 1
+
+
+def test_stream_publish_frame_stores_one_copy_per_group(client):
+    client.put("/topics/vendor_email/groups/external_comm_hub")
+    message = {"sender": "vendor_email_logger", "content": "", "type": "vendor_email", "payload": {"n": 1}}
+
+    with client.websocket_connect("/stream/vendor_email_logger") as ws:
+        ws.send_json({"type": "publish", "request_id": 1, "topic": "vendor_email", "messages": [message]})
+        reply = ws.receive_json()
+        assert reply["type"] == "sent" and reply["request_id"] == 1
+        assert list(reply["groups"]) == ["external_comm_hub"]
+
+        # 구독 중인 group 이 없는 topic 은 아무 group 에도 저장되지 않음 (로거는 실패로 보고 재시도)
+        ws.send_json({"type": "publish", "request_id": 2, "topic": "unknown", "messages": [message]})
+        assert ws.receive_json()["groups"] == {}
+
+    assert client.get("/topics/vendor_email/groups/external_comm_hub").json()["depth"] == 1
+
+
+def test_stream_rejects_malformed_frames_and_keeps_the_connection(client):
+    send(client, payload={"n": 1})
+
+    with client.websocket_connect("/stream/external_comm_hub") as ws:
+        ws.send_json({"type": "credit", "credit": 1})
+        [delivered] = [ws.receive_json()]
+
+        for frame in ("not json", "[1, 2]", '{"type": "credit", "credit": "x"}',
+                      '{"type": "ack", "receipts": "1:1"}', '{"type": "send", "messages": [1]}',
+                      '{"type": "publish", "messages": []}', '{"type": "nope"}'):
+            ws.send_text(frame)
+            error = ws.receive_json()
+            assert error["type"] == "error" and error["status"] == 400
+        ws.send_bytes(b"\x00")
+        assert ws.receive_json()["status"] == 400
+
+        # 연결과 lease 는 그대로 유지되어 이어서 정상 frame 을 처리
+        assert mcp_main.store.available("external_comm_hub") == 0
+        ws.send_json({"type": "ack", "receipts": [delivered["message"]["receipt"]]})
+        ws.send_json({"type": "send", "request_id": 1, "messages": [{
+            "sender": "test", "receiver": "other_agent", "content": "", "type": "t", "payload": {},
+        }]})
+        assert ws.receive_json()["type"] == "sent"
+
+    assert mcp_main.store.depth("external_comm_hub") == 0
+
+
+def test_full_queue_rejects_batch_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(mcp_main.settings, "MAX_QUEUE_DEPTH", 3)
+    message = {"sender": "test", "receiver": "external_comm_agent", "content": "", "type": "t", "payload": {}}
+
+    accepted = client.post("/send_batch", json={"messages": [message, message]})
+    assert accepted.status_code == 200
+    assert len(accepted.json()["ids"]) == 2
+
+    rejected = client.post("/send_batch", json={"messages": [message, message]})
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == str(mcp_main.settings.QUEUE_FULL_RETRY_AFTER)
+    # 거절된 배치는 일부도 저장되지 않음
+    assert mcp_main.store.depth("external_comm_agent") == 2
+
+
+def test_hash_ring_moves_few_receivers_when_partitions_grow():
+    receivers = [f"agent-{i}" for i in range(1000)]
+    before = HashRing(4)
+    after = HashRing(5)
+    moved = sum(before.partition_for(r) != after.partition_for(r) for r in receivers)
+    assert moved < len(receivers) * 0.35
+    assert {before.partition_for(r) for r in receivers} == {0, 1, 2, 3}
+
+
+def test_partitioned_batch_is_all_or_nothing(tmp_path):
+    store = PartitionedMessageStore(str(tmp_path / "queue.sqlite3"), 4)
+    first = "agent-0"
+    # 첫 receiver 와 다른 파티션의 receiver 큐를 가득 채움 → 첫 파티션에 저장된 메시지도 취소되어야 함
+    full = next(f"agent-{i}" for i in range(1, 100)
+                if store.partition_for(f"agent-{i}") is not store.partition_for(first))
+    store.enqueue({"sender": "test", "receiver": full, "type": "t", "payload": {}})
+
+    batch = [{"sender": "test", "receiver": r, "type": "t", "payload": {}} for r in (first, full)]
+    with pytest.raises(QueueFull):
+        store.enqueue_many(batch, max_depth=1)
+    assert store.depth(first) == 0
+    assert store.depth(full) == 1
+
+
+def test_resent_email_is_deduplicated(client):
+    email = {"email_data": {"message_id": "<abc@mail>", "subject": "RE: PO-1"}}
+    first = send(client, receiver="external_comm_agent", msg_type="vendor_email", payload=email)
+    second = send(client, receiver="external_comm_agent", msg_type="vendor_email", payload=email)
+    assert first["status"] == "message queued"
+    assert second["status"] == "duplicate ignored"
+    assert second["id"] == first["id"]
+
+    # 처리(ack) 후 재전송되어도 window 안에서는 다시 전달되지 않음
+    messages = client.get("/receive/external_comm_agent").json()["messages"]
+    client.post("/ack/external_comm_agent", json={"receipts": [m["receipt"] for m in messages]})
+    batch = client.post("/send_batch", json={"messages": [{
+        "sender": "test", "receiver": "external_comm_agent", "content": "", "type": "vendor_email", "payload": email,
+    }]}).json()
+    assert batch["duplicates"] == [0]
+    assert mcp_main.store.depth("external_comm_agent") == 0
+
+
+def test_receive_returns_higher_priority_first_and_drops_expired(client):
+    send(client, msg_type="follow_up_check", payload={"n": "stale"})
+    client.post("/send", json={
+        "sender": "test", "receiver": "external_comm_hub", "content": "", "type": "follow_up_check",
+        "payload": {"n": "expired"}, "ttl": 0,
+    })
+    send(client, msg_type="vendor_reply", payload={"n": "live"})
+
+    messages = client.get("/receive/external_comm_hub").json()["messages"]
+    assert [m["payload"]["n"] for m in messages] == ["live", "stale"]
+    assert mcp_main.store.depth("external_comm_hub") == 2
+
+
+def test_topic_delivers_once_per_group_and_balances_members(client):
+    for group in ("drafting", "audit"):
+        assert client.put(f"/topics/vendor_email/groups/{group}").status_code == 200
+    published = client.post("/topics/vendor_email/publish", json={"messages": [
+        {"sender": "test", "content": "", "type": "vendor_email", "payload": {"n": n}} for n in range(4)
+    ]}).json()
+    assert sorted(published["groups"]) == ["audit", "drafting"]
+
+    receive = "/topics/vendor_email/groups/drafting/receive"
+    client.get(receive, params={"member": "hub-2", "max_messages": 1})  # 두 번째 member 등록 (1건 lease 후 반납 안 함)
+    first = client.get(receive, params={"member": "hub-1"}).json()["messages"]
+    second = client.get(receive, params={"member": "hub-2"}).json()["messages"]
+    # live member 2개에 나눠 전달되고 같은 group 안에서는 중복 전달되지 않음
+    assert len(first) == 2 and len(second) == 1
+    # 다른 group 은 같은 메시지를 따로 받음
+    audit = client.get("/topics/vendor_email/groups/audit/receive", params={"member": "a"}).json()["messages"]
+    assert [m["payload"]["n"] for m in audit] == [0, 1, 2, 3]
+
+    acked = client.post("/topics/vendor_email/groups/audit/ack",
+                        json={"receipts": [m["receipt"] for m in audit[:2]]}).json()
+    assert acked["committed_offset"] == audit[1]["id"]
+    status = client.get("/topics/vendor_email/groups/audit").json()
+    assert status["depth"] == 2 and status["members"] == ["a"]
+    assert client.get("/topics/vendor_email/groups/missing/receive", params={"member": "x"}).status_code == 404
+
+
+def test_metrics_report_depth_rates_and_rejections(client, monkeypatch):
+    send(client, payload={"n": 1})
+    send(client, payload={"n": 2})
+    messages = client.get("/receive/external_comm_hub", params={"max_messages": 1}).json()["messages"]
+    client.post("/ack/external_comm_hub", json={"receipts": [m["receipt"] for m in messages]})
+    monkeypatch.setattr(mcp_main.settings, "MAX_QUEUE_DEPTH", 1)
+    assert client.post("/send", json={"sender": "t", "receiver": "external_comm_hub", "content": "",
+                                      "type": "vendor_reply", "payload": {}}).status_code == 429
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'mcp_queue_depth{receiver="external_comm_hub"} 1' in body
+    assert 'mcp_messages_enqueued_total{receiver="external_comm_hub"}' in body
+    assert 'mcp_messages_dequeued_total{receiver="external_comm_hub"}' in body
+    assert 'mcp_message_age_seconds_bucket{receiver="external_comm_hub",le="+Inf"}' in body
+    assert "mcp_message_size_bytes_count" in body
+    assert 'mcp_requests_rejected_total{reason="queue_full",status="429"}' in body
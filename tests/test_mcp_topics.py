@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import threading
+
+import pytest
+import uvicorn
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+os.environ.setdefault("MCP_QUEUE_PATH", ":memory:")
+
+from mcp_server import main as mcp_main
+from mcp_server.partitions import PartitionedMessageStore
+from common.mcp_client import MCPClient
+
+TOPIC = "vendor_email"
+
+
+@pytest.fixture
+def server_url(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcp_main, "store", PartitionedMessageStore(str(tmp_path / "queue.sqlite3"), 4))
+    monkeypatch.setattr(mcp_main, "receiver_conditions", {})
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(mcp_main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 5
+    while not server.started and time.time() < deadline:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def test_group_members_share_messages_and_each_group_gets_every_message_once(server_url):
+    async def drain(client, group, member, seen):
+        """group member 로 더 받을 메시지가 없을 때까지 수신 / ack"""
+        while True:
+            messages = await client.receive_group(TOPIC, group, member, max_messages=10)
+            if not messages:
+                return
+            seen.extend(m["payload"]["n"] for m in messages)
+            await client.ack_group(TOPIC, group, [m["receipt"] for m in messages])
+
+    async def scenario():
+        # hub 프로세스 2개 (같은 group 의 member) + 다른 group 1개, 연결 풀은 각자 따로
+        publisher, hub_1, hub_2, audit = (MCPClient(server_url) for _ in range(4))
+        try:
+            for group in ("external_comm_hub", "audit"):
+                await publisher.subscribe(TOPIC, group)
+            # 두 hub 가 long polling 중인 상태 (live member 2개)
+            for hub, member in ((hub_1, "hub-1"), (hub_2, "hub-2")):
+                assert await hub.receive_group(TOPIC, "external_comm_hub", member) == []
+
+            published = await publisher.publish(TOPIC, [
+                {"sender": "vendor_email_logger", "content": "", "type": "vendor_email",
+                 "idempotency_key": f"m-{n}", "payload": {"n": n}}
+                for n in range(6)
+            ])
+            assert sorted(published["groups"]) == ["audit", "external_comm_hub"]
+            # 같은 이메일을 다시 발행해도 group 마다 한 번만 저장
+            await publisher.publish(TOPIC, [{"sender": "vendor_email_logger", "content": "", "type": "vendor_email",
+                                             "idempotency_key": "m-0", "payload": {"n": 0}}])
+
+            first = await hub_1.receive_group(TOPIC, "external_comm_hub", "hub-1", max_messages=10)
+            second = await hub_2.receive_group(TOPIC, "external_comm_hub", "hub-2", max_messages=10)
+            hub_seen = [m["payload"]["n"] for m in first + second]
+            await hub_1.ack_group(TOPIC, "external_comm_hub", [m["receipt"] for m in first])
+            await hub_2.ack_group(TOPIC, "external_comm_hub", [m["receipt"] for m in second])
+            await drain(hub_1, "external_comm_hub", "hub-1", hub_seen)
+
+            audit_seen = []
+            await drain(audit, "audit", "audit-1", audit_seen)
+            status = await publisher.request("GET", f"/topics/{TOPIC}/groups/external_comm_hub")
+            return first, second, hub_seen, audit_seen, status
+        finally:
+            for client in (publisher, hub_1, hub_2, audit):
+                await client.close()
+
+    first, second, hub_seen, audit_seen, status = asyncio.run(scenario())
+    # 한 member 가 전부 가져가지 않고 두 hub 가 나눠 받음
+    assert first and second
+    assert len(first) < 6 and len(second) < 6
+    # group 안에서는 메시지마다 정확히 한 번, 다른 group 도 모든 메시지를 한 번씩
+    assert sorted(hub_seen) == list(range(6))
+    assert sorted(audit_seen) == list(range(6))
+    assert status["depth"] == 0 and status["members"] == ["hub-1", "hub-2"]
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from common.models import EmailLogHeader, EmailLogWithBody
+
+
+def test_row_model_reads_projection_columns_like_a_dict():
+    row = EmailLogWithBody.from_row({"id": 1, "subject": "ETA", "body": "next week", "embedding": "[0.1]"})
+
+    assert row["subject"] == "ETA" and row.get("body") == "next week"
+    # projection 안의 컬럼이 NULL 이면 None
+    assert row.get("po_number") is None and "po_number" in row
+    assert "embedding" not in row
+    assert EmailLogWithBody.projection().startswith("id, thread_id, message_id")
+
+
+def test_columns_outside_projection_are_caught():
+    row = EmailLogHeader.from_row({"id": 1, "body": "not selected"})
+
+    with pytest.raises(KeyError):
+        row["body"]
+    # get 은 dict.get 처럼 default 를 받지만, projection 밖의 컬럼은 debug 실행에서 assert 로 실패
+    with pytest.raises(AssertionError, match="projection has no column 'body'"):
+        row.get("body", "")
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import asyncio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VENDOR_DIR = os.path.join(BASE_DIR, "Vendor_email_logger_agent")
+if VENDOR_DIR not in sys.path:
+    sys.path.append(VENDOR_DIR)
+
+from src.services.outbox import Outbox, OutboxFlusher, KIND_EMAIL_LOG, KIND_MCP_MESSAGE, SPLIT_AFTER_ATTEMPTS
+
+
+class FakeSupabaseService:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+        self.log = None
+
+    async def save_email_logs_with_attachments(self, entries):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("supabase unavailable")
+        self.batches.append(entries)
+        self.log.append(("email_logs", [e["email_log"]["message_id"] for e in entries]))
+        return {e["email_log"]["message_id"]: n for n, e in enumerate(entries)}
+
+
+class FakeMCPService:
+    def __init__(self):
+        self.log = None
+
+    async def send_messages(self, messages):
+        self.log.append(("mcp", [m["message_id"] for m in messages]))
+        return True
+
+
+def make(tmp_path, failures=0):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    supabase, mcp = FakeSupabaseService(failures), FakeMCPService()
+    supabase.log = mcp.log = []
+    flusher = OutboxFlusher(outbox, supabase, mcp, batch_size=10, base_delay=0.05, max_delay=1.0)
+    return outbox, flusher, supabase, mcp
+
+
+def queue_email(outbox, message_id):
+    outbox.append_email_log({"message_id": message_id, "subject": "ETA"}, [{"filename": "po.pdf"}])
+    outbox.append_mcp_message({"message_id": message_id, "type": "vendor_email"})
+
+
+def wait_until_all_due(outbox):
+    """재시도 대기(지터 포함)가 끝나 모든 항목이 due 가 될 때까지 대기"""
+    next_due = outbox.next_due_at()
+    while next_due is not None:
+        time.sleep(max(0.0, next_due - time.time()) + 0.01)
+        next_due = outbox.next_due_at()
+
+
+def test_enqueued_entries_are_flushed_in_one_batch_and_removed(tmp_path):
+    outbox, flusher, supabase, mcp = make(tmp_path)
+    for n in range(3):
+        queue_email(outbox, f"m-{n}")
+    assert outbox.has_pending(KIND_EMAIL_LOG, "m-0")
+
+    flushed = asyncio.run(flusher.flush_once())
+
+    assert flushed == 6
+    assert len(supabase.batches) == 1 and supabase.batches[0][0]["attachments"] == [{"filename": "po.pdf"}]
+    assert outbox.pending_count() == 0
+
+    # 파일에 기록되므로 새로 연 outbox 에도 남아 있지 않음
+    outbox.close()
+    assert Outbox(str(tmp_path / "outbox.sqlite3")).pending_count() == 0
+
+
+def test_failed_batch_backs_off_and_is_split_after_repeated_failures(tmp_path):
+    outbox, flusher, supabase, mcp = make(tmp_path, failures=SPLIT_AFTER_ATTEMPTS)
+    outbox.append_email_log({"message_id": "m-1"}, [])
+    outbox.append_email_log({"message_id": "m-2"}, [])
+
+    assert asyncio.run(flusher.flush_once()) == 0
+    # 실패한 항목은 재시도 시간 전까지 다시 가져오지 않음
+    assert outbox.due(KIND_EMAIL_LOG, 10) == []
+    assert outbox.next_due_at() > time.time()
+
+    for _ in range(SPLIT_AFTER_ATTEMPTS - 1):
+        wait_until_all_due(outbox)
+        asyncio.run(flusher.flush_once())
+    wait_until_all_due(outbox)
+    assert [e["attempts"] for e in outbox.due(KIND_EMAIL_LOG, 10)] == [SPLIT_AFTER_ATTEMPTS] * 2
+
+    # SPLIT_AFTER_ATTEMPTS 번 실패한 항목은 한 건씩 재시도
+    assert asyncio.run(flusher.flush_once()) == 2
+    assert [len(batch) for batch in supabase.batches] == [1, 1]
+    assert outbox.pending_count() == 0
+
+
+def test_mcp_notification_waits_until_email_log_is_saved(tmp_path):
+    outbox, flusher, supabase, mcp = make(tmp_path, failures=1)
+    queue_email(outbox, "m-1")
+
+    # email_logs 저장이 실패하면 claim-check 알림도 보내지 않음 (consumer 가 message_id 로 본문을 조회할 수 없으므로)
+    asyncio.run(flusher.flush_once())
+    assert supabase.log == []
+    assert outbox.due(KIND_MCP_MESSAGE, 10) == []
+
+    wait_until_all_due(outbox)
+    asyncio.run(flusher.flush_once())
+    assert supabase.log == [("email_logs", ["m-1"]), ("mcp", ["m-1"])]
+    assert outbox.pending_count() == 0
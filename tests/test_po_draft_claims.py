@@ -0,0 +1,142 @@
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BASE_DIR, os.path.join(BASE_DIR, "external_communication")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+import po_draft_claims
+from po_draft_claims import claim_po_drafts, draft_claimed_po, draft_pending_pos
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class Rpc:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def execute(self):
+        return Response(self.fn())
+
+
+class FakeClaimsClient:
+    """po_draft_claims.sql 의 claim_po_drafts / complete_po_draft / release_po_draft 흉내 (now 는 직접 옮기는 시계)"""
+
+    def __init__(self, po_numbers):
+        self.now = 0.0
+        self.lock = threading.Lock()
+        self.claims = {
+            po: {"po_number": po, "state": "pending", "attempts": 0, "lease_expires_at": None,
+                 "not_before": None, "email_log_id": None, "last_error": None}
+            for po in po_numbers
+        }
+        self.email_logs = []
+
+    def rpc(self, name, params):
+        return Rpc(lambda: getattr(self, name)(**params))
+
+    def claim_po_drafts(self, worker_id, batch_size, lease_seconds, max_attempts):
+        with self.lock:
+            for c in self.claims.values():
+                if c["state"] == "claimed" and c["lease_expires_at"] < self.now and c["attempts"] >= max_attempts:
+                    c["state"] = "failed"
+            claimable = [
+                c for c in self.claims.values()
+                if (c["state"] == "pending" or (c["state"] == "claimed" and c["lease_expires_at"] < self.now))
+                and c["attempts"] < max_attempts
+                and (c["not_before"] is None or c["not_before"] <= self.now)
+            ][:batch_size]
+            for c in claimable:
+                c.update(state="claimed", claimed_by=worker_id, attempts=c["attempts"] + 1,
+                         lease_expires_at=self.now + lease_seconds)
+            return [dict(c) for c in claimable]
+
+    def complete_po_draft(self, claimed_po, claim_attempt, draft):
+        with self.lock:
+            c = self.claims[claimed_po]
+            if c["state"] != "claimed" or c["attempts"] != claim_attempt:
+                return None
+            self.email_logs.append(draft)
+            c.update(state="drafted", email_log_id=len(self.email_logs), lease_expires_at=None)
+            return len(self.email_logs)
+
+    def release_po_draft(self, claimed_po, claim_attempt, error, max_attempts, retry_seconds):
+        with self.lock:
+            c = self.claims[claimed_po]
+            if c["state"] != "claimed" or c["attempts"] != claim_attempt:
+                return None
+            c.update(state="failed" if c["attempts"] >= max_attempts else "pending", lease_expires_at=None,
+                     last_error=error, not_before=self.now + min(3600, retry_seconds * 2 ** (c["attempts"] - 1)))
+            return c["state"]
+
+
+def build_draft(po_number):
+    if po_number.startswith("BAD"):
+        raise RuntimeError(f"no vendor email for {po_number}")
+    return {"po_number": po_number, "trigger_reason": "po_issued"}
+
+
+def test_claim_complete_release_bookkeeping():
+    client = FakeClaimsClient(["PO-1", "PO-2", "BAD-1"])
+
+    drafted = draft_pending_pos(client, "worker-1", build_draft, concurrency=2)
+
+    assert drafted == 2
+    assert sorted(d["po_number"] for d in client.email_logs) == ["PO-1", "PO-2"]
+    assert {po: c["state"] for po, c in client.claims.items()} == {
+        "PO-1": "drafted", "PO-2": "drafted", "BAD-1": "pending",
+    }
+    bad = client.claims["BAD-1"]
+    # 실패한 PO 는 같은 호출 안에서 다시 claim 되지 않고 백오프 뒤로 밀림
+    assert bad["attempts"] == 1 and bad["not_before"] == po_draft_claims.PO_DRAFT_RETRY_SECONDS
+    assert "no vendor email" in bad["last_error"]
+    assert claim_po_drafts(client, "worker-1") == []
+
+    # 재시도할 때마다 대기 시간이 두 배, max_attempts 를 다 쓰면 failed
+    for attempt in range(2, po_draft_claims.PO_DRAFT_MAX_ATTEMPTS + 1):
+        client.now = bad["not_before"]
+        draft_pending_pos(client, "worker-1", build_draft, concurrency=2)
+        assert bad["attempts"] == attempt
+    assert bad["state"] == "failed"
+    client.now += 10 ** 6
+    assert claim_po_drafts(client, "worker-1") == []
+
+
+def test_round_where_every_claim_fails_stops_the_loop():
+    client = FakeClaimsClient(["BAD-1", "BAD-2"])
+    rounds = []
+    original = client.claim_po_drafts
+
+    def counting_claim(**params):
+        rounds.append(1)
+        # 백오프가 없다고 가정해도 (바로 다시 claim 가능) 모두 실패한 라운드 뒤에는 멈춰야 함
+        for c in client.claims.values():
+            c["not_before"] = None
+        return original(**params)
+
+    client.claim_po_drafts = counting_claim
+
+    assert draft_pending_pos(client, "worker-1", build_draft, concurrency=2) == 0
+    assert len(rounds) == 1
+    assert all(c["attempts"] == 1 for c in client.claims.values())
+
+
+def test_late_complete_after_lease_loss_is_discarded():
+    client = FakeClaimsClient(["PO-1"])
+    [stale] = claim_po_drafts(client, "worker-1", lease_seconds=300)
+
+    # worker-1 이 lease 안에 끝내지 못해 worker-2 가 다시 claim 하고 먼저 저장
+    client.now = 301
+    [fresh] = claim_po_drafts(client, "worker-2", lease_seconds=300)
+    assert fresh["attempts"] == stale["attempts"] + 1
+    assert draft_claimed_po(client, fresh, build_draft) == 1
+
+    # 늦게 끝난 worker-1 의 결과는 저장되지 않음
+    assert draft_claimed_po(client, stale, build_draft) is None
+    assert len(client.email_logs) == 1
+    assert client.claims["PO-1"]["state"] == "drafted"
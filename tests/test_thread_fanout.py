@@ -0,0 +1,73 @@
+import os
+import sys
+import asyncio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BASE_DIR, os.path.join(BASE_DIR, "external_communication")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from thread_fanout import ThreadFanout
+
+STAGES = ("analyze", "context", "reply", "save")
+
+
+def test_threads_run_concurrently_up_to_bound_with_stages_in_order():
+    async def scenario():
+        events = []
+        running = [0]
+        peak = [0]
+
+        async def process(email):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            try:
+                for stage in STAGES:
+                    # 각 단계는 LLM / DB 호출처럼 await 하는 동안 다른 thread 에 양보
+                    await asyncio.sleep(0.01)
+                    events.append((email["thread_id"], stage))
+                if email["thread_id"] == "t-3":
+                    raise RuntimeError("openai down")
+                return email["thread_id"]
+            finally:
+                running[0] -= 1
+
+        fanout = ThreadFanout()
+        emails = [{"thread_id": f"t-{n}"} for n in range(10)]
+        results, unfinished = await fanout.run(emails, process, concurrency=3)
+        return events, peak[0], results, unfinished
+
+    events, peak, results, unfinished = asyncio.run(scenario())
+    assert peak == 3
+    for n in range(10):
+        assert [stage for thread_id, stage in events if thread_id == f"t-{n}"] == list(STAGES)
+    # thread 들의 단계가 서로 섞여 실행됨 (thread 하나씩 순서대로가 아님)
+    assert [thread_id for thread_id, _ in events[:4]] != ["t-0"] * 4
+    assert results == [f"t-{n}" if n != 3 else None for n in range(10)]
+    assert unfinished == {"t-3"}
+
+
+def test_thread_already_in_progress_is_skipped_and_released_after():
+    async def scenario():
+        fanout = ThreadFanout()
+        processed = []
+
+        async def process(email):
+            processed.append(email["n"])
+            await asyncio.sleep(0.01)
+            return email["n"]
+
+        # 다른 스캔이 t-1 을 처리 중
+        assert fanout.claim("t-1")
+        first = await fanout.run([{"thread_id": "t-1", "n": 1}, {"thread_id": "t-2", "n": 2}], process, 4)
+        fanout.release("t-1")
+
+        # 같은 스캔에 같은 thread 가 두 번 있으면 먼저 시작한 것만 처리
+        second = await fanout.run([{"thread_id": "t-1", "n": 3}, {"thread_id": "t-1", "n": 4}], process, 4)
+        return first, second, processed, fanout.claim("t-1")
+
+    first, second, processed, claimable = asyncio.run(scenario())
+    assert first == ([None, 2], {"t-1"})
+    assert second == ([3, None], {"t-1"})
+    assert processed == [2, 3]
+    assert claimable
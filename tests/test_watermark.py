@@ -0,0 +1,75 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from common.watermark import ScanWatermark, contiguous_cursor
+
+
+class FakeQuery:
+    def __init__(self, store, table):
+        self.store = store
+        self.table = table
+        self.filters = {}
+        self.upserted = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def limit(self, n):
+        return self
+
+    def upsert(self, row, on_conflict=None):
+        self.upserted = row
+        return self
+
+    def execute(self):
+        rows = self.store.setdefault(self.table, {})
+        if self.upserted is not None:
+            rows[self.upserted["name"]] = self.upserted
+            return type("Response", (), {"data": [self.upserted]})
+        row = rows.get(self.filters.get("name"))
+        return type("Response", (), {"data": [row] if row else []})
+
+
+class FakeClient:
+    def __init__(self):
+        self.store = {}
+
+    def table(self, name):
+        return FakeQuery(self.store, name)
+
+
+MESSAGES = [
+    {"id": 1, "created_at": "2025-05-01T00:00:00", "thread_id": "a"},
+    {"id": 2, "created_at": "2025-05-01T00:00:00", "thread_id": "b"},
+    {"id": 3, "created_at": "2025-05-01T00:01:00", "thread_id": "a"},
+    {"id": 4, "created_at": "2025-05-01T00:02:00", "thread_id": "c"},
+]
+
+
+def test_contiguous_cursor_stops_before_first_unfinished_row():
+    assert contiguous_cursor(MESSAGES, lambda m: True) == ("2025-05-01T00:02:00", 4)
+    # thread b 처리에 실패하면 b 의 메일 앞까지만 이동
+    assert contiguous_cursor(MESSAGES, lambda m: m["thread_id"] != "b") == ("2025-05-01T00:00:00", 1)
+    assert contiguous_cursor(MESSAGES, lambda m: m["thread_id"] != "a") is None
+
+
+def test_watermark_persists_and_only_moves_over_finished_rows():
+    client = FakeClient()
+    watermark = ScanWatermark(client, "vendor_reply")
+    assert watermark.load() is None
+
+    assert watermark.advance(MESSAGES, lambda m: m["thread_id"] != "c") == ("2025-05-01T00:01:00", 3)
+    # 다른 인스턴스(재시작한 프로세스)에서도 같은 위치부터 이어 읽음
+    assert ScanWatermark(client, "vendor_reply").load() == ("2025-05-01T00:01:00", 3)
+
+    assert watermark.advance(MESSAGES, lambda m: m["thread_id"] != "a") is None
+    assert watermark.load() == ("2025-05-01T00:01:00", 3)
+    assert ScanWatermark(client, "other").load() is None
@@ -1,4 +1,5 @@
 import os
+import asyncio
 from datetime import datetime
 from supabase import create_client
 from openai import OpenAI
@@ -6,6 +7,7 @@ from textwrap import wrap
 import logging
 from typing import List, Dict, Any, Optional
 from vector_store.config import settings
+from common.pagination import aiter_keyset
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +17,11 @@ logger = logging.getLogger(__name__)
 supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
+# 전체 스캔 시 읽어올 컬럼 (embedding 등 큰 컬럼 제외)
+SCHEMA_EMBEDDING_COLUMNS = "id, table_name, record_id"
+PO_ITEM_COLUMNS = "id, item_no, description, quantity, unit_price, subtotal, tax, shipping_fee, other_fee, total, category"
+EMAIL_LOG_COLUMNS = "id, subject, body, sender_email, sent_at, direction, sender_role"
+
 class VectorStoreManager:
     def __init__(self):
         self.MAX_CHARS = settings.MAX_CHARS  # OpenAI 임베딩 모델의 토큰 제한을 고려
@@ -33,24 +40,26 @@ class VectorStoreManager:
             logger.error(f"임베딩 생성 오류: {e}")
             return None
 
-    def clean_deleted_records(self):
+    async def clean_deleted_records(self):
         """삭제된 원본 레코드에 대한 임베딩 정리"""
         logger.info("삭제된 레코드의 임베딩 정리 시작...")
         
-        # schema_embeddings의 모든 레코드 조회
-        embeddings = supabase.table("schema_embeddings").select("*").execute().data
-        
-        for embedding in embeddings:
-            table_name = embedding["table_name"]
-            record_id = embedding["record_id"]
-            
-            # 원본 테이블에서 레코드 존재 여부 확인
-            original_record = supabase.table(table_name).select("id").eq("id", record_id).execute().data
-            
-            # 원본 레코드가 없으면 임베딩도 삭제
-            if not original_record:
-                supabase.table("schema_embeddings").delete().eq("id", embedding["id"]).execute()
-                logger.info(f"삭제된 레코드의 임베딩 제거: {table_name} ID {record_id}")
+        # schema_embeddings의 모든 레코드를 페이지 단위로 조회 (행별 조회/삭제는 스레드에서 실행)
+        async for embedding in aiter_keyset(supabase, "schema_embeddings", SCHEMA_EMBEDDING_COLUMNS):
+            await asyncio.to_thread(self.remove_orphan_embedding, embedding)
+
+    def remove_orphan_embedding(self, embedding: Dict[str, Any]):
+        """원본 레코드가 없으면 임베딩 삭제 (동기 Supabase 호출)"""
+        table_name = embedding["table_name"]
+        record_id = embedding["record_id"]
+
+        # 원본 테이블에서 레코드 존재 여부 확인
+        original_record = supabase.table(table_name).select("id").eq("id", record_id).execute().data
+
+        # 원본 레코드가 없으면 임베딩도 삭제
+        if not original_record:
+            supabase.table("schema_embeddings").delete().eq("id", embedding["id"]).execute()
+            logger.info(f"삭제된 레코드의 임베딩 제거: {table_name} ID {record_id}")
 
     def generate_po_items_content(self, item: Dict[str, Any]) -> str:
         """PO 아이템 정보를 문자열로 변환"""
@@ -166,61 +175,61 @@ class VectorStoreManager:
         except Exception as e:
             logger.error(f"임베딩 저장 오류 ({record_ref}): {e}")
 
-    def process_po_items(self):
+    def embed_purchase_order(self, po: Dict[str, Any]):
+        """구매 주문서 한 건의 아이템 조회 + 임베딩 저장 (동기 Supabase/OpenAI 호출)"""
+        items = supabase.table("po_items").select("*").eq("purchase_order_id", po["id"]).execute().data
+        content = self.generate_purchase_order_content(po, items)
+        self.update_embeddings("purchase_orders", po["id"], content)
+
+    async def process_po_items(self):
         """PO 아이템 임베딩 처리"""
         logger.info("PO 아이템 임베딩 처리 시작...")
         try:
-            items = supabase.table("po_items").select("*").execute().data
-            for item in items:
+            async for item in aiter_keyset(supabase, "po_items", PO_ITEM_COLUMNS):
                 content = self.generate_po_items_content(item)
-                self.update_embeddings("po_items", item["id"], content)
+                await asyncio.to_thread(self.update_embeddings, "po_items", item["id"], content)
         except Exception as e:
             logger.error(f"PO 아이템 처리 오류: {e}")
 
-    def process_purchase_orders(self):
+    async def process_purchase_orders(self):
         """구매 주문서 임베딩 처리"""
         logger.info("구매 주문서 임베딩 처리 시작...")
         try:
-            orders = supabase.table("purchase_orders").select("*").execute().data
-            for po in orders:
-                items = supabase.table("po_items").select("*").eq("purchase_order_id", po["id"]).execute().data
-                content = self.generate_purchase_order_content(po, items)
-                self.update_embeddings("purchase_orders", po["id"], content)
+            async for po in aiter_keyset(supabase, "purchase_orders"):
+                await asyncio.to_thread(self.embed_purchase_order, po)
         except Exception as e:
             logger.error(f"구매 주문서 처리 오류: {e}")
 
-    def process_request_forms(self):
+    async def process_request_forms(self):
         """요청 양식 임베딩 처리"""
         logger.info("요청 양식 임베딩 처리 시작...")
         try:
-            forms = supabase.table("request_form").select("*").execute().data
-            for form in forms:
+            async for form in aiter_keyset(supabase, "request_form"):
                 content = self.generate_request_form_content(form)
-                self.update_embeddings("request_form", form["id"], content)
+                await asyncio.to_thread(self.update_embeddings, "request_form", form["id"], content)
         except Exception as e:
             logger.error(f"요청 양식 처리 오류: {e}")
 
-    def process_email_logs(self):
+    async def process_email_logs(self):
         """이메일 로그 임베딩 처리"""
         logger.info("이메일 로그 임베딩 처리 시작...")
         try:
-            emails = supabase.table("email_logs").select("*").execute().data
-            for email in emails:
+            async for email in aiter_keyset(supabase, "email_logs", EMAIL_LOG_COLUMNS):
                 content = self.generate_email_content(email)
-                self.update_embeddings("email_logs", email["id"], content)
+                await asyncio.to_thread(self.update_embeddings, "email_logs", email["id"], content)
         except Exception as e:
             logger.error(f"이메일 로그 처리 오류: {e}")
 
-    def process_all(self):
+    async def process_all(self):
         """모든 테이블의 임베딩 처리"""
         logger.info("전체 임베딩 처리 시작...")
-        self.clean_deleted_records()  # 삭제된 레코드의 임베딩 정리
-        self.process_po_items()
-        self.process_purchase_orders()
-        self.process_request_forms()
-        self.process_email_logs()
+        await self.clean_deleted_records()  # 삭제된 레코드의 임베딩 정리
+        await self.process_po_items()
+        await self.process_purchase_orders()
+        await self.process_request_forms()
+        await self.process_email_logs()
         logger.info("전체 임베딩 처리 완료")
 
 if __name__ == "__main__":
     vector_store = VectorStoreManager()
-    vector_store.process_all() 
\ No newline at end of file
+    asyncio.run(vector_store.process_all()) 
\ No newline at end of file
@@ -27,7 +27,7 @@ class VectorStoreService:
                 if (not self.last_cleanup_time or 
                     current_time - self.last_cleanup_time >= self.cleanup_interval):
                     logger.info("삭제된 레코드 임베딩 정리 작업 시작")
-                    self.vector_store.clean_deleted_records()
+                    await self.vector_store.clean_deleted_records()
                     self.last_cleanup_time = current_time
                     logger.info("임베딩 정리 작업 완료")
             except Exception as e:
@@ -40,7 +40,7 @@ class VectorStoreService:
         while True:
             try:
                 logger.info("임베딩 업데이트 작업 시작")
-                self.vector_store.process_all()
+                await self.vector_store.process_all()
                 logger.info("임베딩 업데이트 작업 완료")
             except Exception as e:
                 logger.error(f"임베딩 업데이트 중 오류 발생: {e}")